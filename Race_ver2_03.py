@@ -8,20 +8,35 @@
 # version ='2.0.3'
 # ---------------------------------------------------------------------------
 # クラス
+#   SchemaError        : ページのレイアウトが想定と違う時のエラー
 #   Crawler            : もとになるクラス(単体での実行不可能)
 #   Race_Crawler       : レース情報を取得
 #   Payout_Crawler     : 払い戻し情報を取得
 #   Horse_Info_Crawler : 馬情報を取得
+#   RaceRows           : 1レース分の馬情報(タプル)とレース情報(1つだけ)
+#   RaceBuffer         : 1年分のレースデータを列ごとにためてデータフレームにする
+#   PayoutRows         : 1レース分の払い戻し(1行分の辞書と組み合わせごとのタプル)
+#   PayoutBuffer       : 1年分の払い戻しをためてデータフレームにする
 # ---------------------------------------------------------------------------
 # 関数
 #   int_    : int()関数の代わりに使用
 #   get_id  : jockey_id, owner_id, trainer_id, uma_idを取得
+#   split_race_data : レースデータをraces(1レース1行)とentries(1頭1行)に分ける
+#   normalize_header : 表の見出しの文字をそろえる
 # ---------------------------------------------------------------------------
 # 変更点
 #   Horse_Info_Crawlerを追加
 # ---------------------------------------------------------------------------
 # 注意点
 #   クラスはカレントディレクトリにrace_idフォルダを入れて実行
+#   race_idフォルダはrace_id_discovery.pyのRaceIdDiscoveryで作成できる
+#   base_urlを書き換えるとローカルのテスト用サーバーから取得できる
+#   レース結果の表は見出しから列の位置を決め，最初のvalidate_first件で値を確認する
+#   (レイアウトが変わっていた場合はSchemaErrorで止まる)
+#   page_cacheにPageCache(page_cache.py)を入れると条件付きリクエストを送り，変わっていないページは解析しない
+#   (出力を既存のデータに反映するHorse_Info_Crawlerのみ，年のcsvを置き換えるクローラーではValueError)
+#   Race_Crawler.validatorにDataValidator(data_quality.py)を入れると出力ごとに確認してレポートを出力する
+#   sql_writerにAsyncSQLWriter(pysql.py)を入れると取得しながらsql_batch_size件ごとにデータベースへ書き込む
 #   get_id()はカレントディレクトリにrace_csv_dataを入れて実行
 # ---------------------------------------------------------------------------
 # 初期環境構築：
@@ -33,26 +48,57 @@
 import os
 import re
 import requests
+import unicodedata
+import numpy as np
 import pandas as pd
 from bs4 import BeautifulSoup
 import datetime
-from time import sleep
-if __name__ == '__main__':
-    from tqdm import tqdm # vscodeで使う場合
-else:
-    from tqdm.notebook import tqdm # jupyterで使う場合
+from time import sleep, perf_counter
+from horse_racing_crawler.metrics import CrawlMetrics
+from horse_racing_crawler.rate_control import AdaptiveRateController
+from horse_racing_crawler.page_cache import PageNotModified
+from horse_racing_crawler.payout_store import BET_TYPES, BET_SIZES, ORDERED_BET_TYPES, PAYOUT_COLUMNS, PAYOUT_TYPES
+from horse_racing_crawler.df_io import read_race_data
+from tqdm.auto import tqdm # jupyterの時はnotebook用，それ以外(vscode，CLI)はターミナル用
 
 # ---------------------------------------------------------------------------
 # Crawler
 # ---------------------------------------------------------------------------
 
+class SchemaError(Exception):
+    """ページのレイアウトが想定と違う時のエラー(if_exception="pass"でも止める)"""
+
 class Crawler:
-    def __init__(self, sleep_time=1, if_exception="pass", input_dir=None, output_dir=None):
+    # 取得先のURL(ローカルのテスト用サーバーを使う場合はインスタンスごとに上書き)
+    base_url = "https://db.netkeiba.com"
+    # 通信エラー，429/5xxの時にリトライする回数
+    max_retries = 0
+    # 1ページの応答を待つ秒数(これを超えると通信エラーとして扱う)
+    timeout = 30
+    # 計測結果を出力するフォルダ(Noneの場合は出力しない)
+    metrics_dir = "crawl_metrics"
+    # 最初の何件でレイアウトの変更を確認するか(全て失敗した場合も止める，0の場合は確認しない)
+    validate_first = 5
+    # ETag, 本文のハッシュを記録するPageCache(Noneの場合は毎回取得して解析する)
+    page_cache = None
+    # 出力を既存のデータに反映する(年のcsvを置き換えない)クローラーだけTrue
+    # 変わっていないページは出力に入らないので，page_cacheはTrueの場合だけ使える
+    merges_output = False
+    # 取得したデータを裏で書き込むAsyncSQLWriter(Noneの場合は書き込まない)
+    sql_writer = None
+    # 何件ごとにsql_writerへ渡すか
+    sql_batch_size = 100
+    # 書き込むテーブル名(ファイル名が入る，Noneの場合はsql_writerを使えない)
+    sql_table = None
+    # プログレスバーを表示するかどうか
+    progress = True
+
+    def __init__(self, sleep_time=1, if_exception="pass", input_dir=None, output_dir=None, id_registry=None):
         """netkeibaからスクレイピングを行うクラス（単体では実行不可能）
 
         Attributes:
         ----------
-        sleep_time : int, default 1
+        sleep_time : int, "auto" or AdaptiveRateController, default 1
             id毎に停止する時間
         if_exception : str, default "pass"
             例外が出た時の処理
@@ -62,18 +108,28 @@ class Crawler:
             idが保存されているフォルダ名
         output_dir : str
             csvファイルを出力するフォルダ名
+        id_registry : IdRegistry, default None
+            全ての年で共通のid台帳(id_registry.py)
+        rate_controller : AdaptiveRateController
+            リクエストの間隔を自動で調整する(sleep_timeが数値の場合はNone)
 
         Notes
         -----
         if_exception = "pass"  -> 例外が出た時passしてそのrace_idを記録する
         if_exception = "raise" -> 例外が出た時エラーを出力
+        sleep_time = "auto"    -> 応答時間，エラーを見て間隔を自動で調整する(rate_control.py)
         """
 
+        if sleep_time == "auto":
+            sleep_time = AdaptiveRateController()
+        self.rate_controller = sleep_time if isinstance(sleep_time, AdaptiveRateController) else None
         self.sleep_time = sleep_time 
         self.if_exception = if_exception 
         self.current_dir = os.getcwd().replace(os.sep,'/')
         self.input_dir = input_dir
         self.output_dir = output_dir
+        self.id_registry = id_registry
+        self.metrics = CrawlMetrics(type(self).__name__)
 
     def __call__(self, *filenames):
         """メインの処理
@@ -112,6 +168,70 @@ class Crawler:
 
         raise NotImplementedError()
     
+    def get_soup(self, url):
+        """ページを取得してBeautifulSoupに変換する
+
+        Parameters
+        ----------
+        url : str
+            取得するページのURL
+
+        Returns
+        -------
+        soup : bs4.BeautifulSoup
+            取得したページ
+        """
+        html = self.get_response(url)
+        html.encoding = "EUC-JP"
+        return BeautifulSoup(html.text, 'html.parser')
+
+    def get_response(self, url):
+        """ページを取得する(リトライ，待ち時間の調整，計測を行う)
+
+        Parameters
+        ----------
+        url : str
+            取得するURL
+
+        Returns
+        -------
+        html : requests.Response
+            レスポンス
+
+        Raises
+        ------
+        PageNotModified
+            page_cacheがある時，前回からページが変わっていない場合
+        """
+        crawler = type(self).__name__
+        headers = self.page_cache.request_headers(crawler, url) if self.page_cache is not None else {}
+        # 通信時間はrequests.getの時間だけを足す(rate_controllerの待ち時間はsleep段階に入る)
+        fetch_time = 0.0
+        for retry in range(self.max_retries + 1):
+            if self.rate_controller is not None:
+                with self.metrics.stage("sleep"):
+                    self.rate_controller.wait()
+            request_start = perf_counter()
+            try:
+                html = requests.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException:
+                fetch_time += perf_counter() - request_start
+                if self.rate_controller is not None:
+                    self.rate_controller.record(perf_counter() - request_start, error=True)
+                if retry == self.max_retries:
+                    raise
+                continue
+            latency = perf_counter() - request_start
+            fetch_time += latency
+            if self.rate_controller is not None:
+                self.rate_controller.record(latency, html.status_code)
+            if html.status_code < 500 and html.status_code != 429:
+                break
+        self.metrics.add_fetch(fetch_time, len(html.content), html.status_code, retry)
+        if self.page_cache is not None:
+            self.page_cache.check(crawler, url, html)
+        return html
+
     def get_one_year_race_data(self, filename):
         """1年分のレースデータを取得
 
@@ -123,66 +243,208 @@ class Crawler:
 
         if type(filename) is str:
             filename = filename.replace(".txt","")
+        if self.sql_writer is not None and self.sql_table is None:
+            raise ValueError("{} has no sql_table".format(type(self).__name__))
+        if self.page_cache is not None and not self.merges_output:
+            raise ValueError("{} replaces the whole output file, so page_cache would drop unchanged pages".format(type(self).__name__))
 
-        self.race_data = [] # 最終的に出力するレースデータ
+        self.race_data = self.new_buffer() # 最終的に出力するレースデータ
+        self.metrics = CrawlMetrics(type(self).__name__) # 計測結果
 
-        with open("{}/{}/{}.txt".format(self.current_dir, self.input_dir, filename)) as f:
-            id_list = [s.strip() for s in f.readlines()]
-            all_race_count = len(id_list)
+        id_list = self.load_id_list(filename)
+        all_race_count = len(id_list)
         #print("filename : {}.txt".format(filename))
 
         # プログレスバーを表示
-        bar = tqdm(total = all_race_count)
+        bar = tqdm(total = all_race_count, disable = not self.progress)
         # 説明文を追加
         bar.set_description('{}.txt'.format(filename))
 
         self.false_id = [] # 上手くスクレイピング出来なかったレースidのリスト  
+        self.unchanged_id = [] # 前回から変わっていなかったidのリスト(page_cacheがある時)
+        self.sql_batch = self.new_buffer() # まだsql_writerに渡していないデータ
+        n_batch = 0
+        n_checked = 0 # レイアウトの変更を確認したidの数
         for id in id_list:
             self.id = id
+            self.metrics.start_id(self.id)
+            if self.page_cache is not None:
+                self.page_cache.discard()
+            error = None
+            unchanged = False
             if self.if_exception == "pass":
                 """例外が出た時passしてそのrace_idを記録する方式"""
                 try:
                     data = self.get_one_id_race_data()
-                except:
+                    if n_checked < self.validate_first:
+                        self.validate(data)
+                except PageNotModified:
+                    data = []
+                    unchanged = True
+                except SchemaError:
+                    raise # レイアウトが変わった場合は続けても全て失敗するので止める
+                except Exception as e:
                     data = [] # 例外が出た場合は何も追加しない
+                    error = e
                     self.false_id.append(self.id) # 例外が出た時そのidを記録して次のidでスクレイピング続行
                     print(self.id)
 
             
             if self.if_exception == "raise":
                 """例外が出た時エラーを出す方式"""
-                data = self.get_one_id_race_data()
-
+                try:
+                    data = self.get_one_id_race_data()
+                    if n_checked < self.validate_first:
+                        self.validate(data)
+                except PageNotModified:
+                    data = []
+                    unchanged = True
+            self.metrics.end_id(error)
+
+            if unchanged:
+                # 変わっていないページは解析せず，確認した数にも入れない
+                self.unchanged_id.append(self.id)
+                self.record_unchanged()
+            else:
+                n_checked += 1
+                if n_checked == self.validate_first and len(self.false_id) == n_checked:
+                    raise SchemaError("the first {} ids all failed (last error: {!r})".format(n_checked, error))
+                if self.page_cache is not None and error is None:
+                    self.page_cache.save() # 解析まで成功したページだけ記録する
+
+            if data:
+                self.record_id(data) # id台帳を更新
             self.race_data.extend(data) # self.race_dataに全レースの情報をまとめる
+            if self.sql_writer is not None and data:
+                self.sql_batch.extend(data)
+                n_batch += 1
+                if n_batch == self.sql_batch_size:
+                    self.flush_sql(filename)
+                    n_batch = 0
 
             bar.update(1) # レースカウントを更新
-            sleep(self.sleep_time) # self.sleep_time秒だけ停止
+            if self.rate_controller is None:
+                with self.metrics.stage("sleep"):
+                    sleep(self.sleep_time) # self.sleep_time秒だけ停止
+
+        if self.sql_writer is not None:
+            self.flush_sql(filename)
 
         # データフレーム化
-        self.race_data = pd.DataFrame(self.race_data) 
+        with self.metrics.stage("dataframe"):
+            self.race_data = self.build_frame(self.race_data) 
 
-        # 結果を出力
-        self.output(filename)
+        # 結果を出力(全てのページが変わっていなかった場合は出力しない)
+        if len(self.unchanged_id) < len(id_list):
+            with self.metrics.stage("output"):
+                self.output(filename)
 
         # 例外データのidをテキストファイルとして出力
         if self.if_exception == "pass":
             self.get_error_id(filename)
+        if self.unchanged_id:
+            print("\r{} pages were not modified\n".format(len(self.unchanged_id)), end="")
 
-    def output(self, output_filename):
+        # 計測結果を出力
+        if self.metrics_dir is not None:
+            self.metrics.export(self.metrics_dir, "{}_{}".format(filename, type(self).__name__))
+
+    def new_buffer(self):
+        """1年分のデータをためる入れ物(get_one_id_race_dataの出力をextendする)"""
+        return []
+
+    def build_frame(self, buffer):
+        """new_bufferにためたデータをデータフレームにする"""
+        return pd.DataFrame(buffer)
+
+    def load_id_list(self, filename):
+        """idが記載されたテキストファイルを読み込む
+
+        Parameters
+        ----------
+        filename : str
+            idが記載されたテキストファイル名
+
+        Returns
+        -------
+        id_list : list
+            idのリスト
+        """
+        with open("{}/{}/{}.txt".format(self.current_dir, self.input_dir, filename)) as f:
+            id_list = [s.strip() for s in f.readlines()]
+        return id_list
+
+    def validate(self, data):
+        """最初のvalidate_first件のデータの値を確認する(オーバーライドして使用)
+
+        Parameters
+        ----------
+        data : list
+            get_one_id_race_dataの出力
+
+        Raises
+        ------
+        SchemaError
+            値がおかしい時
+        """
+        pass
+
+    def record_id(self, data):
+        """id一つ分のデータを取得できた時にid台帳を更新する(オーバーライドして使用)
+
+        Parameters
+        ----------
+        data : list
+            get_one_id_race_dataの出力
+        """
+        pass
+
+    def record_unchanged(self):
+        """ページが前回から変わっていなかった時の処理(オーバーライドして使用)"""
+        pass
+
+    def flush_sql(self, filename):
+        """ためたデータをsql_writerに渡す(書き込み待ちが多い時はここで待つ)"""
+        if len(self.sql_batch) == 0:
+            return
+        with self.metrics.stage("sql"):
+            self.sql_writer.put(self.sql_frame(self.sql_batch), self.sql_table.format(filename), self.sql_types())
+        self.sql_batch = self.new_buffer()
+
+    def sql_frame(self, buffer):
+        """データベースに書き込むデータフレームにする(空文字は欠損にする)"""
+        return self.build_frame(buffer).replace("", np.nan).infer_objects()
+
+    def sql_types(self):
+        """データベースに書き込む列の型(列 -> int, float, str，Noneの場合は最初のバッチから推測する)"""
+        return None
+
+    def output(self, output_filename, df=None):
         """取得したデータを出力
 
         Parameters
         ----------
         output_filename : str, int
             出力ファイル名
+        df : pandas.DataFrame, default None
+            出力するデータフレーム(Noneの場合はself.race_data)
+
+        Returns
+        -------
+        saved : bool
+            保存できたかどうか
         """
+        if df is None:
+            df = self.race_data
         # csvへの保存
         if not os.path.exists(self.output_dir):
             os.mkdir(self.output_dir)
         try:
-            self.race_data.to_csv("{}/{}/{}.csv".format(self.current_dir, self.output_dir, output_filename), encoding="shift-jis",index = False)
+            df.to_csv("{}/{}/{}.csv".format(self.current_dir, self.output_dir, output_filename), encoding="shift-jis",index = False)
         except:
             print("Saving to csv file failed.")
+            return False
+        return True
 
     def get_error_id(self, filename):
         if not self.false_id:
@@ -200,7 +462,12 @@ class Crawler:
 # ---------------------------------------------------------------------------
 
 class Race_Crawler(Crawler):
-    def __init__(self, sleep_time=1, if_exception="pass", get_id=False, input_dir="race_id", output_dir="race_csv_data"):
+    # sql_writerで書き込むテーブル名(PySQL.to_sqlと同じ)
+    sql_table = "{}_all_race"
+    # 出力ごとに確認するDataValidator(data_quality.py，Noneの場合は確認しない)
+    validator = None
+
+    def __init__(self, sleep_time=1, if_exception="pass", get_id=False, input_dir="race_id", output_dir="race_csv_data", id_registry=None, output_mode="wide"):
         """レース情報をスクレイピングするクラス
 
         Attributes:
@@ -217,14 +484,26 @@ class Race_Crawler(Crawler):
             idが保存されているフォルダ名
         output_dir : str
             csvファイルを出力するフォルダ名
+        id_registry : IdRegistry, default None
+            指定した場合，1レース取得するたびにUma_Idなどを台帳に追記する
+        output_mode : str, default "wide"
+            出力する形式
 
         Notes
         -----
         if_exception = "pass"  -> 例外が出た時passしてそのrace_idを記録する
         if_exception = "raise" -> 例外が出た時エラーを出力
+        output_mode = "wide"       -> <year>_all_race.csv(1頭1行，レース情報も毎行)
+        output_mode = "normalized" -> <year>_races.csv(1レース1行)と<year>_entries.csv(1頭1行)
+        output_mode = "both"       -> 両方
+        ワイド形式に戻すときはdf_io.join_race_entries，df_io.read_race_dataを使う
         """
-        super().__init__(sleep_time, if_exception, input_dir, output_dir)
+        if output_mode not in ["wide", "normalized", "both"]:
+            raise ValueError("output_mode must be 'wide', 'normalized' or 'both'")
+        super().__init__(sleep_time, if_exception, input_dir, output_dir, id_registry)
         self.get_id_ = get_id
+        self.output_mode = output_mode
+        self.column_index = dict(RESULT_POSITIONS)
     
     def get_one_year_race_data(self, filename):
         """1年分のレースデータを取得
@@ -249,20 +528,47 @@ class Race_Crawler(Crawler):
 
         Returns
         -------
-        data : list
-            レース情報のリスト
+        data : RaceRows
+            レース情報のリスト(1行ずつ取り出すと今まで通りの辞書になる)
         """
         if id is not None:
             self.id = id
-        data = []
         # レース情報を取得
         uma_table, race_info = self.get_race_info()
+        # 見出しから列の位置を決める
+        self.column_index = self.get_column_index(uma_table[0])
         # 馬情報(元のコードでいうdetails)を取得する
-        for uma_list in uma_table[1:]:
-            details = self.get_detail(uma_list)
-            details.update(race_info) # 馬情報とレース情報を連結
-            data.append(details) # １レース分のデータを一つのリストにまとめる
-        return data
+        # 馬ごとに辞書を作らず，レース情報はレースごとに1つだけ持つ
+        rows = [self.get_detail_row(uma_list) for uma_list in uma_table[1:]]
+        return RaceRows(rows, race_info)
+
+    def new_buffer(self):
+        """1年分のレースデータを列ごとにためる入れ物"""
+        return RaceBuffer()
+
+    def build_frame(self, buffer):
+        """RaceBufferにためたデータをデータフレームにする"""
+        return buffer.to_frame()
+
+    def sql_frame(self, buffer):
+        """データベースに書き込むデータフレームにする(outputと同じく馬名の改行文字を削除)"""
+        df = super().sql_frame(buffer)
+        df["Name"] = df["Name"].str.strip()
+        return df
+
+    def sql_types(self):
+        return dict(ENTRY_TYPES, **RACE_TYPES)
+
+    def record_id(self, data):
+        """取得したレースに出てきたidを台帳に追記する
+
+        Parameters
+        ----------
+        data : list
+            get_one_id_race_dataの出力
+        """
+        if self.id_registry is not None:
+            self.id_registry.add(data)
 
     def get_race_info(self):
         """レース情報を取得
@@ -275,11 +581,8 @@ class Race_Crawler(Crawler):
             レース情報の辞書
         """
         race_info = {}
-        race_url = "https://db.netkeiba.com/race/" + self.id + "/"
-
-        race_html =  requests.get(race_url)
-        race_html.encoding = "EUC-JP"
-        race = BeautifulSoup(race_html.text, 'html.parser')
+        race_url = self.base_url + "/race/" + self.id + "/"
+        race = self.get_soup(race_url)
 
         #日付
         date = race.find(class_="race_place fc").find(class_="result_link").find("a").get("href").split("/")
@@ -457,6 +760,68 @@ class Race_Crawler(Crawler):
 
         return uma_table, race_info
 
+    def get_column_index(self, header):
+        """レース結果の表の見出しから列の位置を決める
+
+        Parameters
+        ----------
+        header : bs4.element.Tag
+            レース結果の表の1行目
+
+        Returns
+        -------
+        column_index : dict
+            RESULT_HEADERSのキー -> 列の位置
+
+        Raises
+        ------
+        SchemaError
+            必要な見出しが見つからない時
+        """
+        headers = [normalize_header(th.text) for th in header.find_all("th")]
+        if not headers:
+            # 見出しが無い場合は今までの位置で読む(validateで値を確認する)
+            return dict(RESULT_POSITIONS)
+        column_index = {}
+        for key, labels in RESULT_HEADERS.items():
+            for i, text in enumerate(headers):
+                if text in labels:
+                    column_index[key] = i
+                    break
+        missing = [RESULT_HEADERS[key][0] for key in RESULT_HEADERS if key not in column_index]
+        if missing:
+            raise SchemaError("race table headers not found: {} (headers: {})".format(", ".join(missing), ", ".join(headers)))
+        return column_index
+
+    def validate(self, data):
+        """取得したデータの値が想定通りか確認する(最初のvalidate_first件のみ)
+
+        Parameters
+        ----------
+        data : RaceRows
+            get_one_id_race_dataの出力
+
+        Raises
+        ------
+        SchemaError
+            値の型や範囲がおかしい時(列がずれている時など)
+        """
+        if not isinstance(data.race_info["Date"], datetime.datetime) or not isinstance(data.race_info["Kyori"], int):
+            raise SchemaError("unexpected race info: Date={!r}, Kyori={!r}".format(data.race_info["Date"], data.race_info["Kyori"]))
+        checks = {
+            "Waku": lambda x: isinstance(x, int) and 1 <= x <= 8,
+            "Number": lambda x: isinstance(x, int) and 1 <= x <= 18,
+            "Uma_Id": lambda x: isinstance(x, int) and x > 0,
+            "Jockey_Weight": lambda x: isinstance(x, float) and 40 <= x <= 80,
+            "Rank": lambda x: x == "" or isinstance(x, int),
+            "Time": lambda x: x == "" or isinstance(x, float) and x > 0,
+            "Sex_Id": lambda x: x != 10,
+        }
+        for column, check in checks.items():
+            for value in data.get_column(column):
+                if not check(value):
+                    raise SchemaError("unexpected value in {} of race {}: {!r}".format(column, self.id, value))
+
     def get_detail(self, uma_list):
         """馬ごとの情報を取得
 
@@ -466,12 +831,22 @@ class Race_Crawler(Crawler):
         Returns:
             details (dict): 馬ごとの情報
         """
-        details = {}
+        return dict(zip(ENTRY_COLUMNS, self.get_detail_row(uma_list)))
+
+    def get_detail_row(self, uma_list):
+        """馬ごとの情報をタプルで取得
+
+        Args:
+            uma_list (list): 馬のリスト
 
+        Returns:
+            row (tuple): 馬ごとの情報(ENTRY_COLUMNSの順)
+        """
         #uma_list = uma_table[1]
         uma_info = uma_list.find_all("td")
+        index = self.column_index # 見出し -> 列の位置
         #着順
-        rank = uma_info[0].text.replace("\xa0","").replace("\ufffd","")
+        rank = uma_info[index["rank"]].text.replace("\xa0","").replace("\ufffd","")
         if "中" in rank or "取" in rank or "除" in rank:
             rank = ""
             time = ""
@@ -483,28 +858,28 @@ class Race_Crawler(Crawler):
 
         else:
             rank = int_(rank)
-            time = uma_info[7].text.split(":")
+            time = uma_info[index["time"]].text.split(":")
             time = float(time[0]) * 60 + float(time[1])
             if rank == 1:
                 delay = "0"
             else:
-                delay = uma_info[8].text.replace("\xa0","").replace("\ufffd","")
-            corner = uma_info[10].text.replace("\xa0","").replace("\ufffd","")
-            f3 = float_(uma_info[11].text.replace("\xa0","").replace("\ufffd",""))
-            tansho = float(uma_info[12].text.replace("\xa0","").replace("\ufffd",""))
-            ninki = int(uma_info[13].text.replace("\xa0","").replace("\ufffd",""))
+                delay = uma_info[index["delay"]].text.replace("\xa0","").replace("\ufffd","")
+            corner = uma_info[index["corner"]].text.replace("\xa0","").replace("\ufffd","")
+            f3 = float_(uma_info[index["f3"]].text.replace("\xa0","").replace("\ufffd",""))
+            tansho = float(uma_info[index["tansho"]].text.replace("\xa0","").replace("\ufffd",""))
+            ninki = int(uma_info[index["ninki"]].text.replace("\xa0","").replace("\ufffd",""))
 
         #枠
-        waku = int_(uma_info[1].text.replace("\xa0","").replace("\ufffd",""))
+        waku = int_(uma_info[index["waku"]].text.replace("\xa0","").replace("\ufffd",""))
         #馬番
-        uma_num = int_(uma_info[2].text.replace("\xa0","").replace("\ufffd",""))
+        uma_num = int_(uma_info[index["number"]].text.replace("\xa0","").replace("\ufffd",""))
         #馬名
-        name = uma_info[3].find("a").text.replace("\xa0","").replace("\ufffd","")
+        name = uma_info[index["name"]].find("a").text.replace("\xa0","").replace("\ufffd","")
         #馬id
-        uma_id = uma_info[3].find("a").get("href").split("/")
+        uma_id = uma_info[index["name"]].find("a").get("href").split("/")
         uma_id = int_(uma_id[2])
         #性別
-        sex_age = uma_info[4].text.replace("\xa0","").replace("\ufffd","")
+        sex_age = uma_info[index["sex_age"]].text.replace("\xa0","").replace("\ufffd","")
         sex = sex_age[0]
         if "牡" in sex:
             sex_id = 0
@@ -517,11 +892,11 @@ class Race_Crawler(Crawler):
         #年齢
         age = int_(sex_age[1:])
         #斤量
-        jockey_weight = float(uma_info[5].text.replace("\xa0","").replace("\ufffd",""))
+        jockey_weight = float(uma_info[index["jockey_weight"]].text.replace("\xa0","").replace("\ufffd",""))
         #騎手
-        jockey = uma_info[6].find("a").text.replace("\xa0","").replace("\ufffd","")
+        jockey = uma_info[index["jockey"]].find("a").text.replace("\xa0","").replace("\ufffd","")
         #騎手id
-        jockey_id = uma_info[6].find("a")
+        jockey_id = uma_info[index["jockey"]].find("a")
         if jockey_id is None:
             jockey_id = ""
         else:
@@ -534,7 +909,7 @@ class Race_Crawler(Crawler):
         #人気
         #馬体重
         #体重増減
-        weight = uma_info[14].text.replace("(","").replace(")","").replace("\xa0","").replace("\ufffd","")
+        weight = uma_info[index["weight"]].text.replace("(","").replace(")","").replace("\xa0","").replace("\ufffd","")
         if weight == "計不" or weight == "":
             weight_today = ""
             weight_change = ""
@@ -542,47 +917,26 @@ class Race_Crawler(Crawler):
             weight_today = int_(weight[:3])
             weight_change = int_(weight[3:])
         #調教師
-        trainer = uma_info[18].find("a").text.replace("\xa0","").replace("\ufffd","").replace("\n","")
+        trainer = uma_info[index["trainer"]].find("a").text.replace("\xa0","").replace("\ufffd","").replace("\n","")
         #調教師id
-        trainer_id = uma_info[18].find("a")
+        trainer_id = uma_info[index["trainer"]].find("a")
         if trainer_id is None:
             trainer_id = ""
         else:
             trainer_id = int_(trainer_id.get("href").split("/")[4])
         #馬主
-        owner = uma_info[19].text.replace("\xa0","").replace("\ufffd","").replace("\n","")
+        owner = uma_info[index["owner"]].text.replace("\xa0","").replace("\ufffd","").replace("\n","")
         #馬主id
-        owner_id = uma_info[19].find("a")
+        owner_id = uma_info[index["owner"]].find("a")
         if owner_id is None:
             owner_id = ""
         else:
             owner_id = int_(owner_id.get("href").split("/")[4])
 
-        details["Rank"] = rank
-        details["Waku"] = waku
-        details["Number"] = uma_num
-        details["Name"] = name
-        details["Uma_Id"] = uma_id 
-        details["Sex"] = sex
-        details["Sex_Id"] = sex_id
-        details["Age"] = age
-        details["Jockey_Weight"] = jockey_weight
-        details["Jockey"] = jockey
-        details["Jockey_Id"] = jockey_id
-        details["Time"] = time
-        details["Delay"] = delay
-        details["Ninki"] = ninki
-        details["Tansho"] = tansho
-        details["3F"] = f3
-        details["Corner"] = corner 
-        details["Weight"] = weight_today
-        details["Weight_Change"] = weight_change
-        details["Trainer"] = trainer
-        details["Trainer_Id"] = trainer_id
-        details["Owner"] = owner
-        details["Owner_Id"] = owner_id
-
-        return details
+        # ENTRY_COLUMNSの順
+        return (rank, waku, uma_num, name, uma_id, sex, sex_id, age, jockey_weight, jockey, jockey_id,
+                time, delay, ninki, tansho, f3, corner, weight_today, weight_change,
+                trainer, trainer_id, owner, owner_id)
 
     def get_id(self, output_filename, columns=[]):
         """指定したidを取得
@@ -620,14 +974,160 @@ class Race_Crawler(Crawler):
         """
         self.race_data.Name = self.race_data.Name.str.strip() # 改行文字を削除
         self.race_data.Rank = self.race_data.Rank.astype('Int64', errors='ignore') # Rank列がなぜかfloatになるのでint型に変換
-        super().output("{}_all_race".format(output_filename)) # 出力
+        # レポートをdata_quality/<output_filename>.csvに出力する(問題があっても出力は続ける)
+        if self.validator is not None:
+            self.validator.report(self.race_data, output_filename)
+        if self.output_mode in ["wide", "both"]:
+            super().output("{}_all_race".format(output_filename)) # 出力
+        if self.output_mode in ["normalized", "both"]:
+            df_races, df_entries = split_race_data(self.race_data)
+            super().output("{}_races".format(output_filename), df_races)
+            super().output("{}_entries".format(output_filename), df_entries)
     
+# ---------------------------------------------------------------------------
+# RaceRows, RaceBuffer
+# ---------------------------------------------------------------------------
+
+# レース結果の表の見出し(normalize_header後)
+RESULT_HEADERS = {
+    "rank": ("着順",),
+    "waku": ("枠番", "枠"),
+    "number": ("馬番",),
+    "name": ("馬名",),
+    "sex_age": ("性齢",),
+    "jockey_weight": ("斤量",),
+    "jockey": ("騎手",),
+    "time": ("タイム",),
+    "delay": ("着差",),
+    "corner": ("通過",),
+    "f3": ("上り",),
+    "tansho": ("単勝",),
+    "ninki": ("人気",),
+    "weight": ("馬体重",),
+    "trainer": ("調教師",),
+    "owner": ("馬主",),
+}
+# 見出しが無い時に使う今までの列の位置
+RESULT_POSITIONS = {
+    "rank": 0, "waku": 1, "number": 2, "name": 3, "sex_age": 4, "jockey_weight": 5, "jockey": 6, "time": 7,
+    "delay": 8, "corner": 10, "f3": 11, "tansho": 12, "ninki": 13, "weight": 14, "trainer": 18, "owner": 19,
+}
+
+# 馬ごとの列(Race_Crawler.get_detail_rowの順)
+ENTRY_COLUMNS = ("Rank", "Waku", "Number", "Name", "Uma_Id", "Sex", "Sex_Id", "Age", "Jockey_Weight",
+                 "Jockey", "Jockey_Id", "Time", "Delay", "Ninki", "Tansho", "3F", "Corner", "Weight",
+                 "Weight_Change", "Trainer", "Trainer_Id", "Owner", "Owner_Id")
+# レースごとの列(Race_Crawler.get_race_infoの順)
+RACE_COLUMNS = ("Date", "Start_Time", "Place", "Place_Id", "Race_Num", "Race_Id", "Class", "Class_Id",
+                "Tousuu", "Field", "Field_Id", "Kyori", "Mawari", "Mawari_Id", "Baba", "BaBa_Id",
+                "Weather", "Weather_Id")
+# データベースに書き込む時の列の型(最初のバッチに欠損しかない列も型を決めておく)
+ENTRY_TYPES = dict(zip(ENTRY_COLUMNS, (int, int, int, str, int, str, int, int, float, str, int, float, str, int, float,
+                                       float, str, int, int, str, int, str, int)))
+RACE_TYPES = dict(zip(RACE_COLUMNS, (str, str, str, int, int, int, str, int, int, str, int, int, str, int, str, int,
+                                     str, int)))
+
+class RaceRows:
+    def __init__(self, rows, race_info):
+        """1レース分のデータ(Race_Crawler.get_one_id_race_dataの出力)
+
+        Attributes:
+        ----------
+        rows : list
+            馬ごとの情報のタプル(ENTRY_COLUMNSの順)のリスト
+        race_info : dict
+            レース情報(全ての馬で共通なので1つだけ持つ)
+
+        Notes
+        -----
+        for文やインデックスで取り出すと，今まで通り馬情報とレース情報を連結した辞書になる
+        """
+        self.rows = rows
+        self.race_info = race_info
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        details = dict(zip(ENTRY_COLUMNS, self.rows[i]))
+        details.update(self.race_info)
+        return details
+
+    def __iter__(self):
+        for i in range(len(self.rows)):
+            yield self[i]
+
+    def get_column(self, column):
+        """1列分の値のリスト(辞書を作らずに取り出す)"""
+        if column in self.race_info:
+            return [self.race_info[column]] * len(self.rows)
+        if column not in ENTRY_COLUMNS:
+            return []
+        i = ENTRY_COLUMNS.index(column)
+        return [row[i] for row in self.rows]
+
+class RaceBuffer:
+    def __init__(self):
+        """1年分のレースデータを列ごとにためる入れ物
+
+        Attributes:
+        ----------
+        entries : list
+            ENTRY_COLUMNSの列ごとのリスト
+        races : list
+            レース情報のタプル(RACE_COLUMNSの順)のリスト
+        counts : list
+            レースごとの頭数
+        """
+        self.entries = [[] for _ in ENTRY_COLUMNS]
+        self.races = []
+        self.counts = []
+
+    def extend(self, data):
+        """1レース分のデータを追加する
+
+        Parameters
+        ----------
+        data : RaceRows or list
+            get_one_id_race_dataの出力(辞書のリストでもよい)
+        """
+        if not isinstance(data, RaceRows):
+            for details in data:
+                self.extend(RaceRows([tuple(details.get(column, "") for column in ENTRY_COLUMNS)],
+                                     {column: details.get(column, "") for column in RACE_COLUMNS}))
+            return
+        if not data.rows:
+            return
+        for values, column_values in zip(self.entries, zip(*data.rows)):
+            values.extend(column_values)
+        self.races.append(tuple(data.race_info[column] for column in RACE_COLUMNS))
+        self.counts.append(len(data.rows))
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def to_frame(self):
+        """データフレームにする(レース情報はここで馬の数だけ複製する)
+
+        Returns
+        -------
+        race_data : pandas.DataFrame
+            今まで通りの1頭1行のデータフレーム
+        """
+        df_entry = pd.DataFrame(dict(zip(ENTRY_COLUMNS, self.entries)), columns=list(ENTRY_COLUMNS))
+        df_race = pd.DataFrame(self.races, columns=list(RACE_COLUMNS))
+        df_race = df_race.loc[df_race.index.repeat(self.counts)].reset_index(drop=True)
+        return pd.concat([df_entry, df_race], axis=1)
+
 # ---------------------------------------------------------------------------
 # Payout_Crawler
 # ---------------------------------------------------------------------------
 
 class Payout_Crawler(Crawler):
-    def __init__(self, sleep_time=1, if_exception="pass", input_dir="race_id", output_dir="payout_csv_data"):
+    # sql_writerで書き込むテーブル名(<year>_payout_long.csvと同じ1組み合わせ1行の形式，列は常に同じ)
+    sql_table = "{}_payout_long"
+
+    def __init__(self, sleep_time=1, if_exception="pass", input_dir="race_id", output_dir="payout_csv_data", output_mode="wide"):
         """払い戻し情報をスクレイピングするクラス
 
         Attributes:
@@ -642,6 +1142,11 @@ class Payout_Crawler(Crawler):
             idが保存されているフォルダ名
         output_dir : str
             csvファイルを出力するフォルダ名
+        output_mode : str, default "wide"
+            出力形式
+            "wide" : <year>_all_payout.csv(1レース1行，今まで通り)
+            "long" : <year>_payout_long.csv(1組み合わせ1行，payout_store.PayoutStoreで使う)
+            "both" : 両方
 
         Notes
         -----
@@ -649,6 +1154,9 @@ class Payout_Crawler(Crawler):
         if_exception = "raise" -> 例外が出た時エラーを出力
         """
         super().__init__(sleep_time, if_exception, input_dir, output_dir)
+        if output_mode not in ["wide", "long", "both"]:
+            raise ValueError("output_mode must be 'wide', 'long' or 'both'")
+        self.output_mode = output_mode
 
     def get_one_id_race_data(self, id=None) -> list:
         """id一つ分の払い戻し情報を取得する
@@ -660,17 +1168,14 @@ class Payout_Crawler(Crawler):
 
         Returns
         -------
-        data : list
-            レース情報のリスト
+        data : PayoutRows
+            1レース分の払い戻し(1行分の辞書と組み合わせごとのタプル)
         """
         if id is not None:
             self.id = id
 
-        race_url = "https://db.netkeiba.com/race/" + self.id + "/"
-
-        race_html =  requests.get(race_url)
-        race_html.encoding = "EUC-JP"
-        race = BeautifulSoup(race_html.text, 'html.parser')
+        race_url = self.base_url + "/race/" + self.id + "/"
+        race = self.get_soup(race_url)
 
         #レース名
         #race_class = race.find(class_="data_intro").find("h1").text
@@ -679,8 +1184,10 @@ class Payout_Crawler(Crawler):
         payout_table = race.find(class_="pay_block").find_all("tr")
         details = {}
         details["Race_Id"] = self.id
+        rows = [] # 組み合わせごとの払い戻し(PAYOUT_COLUMNSの順)
         for po_list in payout_table:
             #po_list = payout_table[1]
+            rows.extend(self.get_payout_rows(po_list))
             if "単勝" in po_list.text:
                 tan = po_list.find_all("td")[1].text.replace(",","")
                 tan = float(tan)/100
@@ -728,30 +1235,144 @@ class Payout_Crawler(Crawler):
                 sanrentan = po_list.find_all("td")[1].text.replace(",","")
                 sanrentan = float(sanrentan)/100
                 details["Sanrentan"] = sanrentan
-        details = [details]
-        return details 
+        return PayoutRows(details, rows)
 
-    def output(self, output_filename):
-        """取得したデータを出力
+    def get_payout_rows(self, po_list):
+        """払い戻し表の1行(1券種)を組み合わせごとのタプルにする
 
         Parameters
         ----------
-        race_id : int, default None
-            レースid
+        po_list : bs4.element.Tag
+            払い戻し表のtr
 
         Returns
         -------
-        data : list
-            レース情報のリスト
+        rows : list
+            (Race_Id, Bet_Type, Num1, Num2, Num3, Payout)のリスト
+        """
+        bet_type = BET_TYPES.get(po_list.find("th").text.strip()) if po_list.find("th") else None
+        if bet_type is None:
+            return []
+        td = po_list.find_all("td")
+        # 同着や複勝，ワイドは<br>区切りで複数ある
+        nums = [re.findall(r"\d+", s) for s in td[0].stripped_strings]
+        payouts = [int(s.replace(",","")) for s in td[1].stripped_strings]
+        rows = []
+        for num, payout in zip(nums, payouts):
+            num = [int(n) for n in num] + [0, 0]
+            if bet_type not in ORDERED_BET_TYPES:
+                num[:BET_SIZES[bet_type]] = sorted(num[:BET_SIZES[bet_type]])
+            rows.append((self.id, bet_type, num[0], num[1], num[2], payout))
+        return rows
+
+    def new_buffer(self):
+        return PayoutBuffer()
+
+    def build_frame(self, buffer):
+        self.payout_long = buffer.to_long_frame()
+        return buffer.to_frame()
+
+    def sql_frame(self, buffer):
+        """データベースに書き込む払い戻し(long形式)
+
+        wide形式はレースによって列(Huku_Num3, Wakuren, 同着の分など)が変わり，
+        後から書き込むバッチに列が増えると追記できないのでlong形式にする
+        """
+        return buffer.to_long_frame()
+
+    def sql_types(self):
+        return PAYOUT_TYPES
+
+    def output(self, output_filename):
+        """取得したデータを出力
+
+        Parameters
+        ----------
+        output_filename : str, int
+            出力ファイル名
+        """
+        if self.output_mode in ["wide", "both"]:
+            super().output("{}_all_payout".format(output_filename)) # 出力
+        if self.output_mode in ["long", "both"]:
+            super().output("{}_payout_long".format(output_filename), self.payout_long)
+
+# ---------------------------------------------------------------------------
+# PayoutRows, PayoutBuffer
+# ---------------------------------------------------------------------------
+
+class PayoutRows:
+    def __init__(self, details, rows):
+        """1レース分の払い戻し(Payout_Crawler.get_one_id_race_dataの出力)
+
+        Attributes:
+        ----------
+        details : dict
+            今まで通りの1レース1行の辞書
+        rows : list
+            組み合わせごとのタプル(PAYOUT_COLUMNSの順)のリスト
+
+        Notes
+        -----
+        for文やインデックスで取り出すと，今まで通りdetailsだけが入ったリストとして扱える
+        """
+        self.details = details
+        self.rows = rows
+
+    def __len__(self):
+        return 1
+
+    def __getitem__(self, i):
+        return [self.details][i]
+
+    def __iter__(self):
+        yield self.details
+
+class PayoutBuffer:
+    def __init__(self):
+        """1年分の払い戻しをためる入れ物
+
+        Attributes:
+        ----------
+        details : list
+            1レース1行の辞書のリスト
+        rows : list
+            組み合わせごとのタプルのリスト
         """
-        super().output("{}_all_payout".format(output_filename)) # 出力
+        self.details = []
+        self.rows = []
+
+    def extend(self, data):
+        """1レース分のデータを追加する
+
+        Parameters
+        ----------
+        data : PayoutRows or list
+            get_one_id_race_dataの出力(辞書のリストでもよい)
+        """
+        self.details.extend(data)
+        if isinstance(data, PayoutRows):
+            self.rows.extend(data.rows)
+
+    def __len__(self):
+        return len(self.details)
+
+    def to_frame(self):
+        """1レース1行のデータフレーム"""
+        return pd.DataFrame(self.details)
+
+    def to_long_frame(self):
+        """1組み合わせ1行のデータフレーム"""
+        return pd.DataFrame(self.rows, columns=PAYOUT_COLUMNS)
 
 # ---------------------------------------------------------------------------
 # Horse_Info_Crawler
 # ---------------------------------------------------------------------------
 
 class Horse_Info_Crawler(Crawler):
-    def __init__(self, sleep_time=1, if_exception="pass", input_dir="uma_id", output_dir="umainfo_csv_data"):
+    # 出力はHorseCrawlPlanner.apply, update_umainfo_tableで馬情報テーブルに反映する
+    merges_output = True
+
+    def __init__(self, sleep_time=1, if_exception="pass", input_dir="uma_id", output_dir="umainfo_csv_data", id_registry=None, skip_fetched=True):
         """馬情報をスクレイピングするクラス
 
         Attributes:
@@ -766,13 +1387,56 @@ class Horse_Info_Crawler(Crawler):
             idが保存されているフォルダ名
         output_dir : str
             csvファイルを出力するフォルダ名
+        id_registry : IdRegistry, default None
+            指定した場合，前の年までに取得済みの馬はスキップする
+        skip_fetched : bool, default True
+            Falseの場合は取得済みの馬も取り直す(HorseCrawlPlannerの取り直し用)
 
         Notes
         -----
         if_exception = "pass"  -> 例外が出た時passしてそのrace_idを記録する
         if_exception = "raise" -> 例外が出た時エラーを出力
         """
-        super().__init__(sleep_time, if_exception, input_dir, output_dir)
+        super().__init__(sleep_time, if_exception, input_dir, output_dir, id_registry)
+        self.skip_fetched = skip_fetched
+
+    def load_id_list(self, filename):
+        """馬idのテキストファイルを読み込む(台帳がある場合は取得済みの馬を除く)
+
+        Parameters
+        ----------
+        filename : str
+            idが記載されたテキストファイル名
+
+        Returns
+        -------
+        id_list : list
+            idのリスト
+        """
+        id_list = super().load_id_list(filename)
+        if self.id_registry is not None and self.skip_fetched:
+            all_count = len(id_list)
+            id_list = self.id_registry.unfetched("Uma_Id", id_list)
+            print("\r{}頭中{}頭は取得済み\n".format(all_count, all_count - len(id_list)), end="")
+        return id_list
+
+    def record_unchanged(self):
+        """変わっていなかった馬も取得済みにする(取り直しの日時を更新する，馬情報は前回の出力にある)"""
+        if self.id_registry is not None:
+            self.id_registry.mark_fetched("Uma_Id", [self.id])
+
+    def output(self, output_filename):
+        """取得したデータを出力し，出力できた馬を台帳で取得済みにする
+
+        途中で止まった場合に馬情報が無いまま取得済みにならないよう，csvに保存できてから記録する
+
+        Parameters
+        ----------
+        output_filename : str, int
+            出力ファイル名
+        """
+        if super().output(output_filename) and self.id_registry is not None and len(self.race_data):
+            self.id_registry.mark_fetched("Uma_Id", self.race_data["Uma_Id"].tolist())
     
     def get_one_id_race_data(self, id=None) -> list:
         """id一つ分の馬情報を取得
@@ -791,11 +1455,8 @@ class Horse_Info_Crawler(Crawler):
         if id is not None:
             self.id = id
 
-        horse_url = "https://db.netkeiba.com/horse/" + self.id + "/"
-
-        horse_html =  requests.get(horse_url)
-        horse_html.encoding = "EUC-JP"
-        horse = BeautifulSoup(horse_html.text, 'html.parser')
+        horse_url = self.base_url + "/horse/" + self.id + "/"
+        horse = self.get_soup(horse_url)
 
         details = {}
         details["Uma_Id"] = self.id
@@ -873,7 +1534,7 @@ class Horse_Info_Crawler(Crawler):
         details["F_Mother"] = f_mother
         details["F_Mother_Id"] = f_mother_id
         details["Mother"] = mother
-        details["Mother"] = mother_id
+        details["Mother_Id"] = mother_id
         details["M_Father"] = m_father
         details["M_Father_Id"] = m_father_id
         details["M_Mother"] = m_mother
@@ -926,13 +1587,40 @@ def float_(data):
         data = float(data)
     return data
 
-def get_id(*years):
+def normalize_header(text):
+    """見出しの文字をそろえる(半角カナを全角に，空白を削除)"""
+    return re.sub(r"\s", "", unicodedata.normalize("NFKC", text))
+
+def split_race_data(race_data):
+    """レースデータをraces(1レース1行)とentries(1頭1行)に分ける
+
+    Parameters
+    ----------
+    race_data : pandas.DataFrame
+        Race_Crawlerのデータフレーム(ワイド形式)
+
+    Returns
+    -------
+    df_races : pandas.DataFrame
+        RACE_COLUMNSの列(Race_Idで一意)
+    df_entries : pandas.DataFrame
+        Race_IdとENTRY_COLUMNSの列
+    """
+    race_columns = [column for column in RACE_COLUMNS if column in race_data.columns]
+    entry_columns = ["Race_Id"] + [column for column in race_data.columns if column not in race_columns]
+    df_races = race_data[race_columns].drop_duplicates(subset="Race_Id").reset_index(drop=True)
+    df_entries = race_data[entry_columns]
+    return df_races, df_entries
+
+def get_id(*years, id_registry=None):
     """指定したidを取得
 
     Parameters
     ----------
     years : tuple
         ファイル名（拡張子不要）
+    id_registry : IdRegistry, default None
+        指定した場合は読み込んだ年のidを台帳にも追加する(既存データからの台帳作成用)
     """
     current_dir_ = os.getcwd() # カレントディレクトリを取得
     columns = ["Uma_Id", "Jockey_Id", "Trainer_Id", "Owner_Id"]
@@ -942,7 +1630,10 @@ def get_id(*years):
         try:
             df = pd.read_pickle("{}/race_pickle_data/{}_all_race.pickle".format(current_dir_ , year))
         except:
-            df = pd.read_csv("{}/race_csv_data/{}_all_race.csv".format(current_dir_ , year), encoding="shift-jis")
+            df = read_race_data(year)
+
+        if id_registry is not None:
+            id_registry.add(df)
 
         for column in columns:
             # テキストファイルを出力するフォルダを生成
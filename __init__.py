@@ -1,27 +1,86 @@
-from horse_racing_crawler import pysql
-from horse_racing_crawler import df_io
-from horse_racing_crawler import get_past_race
-from horse_racing_crawler import Race_ver2_03
+# 公開している関数，クラスは使う時に初めてimportする(pandasなどの読み込みを遅らせる)
+import sys
+import types
+import importlib
 
 # 旧バージョンを使いたい場合はver=1に変更
 ver = 2
 if ver == 1:
-    from horse_racing_crawler.get_past_race_ver1 import get_past_race 
-    from horse_racing_crawler.get_past_race_ver1  import sort_all_race_data
-
+    _get_past_race_module = "get_past_race_ver1"
 if ver == 2:
-    from horse_racing_crawler.get_past_race import get_past_race 
-    from horse_racing_crawler.get_past_race  import sort_all_race_data
+    _get_past_race_module = "get_past_race"
+
+# 名前 -> (モジュール名, モジュール内の名前)
+_LAZY_ATTRIBUTES = {
+    "get_past_race": (_get_past_race_module, "get_past_race"),
+    "sort_all_race_data": (_get_past_race_module, "sort_all_race_data"),
+    "PySQL": ("pysql", "PySQL"),
+    "read_all_data": ("df_io", "read_all_data"),
+    "merge_umainfo": ("df_io", "merge_umainfo"),
+    "read_all_umainfo": ("df_io", "read_all_umainfo"),
+    "to_csv": ("df_io", "to_csv"),
+    "build_umainfo_table": ("df_io", "build_umainfo_table"),
+    "read_umainfo_table": ("df_io", "read_umainfo_table"),
+    "update_umainfo_table": ("df_io", "update_umainfo_table"),
+    "join_umainfo": ("df_io", "join_umainfo"),
+    "join_race_entries": ("df_io", "join_race_entries"),
+    "read_race_data": ("df_io", "read_race_data"),
+    "asof_join": ("df_io", "asof_join"),
+    "Race_Crawler": ("Race_ver2_03", "Race_Crawler"),
+    "Payout_Crawler": ("Race_ver2_03", "Payout_Crawler"),
+    "Horse_Info_Crawler": ("Race_ver2_03", "Horse_Info_Crawler"),
+    "get_id": ("Race_ver2_03", "get_id"),
+    "FeatureStore": ("feature_store", "FeatureStore"),
+    "IdRegistry": ("id_registry", "IdRegistry"),
+    "HorseCrawlPlanner": ("crawl_planner", "HorseCrawlPlanner"),
+    "RaceIdDiscovery": ("race_id_discovery", "RaceIdDiscovery"),
+    "CrawlMetrics": ("metrics", "CrawlMetrics"),
+    "AdaptiveRateController": ("rate_control", "AdaptiveRateController"),
+    "CrawlQueue": ("crawl_queue", "CrawlQueue"),
+    "PayoutStore": ("payout_store", "PayoutStore"),
+    "Backtest": ("backtest", "Backtest"),
+    "TrainingSetExporter": ("training_set", "TrainingSetExporter"),
+    "load_training_set": ("training_set", "load_training_set"),
+    "LiveRaceCrawler": ("live_race", "LiveRaceCrawler"),
+    "OddsLog": ("odds_log", "OddsLog"),
+    "OddsCollector": ("odds_log", "OddsCollector"),
+    "PageCache": ("page_cache", "PageCache"),
+    "DataValidator": ("data_quality", "DataValidator"),
+    "validate_race_data": ("data_quality", "validate_race_data"),
+    "RaceArchive": ("race_archive", "RaceArchive"),
+    "LookupCache": ("lookup_cache", "LookupCache"),
+    "HorseCache": ("lookup_cache", "HorseCache"),
+}
+
+# サブモジュール(horse_racing_crawler.pysqlなど)もそのまま使える
+_SUBMODULES = ["pysql", "df_io", "Race_ver2_03"]
+
+__all__ = list(_LAZY_ATTRIBUTES) + _SUBMODULES
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module_name, attribute = _LAZY_ATTRIBUTES[name]
+        module = importlib.import_module("{}.{}".format(__name__, module_name))
+        value = getattr(module, attribute)
+    elif name in _SUBMODULES:
+        value = importlib.import_module("{}.{}".format(__name__, name))
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    # 2回目以降はimportしない
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        """サブモジュールをimportした時に同じ名前の関数(get_past_raceなど)をモジュールで上書きしない"""
+        if name in _LAZY_ATTRIBUTES and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
 
-from horse_racing_crawler.pysql import PySQL
-from horse_racing_crawler_crawler.df_io import read_all_data
-from horse_racing_crawler.df_io import merge_umainfo
-from horse_racing_crawler.df_io import read_all_umainfo
-from horse_racing_crawler.df_io import to_csv
-from horse_racing_crawler.Race_ver2_03 import Race_Crawler
-from horse_racing_crawler.Race_ver2_03 import Payout_Crawler 
-from horse_racing_crawler.Race_ver2_03 import Horse_Info_Crawler
-from horse_racing_crawler.Race_ver2_03 import get_id
+sys.modules[__name__].__class__ = _Package
 
 
-__version__ = '1.0.2'
\ No newline at end of file
+__version__ = '1.0.2'
@@ -0,0 +1,6 @@
+# __main__.py
+# python -m horse_racing_crawler で cli.main を実行する
+import sys
+from horse_racing_crawler.cli import main
+
+sys.exit(main())
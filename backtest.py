@@ -0,0 +1,241 @@
+# backtest.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   Backtest : 馬ごとのスコア(予測確率など)から買い目を作り，払い戻しと突き合わせて評価する
+# ---------------------------------------------------------------------------
+# 注意点
+#   スコアのデータフレームはRace_Id, Number(馬番), スコアの列を持つ(Date列があれば日付順に並べる)
+#   払い戻しはpayout_store.PayoutStoreを使う(払い戻しの無いレースは買わない)
+#   買い方(bet_type, k, mode, min_score)
+#       bet_type  : tansho, fukusho, umaren, wide, umatan, sanrenpuku, sanrentan
+#       k         : スコアの上位k頭を使う
+#       mode      : "box"     -> 上位k頭のボックス
+#                   "nagashi" -> スコア1位を軸に2~k位へ流す
+#       min_score : スコアがこれより小さい馬は買わない
+#   買い目と払い戻しは整数のキーにしてnumpyのsearchsortedで突き合わせる(Pythonのループはしない)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import itertools
+import numpy as np
+import pandas as pd
+from horse_racing_crawler.payout_store import BET_SIZES, ORDERED_BET_TYPES
+
+# 馬番の最大値+1(キーの桁)
+BASE = 20
+
+class Backtest:
+    def __init__(self, df_score, payout_store, score="Score", stake=100):
+        """馬ごとのスコアから買い目を作って評価するクラス
+
+        Attributes:
+        ----------
+        df_score : pandas.DataFrame
+            Race_Id, Number, scoreの列を持つデータフレーム
+        payout_store : PayoutStore
+            払い戻し
+        score : str, default "Score"
+            スコアの列名(大きいほど上位)
+        stake : int, default 100
+            1点あたりの賭け金
+        race_ids : pandas.Index
+            対象のレースid(日付順)
+        years : numpy.ndarray
+            レースごとの年
+        top : numpy.ndarray
+            レースごとのスコア順の馬番(レース数 x 18，いない所は0)
+        top_score : numpy.ndarray
+            topと同じ形のスコア(いない所は-inf)
+
+        Examples:
+        ----------
+        backtest = Backtest(df_pred, PayoutStore(), score="Prob")
+        backtest.run("wide", k=3)                                       # 1つの買い方の成績
+        backtest.run("tansho", k=1, by_year=True)                       # 年ごとの成績
+        backtest.grid(bet_type=["tansho", "umaren"], k=[1, 2, 3, 4], min_score=[0, 0.1, 0.2])
+        """
+        self.score = score
+        self.stake = stake
+        df = df_score.dropna(subset=["Race_Id", "Number", score])
+        df = df.assign(Race_Id=df["Race_Id"].astype(str))
+
+        # 払い戻しのあるレースだけを日付順に並べる
+        df_payout = payout_store.table.reset_index()
+        df = df[df["Race_Id"].isin(set(df_payout["Race_Id"]))]
+        order_columns = ["Date", "Race_Id"] if "Date" in df.columns else ["Race_Id"]
+        self.race_ids = pd.Index(df[order_columns].drop_duplicates(subset="Race_Id").sort_values(order_columns)["Race_Id"])
+        self.years = self.race_ids.str[:4].astype(int).to_numpy()
+
+        # レースごとにスコアの高い順に並べた馬番
+        race_index = self.race_ids.get_indexer(df["Race_Id"])
+        numbers = df["Number"].to_numpy(dtype=np.int64)
+        scores = df[score].to_numpy(dtype=float)
+        order = np.lexsort((-scores, race_index))
+        race_index, numbers, scores = race_index[order], numbers[order], scores[order]
+        starts = np.searchsorted(race_index, np.arange(len(self.race_ids)))
+        position = np.arange(len(race_index)) - starts[race_index]
+        self.top = np.zeros((len(self.race_ids), BASE - 2), dtype=np.int64)
+        self.top_score = np.full(self.top.shape, -np.inf)
+        keep = position < self.top.shape[1]
+        self.top[race_index[keep], position[keep]] = numbers[keep]
+        self.top_score[race_index[keep], position[keep]] = scores[keep]
+
+        # 券種 -> (ソート済みのキー, 払い戻し)
+        self.payouts = {}
+        df_payout = df_payout[df_payout["Race_Id"].isin(self.race_ids)]
+        for bet_type, df in df_payout.groupby("Bet_Type"):
+            keys = self.encode(self.race_ids.get_indexer(df["Race_Id"]),
+                               df["Num1"].to_numpy(), df["Num2"].to_numpy(), df["Num3"].to_numpy())
+            order = np.argsort(keys)
+            self.payouts[bet_type] = (keys[order], df["Payout"].to_numpy(dtype=float)[order])
+
+    def encode(self, race_index, num1, num2, num3):
+        """レースと馬番を1つの整数にする"""
+        return ((race_index.astype(np.int64) * BASE + num1) * BASE + num2) * BASE + num3
+
+    def select(self, bet_type, k=1, mode="box", min_score=-np.inf):
+        """買い目を作る
+
+        Parameters
+        ----------
+        bet_type : str
+            券種(枠連以外)
+        k : int, default 1
+            スコアの上位k頭を使う
+        mode : str, default "box"
+            "box"または"nagashi"
+        min_score : float, default -inf
+            スコアがこれより小さい馬は買わない
+
+        Returns
+        -------
+        race_index : numpy.ndarray
+            買い目ごとのレースの番号(race_idsの位置)
+        nums : numpy.ndarray
+            買い目ごとの馬番(買い目の数 x 3，使わない所は0)
+        """
+        if bet_type not in BET_SIZES or bet_type == "wakuren":
+            raise ValueError("unsupported bet_type: {}".format(bet_type))
+        if mode not in ["box", "nagashi"]:
+            raise ValueError("mode must be 'box' or 'nagashi'")
+        size = BET_SIZES[bet_type]
+        k = min(k, self.top.shape[1])
+        # 上位k頭の中の組み合わせ(列の位置)
+        if mode == "nagashi" and size > 1:
+            positions = [(0,) + rest for rest in itertools.combinations(range(1, k), size - 1)]
+        else:
+            positions = list(itertools.combinations(range(k), size))
+        if bet_type in ORDERED_BET_TYPES:
+            positions = [p for c in positions for p in itertools.permutations(c)]
+        if not positions:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, 3), dtype=np.int64)
+        positions = np.array(positions)
+
+        available = (self.top > 0) & (self.top_score >= min_score)
+        # (レース数, 組み合わせ数, size)
+        nums = self.top[:, positions]
+        valid = available[:, positions].all(axis=2)
+        race_index = np.broadcast_to(np.arange(len(self.race_ids))[:, None], valid.shape)[valid]
+        nums = nums[valid]
+        if bet_type not in ORDERED_BET_TYPES:
+            nums = np.sort(nums, axis=1)
+        nums = np.hstack([nums, np.zeros((len(nums), 3 - size), dtype=np.int64)])
+        return race_index, nums
+
+    def lookup(self, bet_type, race_index, nums):
+        """買い目ごとの100円あたりの払い戻し(外れは0)"""
+        if bet_type not in self.payouts or len(race_index) == 0:
+            return np.zeros(len(race_index))
+        keys, payouts = self.payouts[bet_type]
+        bet_keys = self.encode(race_index, nums[:, 0], nums[:, 1], nums[:, 2])
+        position = np.minimum(np.searchsorted(keys, bet_keys), len(keys) - 1)
+        return np.where(keys[position] == bet_keys, payouts[position], 0)
+
+    def bets(self, bet_type, k=1, mode="box", min_score=-np.inf):
+        """買い目と払い戻しのデータフレーム(PayoutStore.evaluateで確認する時などに使う)
+
+        Returns
+        -------
+        df_bets : pandas.DataFrame
+            Race_Id, Bet_Type, Num1, Num2, Num3, Payoutの列
+        """
+        race_index, nums = self.select(bet_type, k, mode, min_score)
+        return pd.DataFrame({
+            "Race_Id": self.race_ids[race_index],
+            "Bet_Type": bet_type,
+            "Num1": nums[:, 0],
+            "Num2": nums[:, 1],
+            "Num3": nums[:, 2],
+            "Payout": self.lookup(bet_type, race_index, nums),
+        })
+
+    def run(self, bet_type, k=1, mode="box", min_score=-np.inf, by_year=False):
+        """1つの買い方を評価する
+
+        Parameters
+        ----------
+        bet_type, k, mode, min_score :
+            selectと同じ
+        by_year : bool, default False
+            Trueの場合は年ごとの成績を返す
+
+        Returns
+        -------
+        result : pandas.Series or pandas.DataFrame
+            Races(買ったレース数), Bets(点数), Hits(的中数), Stake(賭け金), Return(払い戻し),
+            Hit_Rate(的中率), ROI(回収率), Max_Drawdown(収支の最大の落ち込み，円)
+        """
+        race_index, nums = self.select(bet_type, k, mode, min_score)
+        payout = self.lookup(bet_type, race_index, nums)
+        if not by_year:
+            return pd.Series(self.summarize(race_index, payout, np.ones(len(self.race_ids), dtype=bool)))
+        return pd.DataFrame({year: self.summarize(race_index, payout, self.years == year)
+                             for year in np.unique(self.years)}).T.rename_axis("Year")
+
+    def summarize(self, race_index, payout, race_mask):
+        """レースごとに集計して成績を計算する"""
+        n_races = len(self.race_ids)
+        bets = np.bincount(race_index, minlength=n_races)[race_mask]
+        hits = np.bincount(race_index, weights=payout > 0, minlength=n_races)[race_mask]
+        returns = np.bincount(race_index, weights=payout * self.stake / 100, minlength=n_races)[race_mask]
+        stake = bets * self.stake
+        # レース順の累積収支からの最大の落ち込み
+        profit = np.cumsum(returns - stake)
+        drawdown = np.max(np.maximum.accumulate(np.r_[0, profit]) - np.r_[0, profit])
+        return {
+            "Races": int((bets > 0).sum()),
+            "Bets": int(bets.sum()),
+            "Hits": int(hits.sum()),
+            "Stake": float(stake.sum()),
+            "Return": float(returns.sum()),
+            "Hit_Rate": hits.sum() / bets.sum() if bets.sum() else np.nan,
+            "ROI": returns.sum() / stake.sum() if stake.sum() else np.nan,
+            "Max_Drawdown": float(drawdown),
+        }
+
+    def grid(self, bet_type, k=[1], mode=["box"], min_score=[-np.inf]):
+        """全ての組み合わせの買い方を評価する
+
+        Parameters
+        ----------
+        bet_type, k, mode, min_score : list
+            試す値のリスト(1つだけの場合はリストでなくてもよい)
+
+        Returns
+        -------
+        df_result : pandas.DataFrame
+            買い方ごとに1行(runの列に買い方の列を加えたもの)
+        """
+        params = [value if isinstance(value, (list, tuple)) else [value] for value in [bet_type, k, mode, min_score]]
+        results = []
+        for bet_type_, k_, mode_, min_score_ in itertools.product(*params):
+            result = {"Bet_Type": bet_type_, "K": k_, "Mode": mode_, "Min_Score": min_score_}
+            result.update(self.run(bet_type_, k_, mode_, min_score_))
+            results.append(result)
+        return pd.DataFrame(results)
@@ -0,0 +1,328 @@
+# cli.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# 関数
+#   main       : コマンドラインから実行する
+#   run_job    : ジョブ(設定の辞書)の各段階を順番に実行する
+#   load_job   : ジョブファイル(json)を読み込む
+# ---------------------------------------------------------------------------
+# 段階(stages)
+#   discover  : race_id/<year>.txtを作成            (RaceIdDiscovery)
+#   crawl     : レース情報を取得                    (Race_Crawler)
+#   payout    : 払い戻し情報を取得                  (Payout_Crawler)
+#   ids       : uma_id/<year>.txtなどを作成         (get_id)
+#   horse     : 馬情報を取得(取得済みの馬は除く)    (HorseCrawlPlanner, Horse_Info_Crawler)
+#   past_race : 過去レースを追加                    (get_past_race)
+#   umainfo   : 馬情報を結合                        (merge_umainfo)
+#   validate  : レースデータの品質を確認            (data_quality.validate_race_data)
+#   archive   : レースデータを圧縮して保存          (RaceArchive)
+#   sql       : データベースに保存                  (PySQL)
+#   worker    : キューのidを取得するワーカー        (crawl_queue.run_worker)
+# ---------------------------------------------------------------------------
+# 実行方法
+#   python -m horse_racing_crawler --job job.json
+#   python -m horse_racing_crawler --stages crawl ids horse --years 2020 2022 --sleep-time auto
+#   (コマンドラインの指定はジョブファイルより優先)
+#
+#   job.json の例
+#   {
+#       "years": [2020, 2022],
+#       "stages": ["crawl", "ids", "horse", "past_race", "umainfo"],
+#       "sleep_time": "auto",
+#       "workers": 2,
+#       "columns": ["Date", "Rank", "Jockey", "Time"],
+#       "sql": {"password": "****", "database_name": "horse_racing"}
+#   }
+#
+#   "queue"を指定するとcrawl, payoutはキュー(crawl_queue.py)を使って複数プロセスで取得する
+#   "queue": {"path": "crawl_queue.sqlite", "workers": 4, "rate": 1.0, "kind": "race"}
+#   前回失敗したidはやり直し，取得済みのidは前回の結果を使う("recrawl": trueで取り直す)
+#   他のマシンでは --stages worker で同じキューのワーカーを動かす
+#
+#   "page_cache"を指定するとhorseの取り直しで条件付きリクエストを送り，変わっていない馬は解析しない
+#   "page_cache": "page_cache.sqlite"
+#
+#   "sql_async": true にするとcrawl, payoutは取得しながら"sql"のデータベースへ書き込む(sql段階は不要)
+#   (払い戻しは<year>_payout_longのテーブル，"queue"と一緒の場合はまとめる時に書き込む)
+#
+#   "validate_output": true にするとcrawlは出力ごとに品質を確認し，data_quality/<year>.csvにレポートを出力する
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+STAGES = ["discover", "crawl", "payout", "ids", "horse", "past_race", "umainfo", "validate", "archive", "sql", "worker"]
+
+# ジョブの初期値
+DEFAULT_JOB = {
+    "years": None,
+    "stages": [],
+    "sleep_time": 1,
+    "if_exception": "pass",
+    "workers": 1,
+    "work_dir": None,
+    "id_registry": "id_registry",
+    "columns": ["Date", "Rank", "Jockey", "Time"],
+    "all_race_years": [2000, 2022],
+    "sql": {},
+    "queue": None,
+    "output_mode": "wide",
+    "payout_mode": "wide",
+    "page_cache": None,
+    "sql_async": False,
+    "validate_output": False,
+    "progress": True,
+}
+
+def load_job(file_path):
+    """ジョブファイル(json)を読み込む
+
+    Parameters
+    ----------
+    file_path : str
+        ジョブファイルのパス
+
+    Returns
+    -------
+    job : dict
+        ジョブの設定
+    """
+    with open(file_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def get_years(job):
+    """ジョブの年の範囲をリストにする"""
+    if not job["years"]:
+        raise ValueError("years is required (e.g. --years 2020 2022)")
+    start_year, end_year = job["years"][0], job["years"][-1]
+    return list(range(start_year, end_year+1))
+
+def get_sleep_time(job):
+    """sleep_timeを数値または"auto"にする"""
+    sleep_time = job["sleep_time"]
+    return sleep_time if sleep_time == "auto" else float(sleep_time)
+
+def map_years(job, function, years):
+    """年ごとの処理をworkers個のプロセスで並列に実行する"""
+    if job["workers"] <= 1 or len(years) <= 1:
+        for year in years:
+            function(job, year)
+        return
+    with ProcessPoolExecutor(max_workers=job["workers"]) as executor:
+        list(executor.map(function, [job] * len(years), years))
+
+def stage_discover(job):
+    from horse_racing_crawler.race_id_discovery import RaceIdDiscovery
+    RaceIdDiscovery(sleep_time=get_sleep_time(job), max_workers=max(job["workers"], 1))(*get_years(job))
+
+def run_with_sql_writer(job, crawler, function, *args, **kwargs):
+    """sql_asyncの場合はcrawlerにsql_writerを付け，裏でデータベースに書き込みながらfunctionを実行する"""
+    if not job["sql_async"]:
+        function(*args, **kwargs)
+        return
+    from horse_racing_crawler.pysql import PySQL
+    crawler.sql_writer = PySQL(**job["sql"]).async_writer()
+    try:
+        function(*args, **kwargs)
+    finally:
+        crawler.sql_writer.close()
+
+def get_validator(job):
+    """validate_outputの場合は出力ごとに確認するDataValidator(馬情報テーブルがあれば対応も確認する)"""
+    if not job["validate_output"]:
+        return None
+    from horse_racing_crawler.data_quality import DataValidator
+    from horse_racing_crawler.df_io import read_umainfo_table
+    umainfo_path = "umainfo_table.pickle"
+    return DataValidator(read_umainfo_table(umainfo_path) if os.path.exists(umainfo_path) else None)
+
+def crawl_year(job, year):
+    from horse_racing_crawler.Race_ver2_03 import Race_Crawler
+    from horse_racing_crawler.id_registry import IdRegistry
+    id_registry = IdRegistry(job["id_registry"]) if job["id_registry"] else None
+    crawler = Race_Crawler(sleep_time=get_sleep_time(job), if_exception=job["if_exception"], get_id=True,
+                           id_registry=id_registry, output_mode=job["output_mode"])
+    crawler.validator = get_validator(job)
+    crawler.progress = job["progress"]
+    run_with_sql_writer(job, crawler, crawler, year)
+
+def stage_crawl(job):
+    if job["queue"]:
+        from horse_racing_crawler.Race_ver2_03 import Race_Crawler
+        from horse_racing_crawler.id_registry import IdRegistry
+        id_registry = IdRegistry(job["id_registry"]) if job["id_registry"] else None
+        crawler = Race_Crawler(get_id=True, id_registry=id_registry, output_mode=job["output_mode"])
+        crawler.validator = get_validator(job)
+        crawler.progress = job["progress"]
+        run_queue(job, "race", crawler)
+        return
+    map_years(job, crawl_year, get_years(job))
+
+def payout_year(job, year):
+    from horse_racing_crawler.Race_ver2_03 import Payout_Crawler
+    crawler = Payout_Crawler(sleep_time=get_sleep_time(job), if_exception=job["if_exception"], output_mode=job["payout_mode"])
+    crawler.progress = job["progress"]
+    run_with_sql_writer(job, crawler, crawler, year)
+
+def stage_payout(job):
+    if job["queue"]:
+        from horse_racing_crawler.Race_ver2_03 import Payout_Crawler
+        crawler = Payout_Crawler(output_mode=job["payout_mode"])
+        crawler.progress = job["progress"]
+        run_queue(job, "payout", crawler)
+        return
+    map_years(job, payout_year, get_years(job))
+
+def run_queue(job, kind, crawler):
+    """キューに1年分ずつidを入れ，ワーカーの結果をまとめて出力する"""
+    from horse_racing_crawler.crawl_queue import run_local
+    queue = job["queue"]
+    # sql_asyncの場合はまとめた結果をデータベースにも書き込む(ワーカーは書き込まない)
+    run_with_sql_writer(job, crawler, run_local, kind, *get_years(job), workers=queue.get("workers", 4),
+                        path=queue.get("path", "crawl_queue.sqlite"), rate=queue.get("rate", 1.0), crawler=crawler,
+                        recrawl=queue.get("recrawl", False))
+
+def stage_worker(job):
+    from horse_racing_crawler.crawl_queue import run_worker
+    queue = job["queue"] or {}
+    run_worker(queue.get("path", "crawl_queue.sqlite"), queue.get("kind", "race"), rate=queue.get("rate", 1.0))
+
+def stage_ids(job):
+    from horse_racing_crawler.Race_ver2_03 import get_id
+    from horse_racing_crawler.id_registry import IdRegistry
+    id_registry = IdRegistry(job["id_registry"]) if job["id_registry"] else None
+    get_id(*get_years(job), id_registry=id_registry)
+
+def stage_horse(job):
+    from horse_racing_crawler.Race_ver2_03 import Horse_Info_Crawler
+    from horse_racing_crawler.crawl_planner import HorseCrawlPlanner
+    from horse_racing_crawler.id_registry import IdRegistry
+    years = get_years(job)
+    name = "plan_{}_{}".format(years[0], years[-1])
+    planner = HorseCrawlPlanner(IdRegistry(job["id_registry"] or "id_registry"))
+    new_ids, refresh_ids = planner.write_plan(name, *years)
+    if not new_ids and not refresh_ids:
+        return
+    crawler = Horse_Info_Crawler(sleep_time=get_sleep_time(job), if_exception=job["if_exception"],
+                                 id_registry=planner.id_registry, skip_fetched=False)
+    crawler.progress = job["progress"]
+    if job["page_cache"]:
+        from horse_racing_crawler.page_cache import PageCache
+        crawler.page_cache = PageCache(job["page_cache"])
+    crawler(name)
+    # 全ての馬が変わっていなかった場合などは出力が無いので反映しない
+    if len(crawler.race_data):
+        planner.apply(name)
+
+def past_race_year(job, year):
+    from horse_racing_crawler.get_past_race import get_past_race
+    get_past_race(year, job["columns"])
+
+def stage_past_race(job):
+    from horse_racing_crawler.get_past_race import sort_all_race_data
+    start_year, end_year = job["all_race_years"]
+    sort_all_race_data(job["columns"], start_year, end_year)
+    map_years(job, past_race_year, get_years(job))
+
+def stage_umainfo(job):
+    from horse_racing_crawler.df_io import merge_umainfo
+    years = get_years(job)
+    merge_umainfo(years[0], years[-1])
+
+def stage_validate(job):
+    from horse_racing_crawler.data_quality import validate_race_data
+    years = get_years(job)
+    validate_race_data(years[0], years[-1])
+
+def stage_archive(job):
+    from horse_racing_crawler.race_archive import RaceArchive
+    archive = RaceArchive()
+    for year in get_years(job):
+        archive.write(year)
+        print("\r{}年".format(year), end="")
+    print()
+
+def stage_sql(job):
+    from horse_racing_crawler.pysql import PySQL
+    years = get_years(job)
+    PySQL(**job["sql"])(years[0], years[-1])
+
+STAGE_FUNCTIONS = {
+    "discover": stage_discover,
+    "crawl": stage_crawl,
+    "payout": stage_payout,
+    "ids": stage_ids,
+    "horse": stage_horse,
+    "past_race": stage_past_race,
+    "umainfo": stage_umainfo,
+    "validate": stage_validate,
+    "archive": stage_archive,
+    "sql": stage_sql,
+    "worker": stage_worker,
+}
+
+def run_job(job):
+    """ジョブの各段階を順番に実行する
+
+    Parameters
+    ----------
+    job : dict
+        ジョブの設定(DEFAULT_JOBにない項目は初期値を使う)
+    """
+    job = dict(DEFAULT_JOB, **job)
+    for stage in job["stages"]:
+        if stage not in STAGES:
+            raise ValueError("unknown stage: {} (choose from {})".format(stage, ", ".join(STAGES)))
+    if job["work_dir"]:
+        os.chdir(job["work_dir"])
+
+    for stage in job["stages"]:
+        print("==== {} ====".format(stage))
+        STAGE_FUNCTIONS[stage](job)
+
+def main(argv=None):
+    """コマンドラインから実行する
+
+    Parameters
+    ----------
+    argv : list, default None
+        引数のリスト(Noneの場合はsys.argv)
+    """
+    parser = argparse.ArgumentParser(prog="horse_racing_crawler", description="netkeibaのクロールと前処理を段階ごとに実行する")
+    parser.add_argument("--job", help="ジョブファイル(json)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, help="実行する段階(書いた順に実行)")
+    parser.add_argument("--years", nargs="+", type=int, help="対象の年(開始 終了)")
+    parser.add_argument("--sleep-time", dest="sleep_time", help='id毎に停止する時間または"auto"')
+    parser.add_argument("--if-exception", dest="if_exception", choices=["pass", "raise"])
+    parser.add_argument("--workers", type=int, help="年ごとに並列で実行するプロセス数")
+    parser.add_argument("--work-dir", dest="work_dir", help="データのフォルダ(カレントディレクトリとして使う)")
+    parser.add_argument("--id-registry", dest="id_registry", help="id台帳のフォルダ名")
+    parser.add_argument("--output-mode", dest="output_mode", choices=["wide", "normalized", "both"], help="レースデータの出力形式")
+    parser.add_argument("--payout-mode", dest="payout_mode", choices=["wide", "long", "both"], help="払い戻しの出力形式")
+    parser.add_argument("--page-cache", dest="page_cache", help="ページの変更を記録するファイル名(SQLite，horseの取り直しで使う)")
+    parser.add_argument("--sql-async", dest="sql_async", action="store_true", default=None, help="取得しながらデータベースに書き込む")
+    parser.add_argument("--validate-output", dest="validate_output", action="store_true", default=None, help="crawlの出力ごとに品質を確認する")
+    parser.add_argument("--queue", help="キュー(SQLite)のファイル名(指定した場合crawl, payoutはキューを使う)")
+    parser.add_argument("--no-progress", dest="progress", action="store_false", default=None, help="プログレスバーを表示しない")
+    args = parser.parse_args(argv)
+
+    job = load_job(args.job) if args.job else {}
+    job.update({key: value for key, value in vars(args).items() if key not in ["job", "queue"] and value is not None})
+    if args.queue:
+        job["queue"] = dict(job.get("queue") or {}, path=args.queue)
+    if not job.get("stages"):
+        parser.error("no stages given (use --stages or a job file)")
+    run_job(job)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
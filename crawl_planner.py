@@ -0,0 +1,188 @@
+# crawl_planner.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   HorseCrawlPlanner : 複数年の馬情報の取得計画を立てる
+# ---------------------------------------------------------------------------
+# 注意点
+#   uma_id/<year>.txtを年をまたいで1つにまとめ，取得済みの馬は
+#   新規取得せず，変わりやすい列(通算成績，調教師，馬主)だけ
+#   refresh_days日より古いものを取り直す
+#
+#   planner = HorseCrawlPlanner(IdRegistry())
+#   planner.write_plan("plan_2018_2022", 2018, 2019, 2020, 2021, 2022)
+#   crawler = Horse_Info_Crawler(id_registry=planner.id_registry, skip_fetched=False)
+#   crawler("plan_2018_2022")
+#   planner.apply("plan_2018_2022")
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import datetime
+import pandas as pd
+from horse_racing_crawler.df_io import read_umainfo_table
+from horse_racing_crawler.df_io import update_umainfo_table
+from horse_racing_crawler.id_registry import normalize_id
+
+# 取り直す列(これ以外の血統，生年月日などは変わらない)
+VOLATILE_COLUMNS = ["Trainer", "Trainer_Id", "Owner", "Owner_Id", "Result_Rate", "Result_Detail"]
+
+class HorseCrawlPlanner:
+    def __init__(self, id_registry, umainfo_path="umainfo_table.pickle", refresh_days=30, active_years=1,
+                 input_dir="uma_id", output_dir="umainfo_csv_data", volatile_columns=None):
+        """馬情報の取得計画を立てるクラス
+
+        Attributes:
+        ----------
+        id_registry : IdRegistry
+            全ての年で共通のid台帳
+        umainfo_path : str
+            馬情報テーブルのファイル名(df_io.build_umainfo_table)
+        refresh_days : int, default 30
+            この日数より前に取得した馬情報を取り直す
+        active_years : int, default 1
+            指定した年のうち最後のactive_years年に出走した馬だけ取り直す
+        input_dir : str
+            年ごとの馬idが保存されているフォルダ名
+        output_dir : str
+            Horse_Info_Crawlerの出力フォルダ名
+        volatile_columns : list, default None
+            取り直す列(Noneの場合はVOLATILE_COLUMNS)
+        """
+        self.id_registry = id_registry
+        self.umainfo_path = umainfo_path
+        self.refresh_days = refresh_days
+        self.active_years = active_years
+        self.current_dir = os.getcwd().replace(os.sep,'/')
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.volatile_columns = volatile_columns if volatile_columns is not None else VOLATILE_COLUMNS
+
+    def read_ids(self, year):
+        """1年分の馬idを読み込む"""
+        file_path = "{}/{}/{}.txt".format(self.current_dir, self.input_dir, year)
+        if not os.path.exists(file_path):
+            return []
+        with open(file_path, encoding="utf-8") as f:
+            return [normalize_id(s) for s in f if s.strip()]
+
+    def stored_ids(self):
+        """馬情報テーブルに保存済みの馬id"""
+        if not os.path.exists(self.umainfo_path):
+            return set()
+        return set(normalize_id(id_) for id_ in read_umainfo_table(self.umainfo_path).index)
+
+    def plan(self, *years, df_race=None, now=None):
+        """取得する馬idを決める
+
+        Parameters
+        ----------
+        years : tuple
+            対象の年
+        df_race : pandas.DataFrame, default None
+            最新のレースデータ(指定した場合，調教師，馬主が変わった馬も取り直す)
+        now : datetime.datetime, default None
+            基準の日時(Noneの場合は現在時刻)
+
+        Returns
+        -------
+        new_ids : list
+            まだ取得していない馬id
+        refresh_ids : list
+            取り直す馬id
+        """
+        if now is None:
+            now = datetime.datetime.now()
+        years = sorted(years)
+        # 年をまたいで重複を除く
+        all_ids = list(dict.fromkeys(id_ for year in years for id_ in self.read_ids(year)))
+        active_ids = set(id_ for year in years[-self.active_years:] for id_ in self.read_ids(year))
+
+        fetched = self.id_registry.fetched["Uma_Id"]
+        stored = self.stored_ids() | set(fetched)
+        new_ids = [id_ for id_ in all_ids if id_ not in stored]
+
+        # 最近出走した馬のうち，古い(または取得日時が分からない)ものを取り直す
+        stale_before = now - datetime.timedelta(days=self.refresh_days)
+        refresh_ids = [id_ for id_ in all_ids if id_ in stored and id_ in active_ids
+                       and fetched.get(id_, datetime.datetime.min) < stale_before]
+        if df_race is not None:
+            changed = set(self.changed_ids(df_race)) & stored
+            planned = set(refresh_ids) # 何万頭になるのでリストを探さない
+            refresh_ids += [id_ for id_ in all_ids if id_ in changed and id_ not in planned]
+
+        print("\r{}頭中 新規{}頭, 取り直し{}頭\n".format(len(all_ids), len(new_ids), len(refresh_ids)), end="")
+        return new_ids, refresh_ids
+
+    def changed_ids(self, df_race):
+        """最新のレースの調教師，馬主が馬情報テーブルと違う馬id
+
+        Parameters
+        ----------
+        df_race : pandas.DataFrame
+            レースデータ
+
+        Returns
+        -------
+        ids : list
+            調教師，馬主が変わった馬id
+        """
+        if not os.path.exists(self.umainfo_path):
+            return []
+        df_umainfo = read_umainfo_table(self.umainfo_path)
+        latest = df_race.sort_values("Date").drop_duplicates(subset="Uma_Id", keep="last").set_index("Uma_Id")
+        latest = latest[latest.index.isin(df_umainfo.index)]
+        changed = pd.Series(False, index=latest.index)
+        for column in ["Trainer_Id", "Owner_Id"]:
+            if column in latest.columns and column in df_umainfo.columns:
+                # 欠損値がある列はfloatになっているので文字列にする前にnormalize_idでそろえる
+                stored = df_umainfo.loc[latest.index, column].map(normalize_id)
+                changed |= latest[column].map(normalize_id) != stored.values
+        return [normalize_id(id_) for id_ in changed[changed].index]
+
+    def write_plan(self, name, *years, df_race=None, now=None):
+        """取得する馬idをHorse_Info_Crawlerの入力ファイルとして出力する
+
+        Parameters
+        ----------
+        name : str
+            ファイル名(<input_dir>/<name>.txtに出力)
+        years : tuple
+            対象の年
+
+        Returns
+        -------
+        new_ids : list
+            まだ取得していない馬id
+        refresh_ids : list
+            取り直す馬id
+        """
+        new_ids, refresh_ids = self.plan(*years, df_race=df_race, now=now)
+        if not os.path.exists(self.input_dir):
+            os.mkdir(self.input_dir)
+        with open("{}/{}/{}.txt".format(self.current_dir, self.input_dir, name), "w", encoding="utf-8") as f:
+            f.writelines(map(lambda x: x + "\n", new_ids + refresh_ids))
+        return new_ids, refresh_ids
+
+    def apply(self, name):
+        """Horse_Info_Crawlerの出力を馬情報テーブルに反映する
+
+        新規の馬はすべての列，取り直した馬はvolatile_columnsだけ更新する
+
+        Parameters
+        ----------
+        name : str
+            Horse_Info_Crawlerの出力ファイル名(<output_dir>/<name>.csv)
+
+        Returns
+        -------
+        df_umainfo : pandas.DataFrame
+            更新後の馬情報テーブル
+        """
+        df_new_umainfo = pd.read_csv("{}/{}/{}.csv".format(self.current_dir, self.output_dir, name), encoding="shift-jis")
+        return update_umainfo_table(df_new_umainfo, self.umainfo_path, update_columns=self.volatile_columns)
@@ -0,0 +1,338 @@
+# crawl_queue.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   CrawlQueue : SQLiteを使った複数ワーカー用のidのキュー
+# ---------------------------------------------------------------------------
+# 関数
+#   run_worker : キューからidを借りて取得し，結果をキューに返す
+#   run_local  : キューにidを入れ，ローカルで複数プロセスのワーカーを動かして結果をまとめる
+# ---------------------------------------------------------------------------
+# 注意点
+#   コーディネーター : enqueue_file()で<input_dir>/<filename>.txtのidをキューに入れ，
+#                      全部終わったらmerge()で<output_dir>/<filename>_all_race.csvなどを出力
+#   ワーカー         : run_worker()をプロセス(別のマシンでもよい)ごとに実行
+#   借りたidはlease_seconds秒以内に結果を返さないと他のワーカーに回される
+#   同じ年をもう一度入れると前回失敗したidはやり直し，取得済みのidは前回の結果を使う(recrawl=Trueで取り直す)
+#   1秒あたりのリクエスト数(rate)は全ワーカー合計で守る
+#   別のマシンから使う場合はSQLiteのロックが効く共有ディスクにキューを置く
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import time
+import pickle
+import socket
+import sqlite3
+import importlib
+import multiprocessing
+
+# キューの種類 -> クローラーのクラス名(Race_ver2_03.py)
+CRAWLERS = {
+    "race": "Race_Crawler",
+    "payout": "Payout_Crawler",
+    "horse": "Horse_Info_Crawler",
+}
+
+class CrawlQueue:
+    def __init__(self, path="crawl_queue.sqlite", lease_seconds=300, max_attempts=3, rate=1.0):
+        """複数ワーカー用のidのキュー
+
+        Attributes:
+        ----------
+        path : str
+            SQLiteのファイル名
+        lease_seconds : int, default 300
+            ワーカーがidを借りていられる時間
+        max_attempts : int, default 3
+            1つのidを試す回数の上限
+        rate : float, default 1.0
+            全ワーカー合計の1秒あたりのリクエスト数
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.rate = rate
+        self.con = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            kind TEXT, filename TEXT, id TEXT, status TEXT DEFAULT 'pending', worker TEXT,
+            lease_until REAL DEFAULT 0, attempts INTEGER DEFAULT 0, error TEXT, result BLOB,
+            PRIMARY KEY (kind, filename, id))""")
+        self.con.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_until)")
+        self.con.execute("CREATE TABLE IF NOT EXISTS rate (name TEXT PRIMARY KEY, next_time REAL)")
+        self.con.execute("INSERT OR IGNORE INTO rate VALUES ('all', 0)")
+
+    def enqueue(self, kind, filename, ids, recrawl=False):
+        """idをキューに入れる
+
+        既に入っているidのうち，前回失敗したもの(期限切れのまま試す回数を使い切ったものを含む)は
+        試した回数を0に戻してやり直す．取得済みのものはrecrawl=Trueの場合だけやり直す
+
+        Parameters
+        ----------
+        kind : str
+            キューの種類("race", "payout", "horse")
+        filename : str, int
+            出力ファイル名(1年分のまとまり)
+        ids : list
+            idのリスト
+        recrawl : bool, default False
+            取得済みのidも取り直すかどうか(Falseの場合は前回の結果を使う)
+
+        Returns
+        -------
+        count : int
+            新しく入れた，またはやり直すことにしたidの数
+        """
+        jobs = [(kind, str(filename), str(id_)) for id_ in ids]
+        statuses = "('failed', 'leased', 'done')" if recrawl else "('failed', 'leased')"
+        before = self.con.total_changes
+        with self.transaction():
+            self.con.executemany("INSERT OR IGNORE INTO jobs (kind, filename, id) VALUES (?, ?, ?)", jobs)
+            # 借りられたままのidはワーカーが動いている可能性があるので，期限切れで回数を使い切ったものだけ戻す
+            self.con.executemany("""UPDATE jobs SET status = 'pending', worker = NULL, lease_until = 0, attempts = 0,
+                error = NULL, result = NULL WHERE kind = ? AND filename = ? AND id = ? AND status IN {}
+                AND (status != 'leased' OR (lease_until < ? AND attempts >= ?))""".format(statuses),
+                [job + (time.time(), self.max_attempts) for job in jobs])
+        return self.con.total_changes - before
+
+    def enqueue_file(self, kind, filename, input_dir, recrawl=False):
+        """<input_dir>/<filename>.txtのidをキューに入れる"""
+        with open("{}/{}.txt".format(input_dir, filename)) as f:
+            ids = [s.strip() for s in f if s.strip()]
+        return self.enqueue(kind, filename, ids, recrawl)
+
+    def lease(self, kind, worker, n=1):
+        """まだ終わっていないidを借りる
+
+        Parameters
+        ----------
+        kind : str
+            キューの種類
+        worker : str
+            ワーカー名
+        n : int, default 1
+            借りるidの数
+
+        Returns
+        -------
+        jobs : list
+            (filename, id)のリスト
+        """
+        now = time.time()
+        with self.transaction():
+            jobs = self.con.execute("""SELECT filename, id FROM jobs WHERE kind = ? AND attempts < ?
+                AND (status = 'pending' OR (status = 'leased' AND lease_until < ?)) LIMIT ?""",
+                (kind, self.max_attempts, now, n)).fetchall()
+            self.con.executemany("""UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1
+                WHERE kind = ? AND filename = ? AND id = ?""",
+                [(worker, now + self.lease_seconds, kind, filename, id_) for filename, id_ in jobs])
+        return jobs
+
+    def complete(self, kind, filename, id_, data):
+        """取得できたidの結果を保存する"""
+        with self.transaction():
+            self.con.execute("UPDATE jobs SET status = 'done', result = ?, error = NULL WHERE kind = ? AND filename = ? AND id = ?",
+                             (pickle.dumps(data), kind, filename, id_))
+
+    def fail(self, kind, filename, id_, error):
+        """取得できなかったidを記録する(max_attempts回までは他のワーカーがやり直す)"""
+        with self.transaction():
+            self.con.execute("""UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END,
+                error = ? WHERE kind = ? AND filename = ? AND id = ?""",
+                (self.max_attempts, error, kind, filename, id_))
+
+    def acquire(self):
+        """全ワーカー合計のリクエスト数を超えないように次のリクエストまで待つ"""
+        with self.transaction():
+            next_time = self.con.execute("SELECT next_time FROM rate WHERE name = 'all'").fetchone()[0]
+            start = max(time.time(), next_time)
+            self.con.execute("UPDATE rate SET next_time = ? WHERE name = 'all'", (start + 1.0 / self.rate,))
+        wait = start - time.time()
+        if wait > 0:
+            time.sleep(wait)
+
+    def progress(self, kind):
+        """状態ごとのidの数
+
+        Returns
+        -------
+        progress : dict
+            status -> idの数(期限切れの貸し出しは'pending'として数える)
+        """
+        rows = self.con.execute("""SELECT CASE WHEN status = 'leased' AND lease_until < ? AND attempts < ? THEN 'pending'
+            WHEN status = 'leased' AND lease_until < ? THEN 'failed' ELSE status END, COUNT(*)
+            FROM jobs WHERE kind = ? GROUP BY 1""", (time.time(), self.max_attempts, time.time(), kind)).fetchall()
+        return dict(rows)
+
+    def is_finished(self, kind):
+        """全てのidが終わった(成功または失敗)かどうか"""
+        progress = self.progress(kind)
+        return progress.get("pending", 0) == 0 and progress.get("leased", 0) == 0
+
+    def merge(self, crawler, kind, filename):
+        """終わったidの結果を1つにまとめ，クローラーと同じ形式で出力する
+
+        Parameters
+        ----------
+        crawler : Crawler
+            出力に使うクローラー(Race_Crawler, Payout_Crawler, Horse_Info_Crawler)
+        kind : str
+            キューの種類
+        filename : str, int
+            出力ファイル名
+        """
+        rows = self.con.execute("SELECT id, status, result FROM jobs WHERE kind = ? AND filename = ? ORDER BY rowid",
+                                (kind, str(filename))).fetchall()
+        crawler.race_data = crawler.new_buffer()
+        crawler.false_id = []
+        for id_, status, result in rows:
+            if status != "done":
+                crawler.false_id.append(id_)
+                continue
+            data = pickle.loads(result)
+            crawler.id = id_
+            if data:
+                crawler.record_id(data) # id台帳はコーディネーターだけが更新する
+            crawler.race_data.extend(data)
+        if crawler.sql_writer is not None:
+            # まとめた1年分をデータベースにも書き込む(sql_async)
+            crawler.sql_batch = crawler.race_data
+            crawler.flush_sql(filename)
+        crawler.race_data = crawler.build_frame(crawler.race_data)
+        crawler.output(filename)
+        crawler.get_error_id(filename)
+        if getattr(crawler, "get_id_", False):
+            crawler.get_id(filename)
+
+    def transaction(self):
+        """書き込みロックを取ってからトランザクションを始める"""
+        return Transaction(self.con)
+
+class Transaction:
+    def __init__(self, con):
+        """BEGIN IMMEDIATE ～ COMMIT/ROLLBACKを行うwith文用のクラス"""
+        self.con = con
+
+    def __enter__(self):
+        self.con.execute("BEGIN IMMEDIATE")
+        return self.con
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.con.execute("ROLLBACK" if exc_type is not None else "COMMIT")
+        return False
+
+def get_crawler_class(kind):
+    """キューの種類に対応するクローラーのクラス"""
+    module = importlib.import_module("horse_racing_crawler.Race_ver2_03")
+    return getattr(module, CRAWLERS[kind])
+
+def run_worker(path, kind, worker=None, batch=1, rate=1.0, wait=1.0, base_url=None, crawler_class=None):
+    """キューからidを借りて取得し，結果をキューに返す(借りられるidが無くなったら終了)
+
+    Parameters
+    ----------
+    path : str
+        SQLiteのファイル名
+    kind : str
+        キューの種類("race", "payout", "horse")
+    worker : str, default None
+        ワーカー名(Noneの場合はホスト名とプロセスid)
+    batch : int, default 1
+        一度に借りるidの数
+    rate : float, default 1.0
+        全ワーカー合計の1秒あたりのリクエスト数
+    wait : float, default 1.0
+        他のワーカーが借りているidが残っている時に待つ時間
+    base_url : str, default None
+        取得先のURL(テスト用サーバーを使う場合)
+    crawler_class : type, default None
+        使うクローラーのクラス(Noneの場合はkindに対応するクラス，テスト用のクローラーを使う場合)
+
+    Returns
+    -------
+    count : int
+        このワーカーが処理したidの数
+    """
+    if worker is None:
+        worker = "{}-{}".format(socket.gethostname(), os.getpid())
+    if crawler_class is None:
+        crawler_class = get_crawler_class(kind)
+    queue = CrawlQueue(path, rate=rate)
+    crawler = crawler_class(sleep_time=0, if_exception="raise")
+    crawler.metrics_dir = None
+    if base_url is not None:
+        crawler.base_url = base_url
+
+    count = 0
+    while True:
+        jobs = queue.lease(kind, worker, batch)
+        if not jobs:
+            if queue.is_finished(kind):
+                break
+            time.sleep(wait) # 他のワーカーの貸し出しが切れるのを待つ
+            continue
+        for filename, id_ in jobs:
+            queue.acquire()
+            crawler.id = id_
+            try:
+                data = crawler.get_one_id_race_data()
+            except Exception as e:
+                queue.fail(kind, filename, id_, "{}: {}".format(type(e).__name__, e))
+            else:
+                queue.complete(kind, filename, id_, data)
+            count += 1
+    return count
+
+def run_local(kind, *filenames, workers=4, path="crawl_queue.sqlite", rate=1.0, crawler=None, base_url=None,
+              recrawl=False):
+    """ローカルで複数プロセスのワーカーを動かし，1年分ずつ出力する
+
+    Parameters
+    ----------
+    kind : str
+        キューの種類("race", "payout", "horse")
+    filenames : tuple
+        idが記載されたテキストファイル名(拡張子不要)
+    workers : int, default 4
+        ワーカーのプロセス数(0の場合は別のマシンのワーカーが終わるのを待つだけ)
+    path : str
+        SQLiteのファイル名
+    rate : float, default 1.0
+        全ワーカー合計の1秒あたりのリクエスト数
+    crawler : Crawler, default None
+        出力に使うクローラー(Noneの場合は初期設定のクローラー)
+    base_url : str, default None
+        取得先のURL(テスト用サーバーを使う場合)
+    recrawl : bool, default False
+        前回取得済みのidも取り直すかどうか(前回失敗したidは常にやり直す)
+
+    Examples:
+    ----------
+    run_local("race", 2019, 2020, workers=4, rate=2.0)
+    """
+    if crawler is None:
+        crawler = get_crawler_class(kind)()
+    queue = CrawlQueue(path, rate=rate)
+    for filename in filenames:
+        queue.enqueue_file(kind, filename, "{}/{}".format(crawler.current_dir, crawler.input_dir), recrawl)
+
+    processes = [multiprocessing.Process(target=run_worker, args=(path, kind),
+                                         kwargs={"rate": rate, "base_url": base_url}) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    # 別のマシンのワーカーが借りているidが終わるまで待つ
+    while not queue.is_finished(kind):
+        time.sleep(1)
+
+    for filename in filenames:
+        queue.merge(crawler, kind, filename)
+    print("\r{}\n".format(queue.progress(kind)), end="")
@@ -0,0 +1,248 @@
+# data_quality.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   DataValidator : 取得したレースデータの型，値の範囲，重複，頭数，馬情報との対応を確認する
+# ---------------------------------------------------------------------------
+# 関数
+#   validate_race_data : 複数年のレースデータを確認してレポートを出力する
+# ---------------------------------------------------------------------------
+# 注意点
+#   確認は列ごとにまとめて行う(1行ずつのループはしない)
+#   レポートは1つの確認につき1行(Check, Column, Rows, Failed, Examples)
+#       type      : 数値の列に数値以外が入っている(int_の空文字は欠損として扱う)
+#       missing   : 必ず値がある列が欠損している
+#       range     : RANGESの範囲外
+#       unique    : (Race_Id, Number)が重複している
+#       tousuu    : レースの行数，馬番の最大値が頭数(Tousuu)と合わない
+#       umainfo   : 馬情報テーブルに無いUma_Id
+#   data_quality/<name>.csv にレポートを出力する
+#   Race_Crawler.validatorに入れると出力(1年分，キューのまとめ)ごとに確認する(問題があっても出力は止めない)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import numpy as np
+import pandas as pd
+from horse_racing_crawler.df_io import read_race_data, read_umainfo_table
+
+# 数値であるべき列 -> 欠損してよいか(取消，除外，計不などは空になる)
+NUMERIC_COLUMNS = {
+    "Race_Id": False, "Uma_Id": False, "Number": False, "Waku": False, "Age": False, "Jockey_Weight": False,
+    "Tousuu": False, "Kyori": False, "Rank": True, "Time": True, "Ninki": True, "Tansho": True, "3F": True,
+    "Weight": True, "Weight_Change": True,
+}
+# 値の範囲(両端を含む)
+RANGES = {
+    "Kyori": (800, 4300),
+    "Time": (40, 400),
+    "Weight": (300, 700),
+    "Weight_Change": (-60, 60),
+    "Jockey_Weight": (40, 80),
+    "Waku": (1, 8),
+    "Number": (1, 18),
+    "Tousuu": (1, 18),
+    "Age": (2, 20),
+    "Rank": (1, 18),
+    "Ninki": (1, 18),
+    "Tansho": (1, 10000),
+    "3F": (20, 60),
+}
+# レポートに載せる失敗した行のidの数
+N_EXAMPLES = 3
+
+class DataValidator:
+    def __init__(self, df_umainfo=None, ranges=None):
+        """レースデータの品質を確認するクラス
+
+        Attributes:
+        ----------
+        df_umainfo : pandas.DataFrame, default None
+            Uma_Idをインデックスにした馬情報(read_umainfo_tableの出力，Noneの場合は対応を確認しない)
+        ranges : dict, default None
+            列名 -> (最小値, 最大値)(Noneの場合はRANGES)
+
+        Examples:
+        ----------
+        validator = DataValidator(read_umainfo_table())
+        df_report = validator.check(read_race_data(2020))
+        validator.summary(df_report)
+        """
+        self.df_umainfo = df_umainfo
+        self.ranges = RANGES if ranges is None else ranges
+
+    def check(self, df):
+        """全ての確認を行う
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            レースデータ(<year>_all_race.csvなど)
+
+        Returns
+        -------
+        df_report : pandas.DataFrame
+            確認ごとに1行(Check, Column, Rows, Failed, Examples)
+        """
+        self.rows = len(df)
+        self.ids = df["Race_Id"].astype(str).to_numpy() if "Race_Id" in df.columns else np.arange(len(df)).astype(str)
+        numeric = self.to_numeric(df)
+        results = []
+        results += self.check_types(df, numeric)
+        results += self.check_ranges(numeric)
+        results += self.check_unique(df)
+        results += self.check_tousuu(numeric)
+        if self.df_umainfo is not None:
+            results += self.check_umainfo(numeric)
+        return pd.DataFrame(results, columns=["Check", "Column", "Rows", "Failed", "Examples"])
+
+    def result(self, check, column, failed):
+        """1つの確認の結果(failedは失敗した行のbool配列)"""
+        failed = np.asarray(failed, dtype=bool)
+        examples = " ".join(pd.unique(self.ids[failed])[:N_EXAMPLES])
+        return {"Check": check, "Column": column, "Rows": self.rows, "Failed": int(failed.sum()), "Examples": examples}
+
+    def to_numeric(self, df):
+        """数値であるべき列を数値にする(数値にできない値はNaN)"""
+        numeric = {}
+        for column in NUMERIC_COLUMNS:
+            if column in df.columns:
+                values = df[column]
+                if not pd.api.types.is_numeric_dtype(values):
+                    values = pd.to_numeric(values.replace("", np.nan), errors="coerce")
+                numeric[column] = values.to_numpy(dtype=float)
+        return numeric
+
+    def check_types(self, df, numeric):
+        """数値の列に数値以外が入っていないか，欠損してはいけない列が欠損していないか"""
+        results = []
+        for column, optional in NUMERIC_COLUMNS.items():
+            if column not in df.columns:
+                results.append({"Check": "missing", "Column": column, "Rows": self.rows, "Failed": self.rows,
+                                "Examples": "no column"})
+                continue
+            values = df[column]
+            empty = values.isna().to_numpy()
+            if not pd.api.types.is_numeric_dtype(values):
+                empty = empty | (values.astype(str).str.strip() == "").to_numpy()
+            results.append(self.result("type", column, np.isnan(numeric[column]) & ~empty))
+            if not optional:
+                results.append(self.result("missing", column, empty))
+        return results
+
+    def check_ranges(self, numeric):
+        """値が範囲内か(欠損は確認しない)"""
+        results = []
+        for column, (low, high) in self.ranges.items():
+            if column in numeric:
+                values = numeric[column]
+                results.append(self.result("range", column, (values < low) | (values > high)))
+        return results
+
+    def check_unique(self, df):
+        """(Race_Id, Number)が重複していないか"""
+        if "Race_Id" not in df.columns or "Number" not in df.columns:
+            return []
+        return [self.result("unique", "Race_Id,Number", df.duplicated(subset=["Race_Id", "Number"], keep=False))]
+
+    def check_tousuu(self, numeric):
+        """レースの行数と馬番の最大値が頭数と合うか"""
+        if not all(column in numeric for column in ["Race_Id", "Number", "Tousuu"]):
+            return []
+        race_codes, race_index = np.unique(np.nan_to_num(numeric["Race_Id"]), return_inverse=True)
+        tousuu = numeric["Tousuu"]
+        # レースごとの行数，馬番の最大値，頭数の最大値と最小値
+        counts = np.bincount(race_index, minlength=len(race_codes))
+        max_number = np.full(len(race_codes), -np.inf)
+        np.maximum.at(max_number, race_index, np.nan_to_num(numeric["Number"], nan=-np.inf))
+        max_tousuu = np.full(len(race_codes), -np.inf)
+        np.maximum.at(max_tousuu, race_index, np.nan_to_num(tousuu, nan=-np.inf))
+        min_tousuu = np.full(len(race_codes), np.inf)
+        np.minimum.at(min_tousuu, race_index, np.nan_to_num(tousuu, nan=np.inf))
+        failed_race = (counts != max_tousuu) | (max_number > max_tousuu) | (min_tousuu != max_tousuu)
+        return [self.result("tousuu", "Tousuu", failed_race[race_index])]
+
+    def check_umainfo(self, numeric):
+        """Uma_Idが馬情報テーブルにあるか"""
+        if "Uma_Id" not in numeric:
+            return []
+        uma_ids = numeric["Uma_Id"]
+        known = np.asarray(pd.to_numeric(pd.Index(self.df_umainfo.index), errors="coerce"), dtype=float)
+        failed = ~np.isin(uma_ids, known) & ~np.isnan(uma_ids)
+        results = [self.result("umainfo", "Uma_Id", failed)]
+        # 馬情報テーブル自体の重複
+        results.append({"Check": "unique", "Column": "umainfo.Uma_Id", "Rows": len(known),
+                        "Failed": int(pd.Index(known).duplicated(keep=False).sum()), "Examples": ""})
+        return results
+
+    def summary(self, df_report):
+        """失敗した確認だけを短く表示する
+
+        Returns
+        -------
+        n_failed : int
+            失敗した確認の数
+        """
+        df_failed = df_report[df_report.Failed > 0]
+        for row in df_failed.itertuples():
+            print("{:8} {:16} {:>8} / {:<8} {}".format(row.Check, row.Column, row.Failed, row.Rows, row.Examples))
+        print("\r{}件中{}件の確認で問題あり\n".format(len(df_report), len(df_failed)), end="")
+        return len(df_failed)
+
+    def report(self, df, name, output_dir="data_quality"):
+        """確認してレポートを<output_dir>/<name>.csvに出力する
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            レースデータ
+        name : str, int
+            レポートのファイル名
+        output_dir : str
+            レポートを出力するフォルダ名
+
+        Returns
+        -------
+        df_report : pandas.DataFrame
+            checkの出力
+        """
+        df_report = self.check(df)
+        self.summary(df_report)
+        if not os.path.exists(output_dir):
+            os.mkdir(output_dir)
+        df_report.to_csv("{}/{}/{}.csv".format(os.getcwd().replace(os.sep,'/'), output_dir, name),
+                         encoding="shift-jis", index=False)
+        return df_report
+
+def validate_race_data(start_year, end_year=None, input_dir="race_csv_data", umainfo_path="umainfo_table.pickle",
+                       output_dir="data_quality"):
+    """複数年のレースデータを確認してレポートを出力する
+
+    Parameters
+    ----------
+    start_year : int
+        最初の年
+    end_year : int, default None
+        最後の年(Noneの場合はstart_yearのみ)
+    input_dir : str
+        レースデータのフォルダ名
+    umainfo_path : str
+        馬情報テーブルのファイル名(無い場合は馬情報との対応を確認しない)
+    output_dir : str
+        レポートを出力するフォルダ名
+
+    Returns
+    -------
+    df_report : pandas.DataFrame
+        DataValidator.checkの出力
+    """
+    if end_year is None:
+        end_year = start_year
+    df = pd.concat([read_race_data(year, input_dir) for year in range(start_year, end_year+1)], ignore_index=True)
+    df_umainfo = read_umainfo_table(umainfo_path) if umainfo_path is not None and os.path.exists(umainfo_path) else None
+    return DataValidator(df_umainfo).report(df, "{}_{}".format(start_year, end_year), output_dir)
@@ -9,12 +9,21 @@
 # 関数
 #   read_all_data   : すべてのレースデータを取得(日にちと馬番号でソート，インデックス振りなおし)
 #   to_csv          :データフレームを特定のフォルダに保存
+#   umainfo_years       : 馬情報のcsvがある年
+#   build_umainfo_table : 馬情報を1頭1行にまとめたテーブルを作成して保存
+#   read_umainfo_table  : 馬情報テーブルを読み込む
+#   update_umainfo_table: 馬情報テーブルに新しく取得した馬情報を反映
+#   join_umainfo        : レースデータに馬情報を結合
+#   join_race_entries   : races, entries(Race_Crawler(output_mode="normalized"))をワイド形式に戻す
+#   read_race_data      : 1年分のレースデータをワイド形式で読み込む(どちらの出力形式でもよい)
+#   to_datetime         : Date列に発走時刻を追加してdatetime型にする
+#   asof_join           : 各行の時刻より前(同じ時刻は含まない)の最新n件の記録を列として付ける
 # ---------------------------------------------------------------------------
 # Imports 
 # ---------------------------------------------------------------------------
 import os
+import numpy as np
 import pandas as pd
-from time import sleep
 
 def read_all_data(start_year, end_year, input_dir="race_csv_data"):
     """各年のデータをデータフレームとして読み込み，リストにする
@@ -30,7 +39,7 @@ def read_all_data(start_year, end_year, input_dir="race_csv_data"):
     
     for year in years:
         # 1年分のレースデータを読み込む
-        df_race = pd.read_csv('{}/{}/{}_all_race.csv'.format(dir_, input_dir, year),encoding='shift-jis')
+        df_race = read_race_data(year, input_dir)
         
         # データを１つにまとめる
         if copy_flag:
@@ -53,12 +62,19 @@ def read_all_data(start_year, end_year, input_dir="race_csv_data"):
     
     return df_all_race
 
-def merge_umainfo(start_year, end_year=None, output_dir="race_csv_data_with_umainfo"):
-    """各年のデータをデータフレームとして読み込み，リストにする
+def merge_umainfo(start_year, end_year=None, output_dir="race_csv_data_with_umainfo", umainfo_path="umainfo_table.pickle"):
+    """過去レース付きのレースデータに馬情報を結合して出力
 
-    Returns:
-        list_df_race: list
-            各年のレースデータのリスト
+    Parameters
+    ----------
+    start_year : int
+        最初の年
+    end_year : int, default None
+        最後の年(Noneの場合はstart_yearのみ)
+    output_dir : str
+        出力するフォルダ名
+    umainfo_path : str
+        馬情報テーブルのファイル名(無い場合は作成する)
     """
     dir_ = os.getcwd().replace(os.sep,'/') # カレントディレクトリを取得
     if end_year == None:
@@ -68,53 +84,290 @@ def merge_umainfo(start_year, end_year=None, output_dir="race_csv_data_with_umai
     if not os.path.exists(output_dir):
         os.mkdir(output_dir)
 
-    # df_umainfo = read_all_umainfo(2000, end_year, input_dir="umainfo_csv_data")
-    df_umainfo = read_all_umainfo(2000, 2022, input_dir="umainfo_csv_data")
+    # 馬情報テーブルを読み込む(無い場合はumainfo_csv_dataにある全ての年の馬情報から作成)
+    if os.path.exists(umainfo_path):
+        df_umainfo = read_umainfo_table(umainfo_path)
+    else:
+        df_umainfo = build_umainfo_table(input_dir="umainfo_csv_data", output_path=umainfo_path)
     
     for year in years:
         # 1年分のレースデータを読み込む
         df_race = pd.read_csv('{}/race_csv_data_with_past_race_data/{}_all_race.csv'.format(dir_, year),encoding='shift-jis')
-        df_merged_race = pd.merge(df_race, df_umainfo, on="Uma_Id", how="left")
+        df_merged_race = join_umainfo(df_race, df_umainfo)
         df_merged_race.to_csv('{}/{}/{}_all_race.csv'.format(dir_, output_dir, year), encoding = "shift-jis",index = False)
             
         # 進行状況を出力
         print("\r{}年".format(year), end="")
-        # sleep(2)
 
-def read_all_umainfo(start_year, end_year, input_dir="umainfo_csv_data"):
-    """各年のデータをデータフレームとして読み込み，リストにする
+def umainfo_years(input_dir="umainfo_csv_data"):
+    """馬情報(<input_dir>/<year>.csv)がある年のリスト"""
+    if not os.path.isdir(input_dir):
+        return []
+    names = [os.path.splitext(name) for name in os.listdir(input_dir)]
+    return sorted(int(year) for year, ext in names if ext == ".csv" and year.isdigit() and len(year) == 4)
+
+def read_all_umainfo(start_year=None, end_year=None, input_dir="umainfo_csv_data"):
+    """各年の馬情報を読み込み，1つのデータフレームにまとめる
+
+    start_year, end_yearがNoneの場合はinput_dirにある最初，最後の年
 
     Returns:
-        list_df_race: list
-            各年のレースデータのリスト
+        df_all_umainfo: pandas.DataFrame
+            すべての年の馬情報(年の順に並ぶ)
     """
     dir_ = os.getcwd().replace(os.sep,'/') # カレントディレクトリを取得
-    copy_flag = True
-    df_all_race = None
-    years = [year for year in range(start_year, end_year+1)]
+    years = [year for year in umainfo_years(input_dir) if (start_year is None or year >= start_year)
+             and (end_year is None or year <= end_year)]
+    if not years:
+        raise ValueError("no umainfo csv in {} for {}-{} (run the horse stage first)".format(
+            input_dir, start_year or "", end_year or ""))
     
+    list_df = []
     for year in years:
-        # 1年分のレースデータを読み込む
-        df = pd.read_csv('{}/{}/{}.csv'.format(dir_, input_dir, year),encoding='shift-jis')
-        
-        # データを１つにまとめる
-        if copy_flag:
-            df_all_race = df.copy()
-            copy_flag = False
-        else:
-            df_all_race = pd.concat([df_all_race, df])
-            
+        # 1年分の馬情報を読み込む
+        path = '{}/{}/{}.csv'.format(dir_, input_dir, year)
+        list_df.append(pd.read_csv(path, encoding='shift-jis'))
         # 進行状況を出力
-        # print("\r{}年 レース数 : {}".format(year, len(df_race.Race_Id.drop_duplicates())), end='')
-        sleep(1)
-        print("\r{}年, 計{}頭".format(year, len(df_all_race.Uma_Id.drop_duplicates())), end="")
-        # sleep(2)
-    # pd.to_pickle(df_all_race, 'df_all_race.pkl')
+        print("\r{}年".format(year), end="")
+
+    # データを１つにまとめる(concatは最後に1回だけ)
+    df_all_umainfo = pd.concat(list_df, ignore_index=True)
+    print("\r{}年～{}年, 計{}頭\n".format(years[0], years[-1], df_all_umainfo.Uma_Id.nunique()), end="")
     
-    return df_all_race.loc[:, :'M_Mother_Id']
+    return df_all_umainfo.loc[:, :'M_Mother_Id']
+
+def build_umainfo_table(start_year=None, end_year=None, input_dir="umainfo_csv_data", output_path="umainfo_table.pickle"):
+    """馬情報を1頭1行(新しい年の情報を優先)にまとめて保存
+
+    Parameters
+    ----------
+    start_year : int, default None
+        最初の年(Noneの場合はinput_dirにある最初の年)
+    end_year : int, default None
+        最後の年(Noneの場合はinput_dirにある最後の年)
+    input_dir : str
+        馬情報が保存されているフォルダ名
+    output_path : str
+        保存するファイル名(pickle)
+
+    Returns
+    -------
+    df_umainfo : pandas.DataFrame
+        Uma_Idをインデックスにした馬情報
+    """
+    df_umainfo = read_all_umainfo(start_year, end_year, input_dir=input_dir)
+    # 同じ馬は後の年(最新の情報)を残す
+    df_umainfo = df_umainfo.drop_duplicates(subset="Uma_Id", keep="last")
+    df_umainfo = df_umainfo.set_index("Uma_Id").sort_index()
+    # 文字列の列はcategory型にして容量を減らす
+    for column in df_umainfo.columns:
+        if df_umainfo[column].dtype == object:
+            df_umainfo[column] = df_umainfo[column].astype("category")
+    pd.to_pickle(df_umainfo, output_path)
+    return df_umainfo
+
+def read_umainfo_table(path="umainfo_table.pickle"):
+    """build_umainfo_tableで保存した馬情報テーブルを読み込む
+
+    Parameters
+    ----------
+    path : str
+        馬情報テーブルのファイル名
+
+    Returns
+    -------
+    df_umainfo : pandas.DataFrame
+        Uma_Idをインデックスにした馬情報
+    """
+    return pd.read_pickle(path)
+
+def update_umainfo_table(df_new_umainfo, path="umainfo_table.pickle", update_columns=None):
+    """馬情報テーブルに新しく取得した馬情報を反映して保存
+
+    Parameters
+    ----------
+    df_new_umainfo : pandas.DataFrame
+        Horse_Info_Crawlerで取得した馬情報
+    path : str
+        馬情報テーブルのファイル名
+    update_columns : list, default None
+        既にいる馬について更新する列(Noneの場合はすべての列)
+
+    Returns
+    -------
+    df_umainfo : pandas.DataFrame
+        更新後の馬情報テーブル
+    """
+    df_new_umainfo = df_new_umainfo.drop_duplicates(subset="Uma_Id", keep="last").set_index("Uma_Id")
+    if os.path.exists(path):
+        df_umainfo = read_umainfo_table(path)
+    else:
+        df_umainfo = df_new_umainfo.iloc[0:0]
+    # category型のままだと新しい値を入れられないのでobject型に戻す
+    df_umainfo = df_umainfo.astype({column: object for column in df_umainfo.columns if df_umainfo[column].dtype == "category"})
+    if len(df_umainfo):
+        df_new_umainfo.index = df_new_umainfo.index.astype(df_umainfo.index.dtype)
+
+    # 既にいる馬は指定した列だけ更新
+    is_new = ~df_new_umainfo.index.isin(df_umainfo.index)
+    if update_columns is None:
+        update_columns = df_umainfo.columns
+    update_columns = [column for column in update_columns if column in df_new_umainfo.columns]
+    df_umainfo.update(df_new_umainfo.loc[~is_new, update_columns])
+    # 新しい馬は追加
+    df_umainfo = pd.concat([df_umainfo, df_new_umainfo[is_new]]).sort_index()
+
+    for column in df_umainfo.columns:
+        if df_umainfo[column].dtype == object:
+            df_umainfo[column] = df_umainfo[column].astype("category")
+    pd.to_pickle(df_umainfo, path)
+    return df_umainfo
+
+def join_umainfo(df_race, df_umainfo):
+    """レースデータに馬情報を結合する
+
+    Parameters
+    ----------
+    df_race : pandas.DataFrame
+        レースデータ
+    df_umainfo : pandas.DataFrame
+        Uma_Idをインデックスにした馬情報(read_umainfo_tableの出力)
+
+    Returns
+    -------
+    df_merged_race : pandas.DataFrame
+        馬情報を結合したレースデータ(行の順番はdf_raceと同じ)
+    """
+    # 重複する列(Trainer，Ownerなど)にはpd.mergeと同じ接尾辞を付ける
+    return df_race.join(df_umainfo, on="Uma_Id", lsuffix="_x", rsuffix="_y")
 
 def to_csv(df, filename, output_dir="preprocessed_csv_data"):
     dir_ = os.getcwd().replace(os.sep,'/') # カレントディレクトリを取得
     if not os.path.exists(output_dir):
         os.mkdir(output_dir)
-    df.to_csv('{}/{}/{}'.format(dir_, output_dir, filename), encoding = "shift-jis",index = False)
\ No newline at end of file
+    df.to_csv('{}/{}/{}'.format(dir_, output_dir, filename), encoding = "shift-jis",index = False)
+
+def join_race_entries(df_races, df_entries):
+    """races(1レース1行)とentries(1頭1行)を今まで通りのワイド形式にする
+
+    Parameters
+    ----------
+    df_races : pandas.DataFrame
+        <year>_races.csvのデータ
+    df_entries : pandas.DataFrame
+        <year>_entries.csvのデータ
+
+    Returns
+    -------
+    df_race : pandas.DataFrame
+        <year>_all_race.csvと同じ列の順番のデータフレーム
+    """
+    df_race = df_entries.join(df_races.set_index("Race_Id"), on="Race_Id")
+    columns = [column for column in df_entries.columns if column != "Race_Id"] + list(df_races.columns)
+    return df_race[columns]
+
+def read_race_data(year, input_dir="race_csv_data", encoding="shift-jis"):
+    """1年分のレースデータをワイド形式で読み込む
+
+    <year>_all_race.csvが無い場合は<year>_races.csvと<year>_entries.csvから作る
+
+    Parameters
+    ----------
+    year : int
+        読み込む年
+    input_dir : str
+        レースデータが保存されているフォルダ名
+    encoding : str, default "shift-jis"
+        csvファイルの文字コード
+
+    Returns
+    -------
+    df_race : pandas.DataFrame
+        1年分のレースデータ
+    """
+    dir_ = os.getcwd().replace(os.sep,'/') # カレントディレクトリを取得
+    path = '{}/{}/{}_all_race.csv'.format(dir_, input_dir, year)
+    if os.path.exists(path):
+        return pd.read_csv(path, encoding=encoding)
+    df_races = pd.read_csv('{}/{}/{}_races.csv'.format(dir_, input_dir, year), encoding=encoding)
+    df_entries = pd.read_csv('{}/{}/{}_entries.csv'.format(dir_, input_dir, year), encoding=encoding)
+    return join_race_entries(df_races, df_entries)
+
+def to_datetime(df_race):
+    """Date列に時間を追加してdatetime型にする
+
+    Parameters
+    ----------
+    df_race : pandas.DataFrame
+        レースデータ
+
+    Returns
+    -------
+    df_race : pandas.DataFrame
+        Date列をdatetime型にしたデータフレーム
+    """
+    if not pd.api.types.is_datetime64_any_dtype(df_race.Date):
+        if "Start_Time" in df_race.columns:
+            df_race.Date = pd.to_datetime(df_race.Date.astype(str).str[:10] + " " + df_race.Start_Time.astype(str))
+        else:
+            df_race.Date = pd.to_datetime(df_race.Date)
+    return df_race
+
+def asof_join(df_entry, df_history, by, on="Date", columns=None, n=1, name="past_{column}_{k}"):
+    """各行の時刻より前(同じ時刻は含まない)の最新n件の記録を列として付ける
+
+    df_historyを1回だけ並べ替え，searchsortedで位置を求める(行ごとの絞り込みはしない)
+
+    Parameters
+    ----------
+    df_entry : pandas.DataFrame
+        記録を付ける行(出馬表，レースデータなど)
+    df_history : pandas.DataFrame
+        時刻の付いた記録(過去レース，馬情報の変更，オッズなど)
+    by : str
+        対応を取る列(Uma_Id, Nameなど，両方のデータフレームにある列)
+    on : str, default "Date"
+        時刻の列(両方のデータフレームにある列，datetime型または数値)
+    columns : list, default None
+        付ける記録の列(Noneの場合はbyとon以外の全ての列)
+    n : int, default 1
+        何件前まで付けるか
+    name : str, default "past_{column}_{k}"
+        付ける列名(columnに列名，kに何件前か(1が直前)が入る)
+
+    Returns
+    -------
+    df_past : pandas.DataFrame
+        df_entryと同じインデックスのデータフレーム(記録が無い所は欠損値)
+    """
+    if columns is None:
+        columns = [column for column in df_history.columns if column not in [by, on]]
+    df_history = df_history[df_history[by].notna() & df_history[on].notna()]
+
+    # 対応を取る列は共通の番号に，時刻は共通の順位にして1つの整数で並べる
+    keys, _ = pd.factorize(pd.concat([df_history[by], df_entry[by]], ignore_index=True))
+    times = pd.concat([df_history[on], df_entry[on]], ignore_index=True)
+    valid_time = times.notna().to_numpy()
+    ranks = np.zeros(len(times), dtype=np.int64)
+    ranks[valid_time] = pd.factorize(times[valid_time], sort=True)[0]
+    combined = keys.astype(np.int64) * (ranks.max(initial=0) + 1) + ranks
+    history_keys, entry_keys = keys[:len(df_history)], keys[len(df_history):]
+    history_combined, entry_combined = combined[:len(df_history)], combined[len(df_history):]
+    entry_valid = (entry_keys >= 0) & valid_time[len(df_history):]
+
+    # 同じ時刻を含まないので，entryより小さい記録の数がentryの直前の記録の位置+1
+    order = np.argsort(history_combined, kind="stable")
+    history_keys = history_keys[order]
+    df_history = df_history.iloc[order]
+    positions = np.searchsorted(history_combined[order], entry_combined, side="left")
+
+    past = {}
+    for k in range(1, n+1):
+        index = positions - k
+        found = entry_valid & (index >= 0)
+        found[found] = history_keys[index[found]] == entry_keys[found]
+        index = np.where(found, index, 0)
+        for column in columns:
+            values = df_history[column].take(index) if len(df_history) else pd.Series(np.nan, index=range(len(index)))
+            past[name.format(column=column, k=k)] = values.set_axis(df_entry.index).where(found)
+    return pd.DataFrame(past, index=df_entry.index)
@@ -0,0 +1,204 @@
+# feature_store.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   FeatureStore : (Race_Id, Uma_Id)をキーとした特徴量ストア
+# ---------------------------------------------------------------------------
+# 注意点
+#   新しいレースを追加したときは，そのレースに出走した馬の
+#   「追加したレース以降の出走」だけ過去レース，移動平均の特徴量を再計算する
+#   feature_store/history.pickle  : 全レースデータ
+#   feature_store/features.pickle : 特徴量(インデックスは(Race_Id, Uma_Id))
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import pandas as pd
+from horse_racing_crawler.df_io import read_race_data, to_datetime
+
+KEY = ["Race_Id", "Uma_Id"]
+
+class FeatureStore:
+    def __init__(self, columns, n_past=5, rolling_columns=None, store_dir="feature_store"):
+        """過去レース，移動平均の特徴量を差分更新で保存するクラス
+
+        Attributes:
+        ----------
+        columns : list
+            過去レースを取得する特徴量(get_past_raceのcolumnsと同じ)
+        n_past : int, default 5
+            取得する過去レース数
+        rolling_columns : list, default None
+            過去n_pastレースの平均を取る特徴量
+        store_dir : str
+            ストアを保存するフォルダ名
+        history : pandas.DataFrame
+            全レースデータ
+        features : pandas.DataFrame
+            特徴量
+
+        Examples:
+        ----------
+        store = FeatureStore(["Rank", "Jockey"], rolling_columns=["Rank"])
+        store.build(2000, 2022)       # 初回のみ
+        store.update(df_new_race)     # 1日分のレースを追加
+        store.to_csv(2022)
+        """
+        self.columns = columns
+        self.n_past = n_past
+        self.rolling_columns = rolling_columns if rolling_columns is not None else []
+        self.current_dir = os.getcwd().replace(os.sep,'/')
+        self.store_dir = store_dir
+        self.history_path = "{}/{}/history.pickle".format(self.current_dir, store_dir)
+        self.features_path = "{}/{}/features.pickle".format(self.current_dir, store_dir)
+        self.load()
+
+    def load(self):
+        """保存されたストアを読み込む(無い場合は空)"""
+        if os.path.exists(self.history_path) and os.path.exists(self.features_path):
+            self.history = pd.read_pickle(self.history_path)
+            self.features = pd.read_pickle(self.features_path)
+        else:
+            self.history = pd.DataFrame()
+            self.features = pd.DataFrame(columns=self.feature_columns())
+            self.features.index = pd.MultiIndex.from_tuples([], names=KEY)
+
+    def save(self):
+        """ストアを保存する"""
+        if not os.path.exists(self.store_dir):
+            os.mkdir(self.store_dir)
+        pd.to_pickle(self.history, self.history_path)
+        pd.to_pickle(self.features, self.features_path)
+
+    def feature_columns(self):
+        """特徴量の列名のリスト"""
+        feature_columns = ["past_{}_{}".format(column, j+1) for j in range(self.n_past) for column in self.columns]
+        feature_columns += ["rolling_{}_{}".format(column, self.n_past) for column in self.rolling_columns]
+        return feature_columns
+
+    def build(self, start_year, end_year, input_dir="race_csv_data"):
+        """すべてのレースデータからストアを作り直す
+
+        Parameters
+        ----------
+        start_year : int
+            最初の年
+        end_year : int
+            最後の年
+        input_dir : str
+            レースデータが保存されているフォルダ名
+        """
+        self.history = pd.DataFrame()
+        self.features = self.features.iloc[0:0]
+        for year in range(start_year, end_year+1):
+            df_race = read_race_data(year, input_dir)
+            self.history = pd.concat([self.history, df_race])
+            print("\r{}年".format(year), end="")
+        df_all_race, self.history = self.history, pd.DataFrame()
+        self.update(df_all_race)
+
+    def update(self, df_new_race):
+        """レースデータを追加し，影響を受ける出走だけ特徴量を再計算する
+
+        Parameters
+        ----------
+        df_new_race : pandas.DataFrame
+            追加するレースデータ(Race_Crawlerの出力と同じ形式)
+
+        Returns
+        -------
+        updated : pandas.MultiIndex
+            再計算した(Race_Id, Uma_Id)
+        """
+        df_new_race = to_datetime(df_new_race.copy())
+        df_new_race = df_new_race.drop_duplicates(subset=KEY, keep="last")
+
+        # 既にあるレースは置き換える
+        if not self.history.empty:
+            new_keys = pd.MultiIndex.from_frame(df_new_race[KEY])
+            old_keys = pd.MultiIndex.from_frame(self.history[KEY])
+            self.history = self.history[~old_keys.isin(new_keys)]
+        self.history = pd.concat([self.history, df_new_race], ignore_index=True)
+
+        # 新しいレースに出走した馬の，そのレース以降の出走だけ再計算
+        first_new_date = df_new_race.groupby("Uma_Id")["Date"].min()
+        affected = self.history[self.history.Uma_Id.isin(first_new_date.index)]
+        affected = affected.sort_values(by=["Uma_Id", "Date"])
+        target = affected.Date.values >= affected.Uma_Id.map(first_new_date).values
+
+        features = self.compute(affected)[target]
+        self.features = pd.concat([self.features[~self.features.index.isin(features.index)], features])
+        self.save()
+
+        print("\r{}行の特徴量を更新\n".format(len(features)), end="")
+        return features.index
+
+    def compute(self, df_horse_race):
+        """馬ごとの過去レース，移動平均の特徴量を計算する
+
+        Parameters
+        ----------
+        df_horse_race : pandas.DataFrame
+            馬，日付でソートされた対象の馬の全レースデータ
+
+        Returns
+        -------
+        features : pandas.DataFrame
+            特徴量(インデックスは(Race_Id, Uma_Id))
+        """
+        grouped = df_horse_race.groupby("Uma_Id", sort=False)
+        features = {}
+        for j in range(self.n_past):
+            past = grouped[self.columns].shift(j+1)
+            for column in self.columns:
+                feature = past[column]
+                if column == "Jockey":
+                    # Jockeyが変わっていないとき1，変わったとき0(過去レースがない場合はNone)
+                    feature = (feature == df_horse_race[column]).astype(int).astype(object).where(feature.notna(), None)
+                features["past_{}_{}".format(column, j+1)] = feature
+        for column in self.rolling_columns:
+            values = pd.to_numeric(df_horse_race[column], errors="coerce").groupby(df_horse_race.Uma_Id, sort=False)
+            rolling = values.transform(lambda s: s.shift(1).rolling(self.n_past, min_periods=1).mean())
+            features["rolling_{}_{}".format(column, self.n_past)] = rolling
+
+        features = pd.DataFrame(features, index=df_horse_race.index)
+        features.index = pd.MultiIndex.from_frame(df_horse_race[KEY])
+        return features[self.feature_columns()]
+
+    def get(self, year=None):
+        """レースデータに特徴量を付けて返す
+
+        Parameters
+        ----------
+        year : int, default None
+            取得する年(Noneの場合はすべて)
+
+        Returns
+        -------
+        df_race : pandas.DataFrame
+            get_past_raceの出力と同じ形式のデータフレーム
+        """
+        df_race = self.history
+        if year is not None:
+            df_race = df_race[df_race.Date.dt.year == year]
+        df_race = df_race.join(self.features, on=KEY)
+        return df_race.sort_values(by=["Date", "Number"]).reset_index(drop=True)
+
+    def to_csv(self, year, output_dir="race_csv_data_with_past_race_data"):
+        """get_past_raceと同じフォルダに1年分を出力する
+
+        Parameters
+        ----------
+        year : int
+            出力する年
+        output_dir : str
+            出力するフォルダ名
+        """
+        if not os.path.exists(output_dir):
+            os.mkdir(output_dir)
+        self.get(year).to_csv('{}/{}/{}_all_race.csv'.format(self.current_dir, output_dir, year), encoding = "shift-jis",index = False)
@@ -18,18 +18,14 @@
 # ---------------------------------------------------------------------------
 # Ver2 変更点
 #   get_past_dataのデータフレームを辞書型に変換することでループ処理を高速化
-# ---------------------------------------------------------------------------
-# 初期環境構築：
-#   pip3 install tqdm
+# Ver3 変更点
+#   過去レースをdf_io.asof_joinでまとめて取得するように変更(1行ずつの絞り込みをなくした)
 # ---------------------------------------------------------------------------
 # Imports 
 # ---------------------------------------------------------------------------
 import os
 import pandas as pd
-if __name__ == '__main__':
-    from tqdm import tqdm # vscodeで使う場合
-else:
-    from tqdm.notebook import tqdm # jupyterで使う場合
+from horse_racing_crawler.df_io import asof_join, read_race_data, to_datetime
 
 def read_all_data(start_year, end_year, input_dir="race_csv_data"):
     """各年のデータをデータフレームとして読み込み，リストにする
@@ -45,7 +41,7 @@ def read_all_data(start_year, end_year, input_dir="race_csv_data"):
     
     for year in years:
         # 1年分のレースデータを読み込む
-        df_race = pd.read_csv('{}/{}/{}_all_race.csv'.format(dir_, input_dir, year),encoding='shift-jis')
+        df_race = read_race_data(year, input_dir)
         
         # データを１つにまとめる
         if copy_flag:
@@ -61,7 +57,7 @@ def read_all_data(start_year, end_year, input_dir="race_csv_data"):
     # pd.to_pickle(df_all_race, 'df_all_race.pkl')
     
     # Date列に時間を追加
-    df_all_race.Date = pd.to_datetime(df_all_race.Date + " "+ df_all_race.Start_Time)
+    df_all_race = to_datetime(df_all_race)
     
     # 日にちでソート
     df_all_race = df_all_race.sort_values(by=["Date", "Number"]).reset_index(drop=True)
@@ -80,6 +76,7 @@ def sort_all_race_data(columns, start_year=2000, end_year=2022):
         抽出する特徴量
     """
     # Name列は必ず必要なので無い場合は追加
+    columns_ = columns
     if "Name" not in columns:
         columns_ = columns + ["Name"]
     df_race = read_all_data(start_year, end_year)
@@ -100,61 +97,37 @@ def get_past_race(year, columns, iter=None):
     # カレントディレクトリを取得
     dir_ = os.getcwd().replace(os.sep,'/')
     # 1年分のレースデータを読み込む
-    df_race = pd.read_csv('{}/race_csv_data/{}_all_race.csv'.format(dir_, year),encoding='shift-jis')
+    df_race = read_race_data(year)
     # 馬ごとにグループ化したデータを読みこむ(2000年～2022年)
     grouped_race = pd.read_csv('{}/race_csv_data/sorted_all_race_data.csv'.format(dir_),encoding='shift-jis')
 
     # Date列に時間を追加
-    df_race.Date = pd.to_datetime(df_race.Date + " "+ df_race.Start_Time)
+    df_race = to_datetime(df_race)
     grouped_race.Date = pd.to_datetime(grouped_race.Date)
 
     # df_raceをソート
     df_race = df_race.sort_values(by=["Date", "Number"]).reset_index(drop=True)
     
-    # 過去レースの列をあらかじめ作っておく
-    for j in range(0, 5):
-        for column in columns:
-            df_race["past_{}_{}".format(column, j+1)] = None
-    
     # メインの処理
     if iter is None:
         end = df_race.shape[0]
     else:
         end = iter
 
-    # プログレスバーを表示
-    bar = tqdm(total = end)
-    # 説明文を追加
-    bar.set_description('{}年 過去データ取得中'.format(year))
-    
-    # データフレームを辞書型にする
-    df_race = df_race.to_dict(orient='records')
-
-    for i in range(end):
-        # 1列目の馬の全レースを取得，日付でソート
-        horse_name = df_race[i]["Name"]
-        past_race = grouped_race[grouped_race["Name"]==horse_name]
-
-        # 1列目の馬の過去5レースを取得
-        past_5_race = past_race[past_race.Date < df_race[i]["Date"]].head(5).reset_index(drop=True).to_dict(orient='records')
-
-        # 過去レースを追加
-        for j in range(0, 5):
-            for column in columns:
-                try:
-                    if column == "Jockey":
-                        if df_race[i][column] == past_5_race[j][column]:
-                            df_race[i]["past_{}_{}".format(column, j+1)] = 1
-                            # Jockeyが変わっていないとき1を代入できているか確認
-                            # df_race.loc[i, "past_{}_{}".format(column, j+1)] = past_5_race.loc[j, column]
-                        else:
-                            df_race[i]["past_{}_{}".format(column, j+1)] = 0
-                    else:
-                        df_race[i]["past_{}_{}".format(column, j+1)] = past_5_race[j][column]
-                except:
-                    pass # 過去レースがない場合はNoneのまま
-        bar.update(1) # レースカウントを更新
-    df_race = pd.DataFrame(df_race)
+    # 馬名ごとに，そのレースより前(同じ日時は含まない)の最新5レースを取得
+    # 過去レースがあるかどうかはpast_Date_jで判定する
+    df_past = asof_join(df_race.iloc[:end], grouped_race, by="Name", on="Date",
+                        columns=list(dict.fromkeys(columns + ["Date"])), n=5)
+    for j in range(0, 5):
+        exists = df_past["past_Date_{}".format(j+1)].notna()
+        for column in columns:
+            past = df_past["past_{}_{}".format(column, j+1)]
+            if column == "Jockey":
+                # Jockeyが変わっていないとき1，変わったとき0
+                past = (past == df_race.Jockey.iloc[:end]).astype(int)
+            # 過去レースがない場合はNone
+            df_race["past_{}_{}".format(column, j+1)] = past.astype(object).where(exists, None)
+    print("\r{}年 過去データ取得 : {}行\n".format(year, end), end="")
     
     # 出力フォルダの指定
     output_dir = "race_csv_data_with_past_race_data"
@@ -24,10 +24,7 @@
 # ---------------------------------------------------------------------------
 import os
 import pandas as pd
-if __name__ == '__main__':
-    from tqdm import tqdm # vscodeで使う場合
-else:
-    from tqdm.notebook import tqdm # jupyterで使う場合
+from tqdm.auto import tqdm # jupyterの時はnotebook用，それ以外(vscode，CLI)はターミナル用
 
 def read_all_data(start_year, end_year, input_dir="race_csv_data"):
     """各年のデータをデータフレームとして読み込み，リストにする
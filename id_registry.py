@@ -0,0 +1,170 @@
+# id_registry.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   IdRegistry : 全ての年で共通のid台帳(重複なし，取得済みかどうかを記録)
+# ---------------------------------------------------------------------------
+# 注意点
+#   id_registry/uma_id.txt         : これまでに出てきたUma_Id(1行1id，追記のみ)
+#   id_registry/uma_id_fetched.txt : Horse_Info_Crawlerで取得済みのUma_Idと取得日時
+#   Race_Crawler(id_registry=...)で1レース取得するたびにidを追記する
+#   Horse_Info_Crawler(id_registry=...)は取得済みのidをスキップする
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import datetime
+
+class IdRegistry:
+    def __init__(self, registry_dir="id_registry", columns=None):
+        """全ての年で共通のid台帳
+
+        Attributes:
+        ----------
+        registry_dir : str
+            台帳を保存するフォルダ名
+        columns : list, default None
+            記録する列名(Noneの場合はUma_Id, Jockey_Id, Trainer_Id, Owner_Id)
+        ids : dict
+            列名 -> idの集合
+        fetched : dict
+            列名 -> {id: 取得日時}
+        """
+        if columns is None:
+            columns = ["Uma_Id", "Jockey_Id", "Trainer_Id", "Owner_Id"]
+        self.columns = columns
+        self.current_dir = os.getcwd().replace(os.sep,'/')
+        self.registry_dir = registry_dir
+        if not os.path.exists(registry_dir):
+            os.mkdir(registry_dir)
+        self.load()
+
+    def file_path(self, column, suffix=""):
+        """台帳のファイルパス"""
+        return "{}/{}/{}{}.txt".format(self.current_dir, self.registry_dir, column.lower(), suffix)
+
+    def load(self):
+        """保存された台帳を読み込む"""
+        self.ids = {}
+        self.fetched = {}
+        for column in self.columns:
+            self.ids[column] = set()
+            self.fetched[column] = {}
+            if os.path.exists(self.file_path(column)):
+                with open(self.file_path(column), encoding="utf-8") as f:
+                    self.ids[column] = set(s.strip() for s in f if s.strip())
+            if os.path.exists(self.file_path(column, "_fetched")):
+                with open(self.file_path(column, "_fetched"), encoding="utf-8") as f:
+                    for s in f:
+                        id_, fetched_at = s.rstrip("\n").split("\t")
+                        # 後に書かれた日時(最新の取得)で上書き
+                        self.fetched[column][id_] = datetime.datetime.fromisoformat(fetched_at)
+
+    def add(self, data):
+        """レースデータに含まれるidを台帳に追加する
+
+        Parameters
+        ----------
+        data : list, RaceRows or pandas.DataFrame
+            レース情報の辞書のリスト(get_one_id_race_dataの出力)またはデータフレーム
+
+        Returns
+        -------
+        new_ids : dict
+            列名 -> 新しく追加されたidのリスト
+        """
+        new_ids = {}
+        for column in self.columns:
+            if hasattr(data, "columns"):
+                values = data[column].tolist() if column in data.columns else []
+            elif hasattr(data, "get_column"):
+                values = data.get_column(column) # RaceRows(辞書を作らない)
+            else:
+                values = [details[column] for details in data if column in details]
+            new_ids[column] = []
+            for id_ in values:
+                id_ = normalize_id(id_)
+                if id_ and id_ not in self.ids[column]:
+                    self.ids[column].add(id_)
+                    new_ids[column].append(id_)
+            self.append(self.file_path(column), new_ids[column])
+        return new_ids
+
+    def mark_fetched(self, column, ids, fetched_at=None):
+        """idを取得済みにする
+
+        Parameters
+        ----------
+        column : str
+            列名
+        ids : list
+            取得済みにするid
+        fetched_at : datetime.datetime, default None
+            取得日時(Noneの場合は現在時刻)
+        """
+        if fetched_at is None:
+            fetched_at = datetime.datetime.now()
+        ids = [normalize_id(id_) for id_ in ids]
+        for id_ in ids:
+            self.ids[column].add(id_)
+            self.fetched[column][id_] = fetched_at
+        self.append(self.file_path(column, "_fetched"), ["{}\t{}".format(id_, fetched_at.isoformat()) for id_ in ids])
+
+    def unfetched(self, column, ids=None):
+        """まだ取得していないidを返す
+
+        Parameters
+        ----------
+        column : str
+            列名
+        ids : list, default None
+            対象のid(Noneの場合は台帳の全id)
+
+        Returns
+        -------
+        ids : list
+            未取得のid(元の順番のまま，重複なし)
+        """
+        if ids is None:
+            ids = sorted(self.ids[column])
+        ids = dict.fromkeys(normalize_id(id_) for id_ in ids)
+        return [id_ for id_ in ids if id_ not in self.fetched[column]]
+
+    def write_id_list(self, column, filename, only_unfetched=True):
+        """クローラーの入力になるidのテキストファイルを出力する
+
+        Parameters
+        ----------
+        column : str
+            列名
+        filename : str, int
+            ファイル名(<column.lower()>/<filename>.txtに出力)
+        only_unfetched : bool, default True
+            未取得のidだけを出力するかどうか
+        """
+        output_dir = column.lower()
+        if not os.path.exists(output_dir):
+            os.mkdir(output_dir)
+        ids = self.unfetched(column) if only_unfetched else sorted(self.ids[column])
+        with open("{}/{}/{}.txt".format(self.current_dir, output_dir, filename), "w", encoding="utf-8") as f:
+            f.writelines(map(lambda x: x + "\n", ids))
+
+    def append(self, file_path, lines):
+        """ファイルに追記する"""
+        if not lines:
+            return
+        with open(file_path, "a", encoding="utf-8") as f:
+            f.writelines(map(lambda x: x + "\n", lines))
+
+def normalize_id(id_):
+    """idを文字列にそろえる(csv経由でfloatになったものも元に戻す)"""
+    if id_ is None or id_ != id_: # Noneまたは欠損値
+        return ""
+    if isinstance(id_, float) and id_.is_integer():
+        id_ = int(id_)
+    return str(id_).strip()
@@ -0,0 +1,370 @@
+# live_race.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   LiveRaceCrawler : 当日の出馬表とオッズを取得し，予測に使えるデータフレームをすぐに作る
+#   HistoryIndex    : 馬ごとの過去レースをすぐに取り出せるようにしたもの(メモリ上)
+# ---------------------------------------------------------------------------
+# 注意点
+#   出馬表 : https://race.netkeiba.com/race/shutuba.html?race_id=<race_id>
+#   オッズ : https://race.netkeiba.com/api/api_get_jra_odds.html?race_id=<race_id>&type=1 (json)
+#   過去レースの特徴量はFeatureStore.computeで作るので，get_past_race, FeatureStoreと同じ列になる
+#   馬情報はread_umainfo_tableのテーブルをjoin_umainfoで結合する(merge_umainfoと同じ)
+#   Place_Id, Class_Idなどの番号はRace_Crawlerと同じ順番で判定する
+#   base_urlを書き換えるとローカルのテスト用サーバーから取得できる
+#   latencyに出馬表の取得からデータフレームができるまでの時間(秒)が入る
+#   history_indexにHorseCache(lookup_cache.py)を渡すとファイル，データベースから過去レースを読み込んで覚えておく
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import re
+import datetime
+import pandas as pd
+from time import perf_counter
+from horse_racing_crawler.Race_ver2_03 import Crawler, RaceRows, RaceBuffer, int_
+from horse_racing_crawler.df_io import join_umainfo, to_datetime
+
+# (含まれる文字, 値, 番号)のリスト(Race_Crawlerと同じ順番で判定する)
+PLACES = [(("札幌",), "札幌", 0), (("函館",), "函館", 1), (("福島",), "福島", 2), (("中山",), "中山", 3),
+          (("東京",), "東京", 4), (("新潟",), "新潟", 5), (("中京",), "中京", 6), (("京都",), "京都", 7),
+          (("阪神",), "阪神", 8), (("小倉",), "小倉", 9)]
+CLASSES = [(("障害",), "障害", 0), (("G1",), "G1", 10), (("G2",), "G2", 9), (("G3",), "G3", 8),
+           (("(L)", "オープン"), "オープン", 7), (("3勝", "1600"), "3勝", 6), (("2勝", "1000"), "2勝", 5),
+           (("1勝", "500"), "1勝", 4), (("新馬",), "新馬", 3), (("未勝利",), "未勝利", 2)]
+FIELDS = [(("芝",), "芝", 0), (("ダ",), "ダート", 1)]
+WEATHERS = [(("晴",), "晴", 0), (("曇",), "曇", 1), (("小雨",), "小雨", 2), (("雨",), "雨", 3),
+            (("小雪",), "小雪", 4), (("雪",), "雪", 5)]
+BABAS = [(("良",), "良", 0), (("稍重",), "稍重", 1), (("重",), "重", 2), (("不良",), "不良", 3)]
+MAWARIS = [(("右",), "右", 0), (("左",), "左", 1)]
+SEXES = [(("牡",), "牡", 0), (("牝",), "牝", 1), (("セ",), "セ", 2)]
+# 券種 -> (オッズのjsonのtype, json内のキー)
+ODDS_TYPES = {
+    "tansho": ("1", "1"),
+    "fukusho": ("1", "2"),
+    "wakuren": ("3", "3"),
+    "umaren": ("4", "4"),
+    "wide": ("5", "5"),
+    "umatan": ("6", "6"),
+    "sanrenpuku": ("7", "7"),
+    "sanrentan": ("8", "8"),
+}
+# 出馬表のグレードのアイコン -> クラスの判定に使う文字
+GRADE_ICONS = {"Icon_GradeType1": "G1", "Icon_GradeType2": "G2", "Icon_GradeType3": "G3", "Icon_GradeType15": "(L)"}
+
+class HistoryIndex:
+    def __init__(self, history):
+        """馬ごとの過去レースを取り出すための索引
+
+        Attributes:
+        ----------
+        history : pandas.DataFrame
+            全レースデータ(FeatureStore.historyなど，Date列はdatetime型)
+        positions : dict
+            Uma_Id -> historyの行番号の配列
+        """
+        self.history = history.reset_index(drop=True)
+        self.positions = self.history.groupby("Uma_Id").indices if not self.history.empty else {}
+
+    def get(self, uma_ids):
+        """指定した馬の過去レースを全て取り出す
+
+        Parameters
+        ----------
+        uma_ids : list
+            馬id
+
+        Returns
+        -------
+        df_race : pandas.DataFrame
+            指定した馬の過去レース(過去レースが無い馬は含まれない)
+        """
+        rows = [self.positions[uma_id] for uma_id in uma_ids if uma_id in self.positions]
+        if not rows:
+            return self.history.iloc[0:0]
+        return self.history.take(sorted(i for positions in rows for i in positions))
+
+    def get_one(self, uma_id):
+        """1頭の過去レース(HorseCacheの読み込み先に使う)"""
+        return self.get([uma_id])
+
+class LiveRaceCrawler(Crawler):
+    base_url = "https://race.netkeiba.com"
+
+    def __init__(self, feature_store=None, umainfo=None, sleep_time=0, if_exception="raise", input_dir="race_id", output_dir="card_csv_data",
+                 history_index=None):
+        """当日の出馬表とオッズからデータフレームを作るクラス
+
+        Attributes:
+        ----------
+        feature_store : FeatureStore, default None
+            過去レースの特徴量の設定と全レースデータ(Noneの場合は過去レースの特徴量を付けない)
+        umainfo : pandas.DataFrame, default None
+            read_umainfo_tableの馬情報テーブル(Noneの場合は馬情報を付けない)
+        history_index : HistoryIndex or HorseCache, default None
+            過去レースの取り出し(Noneの場合はfeature_store.historyの索引を初期化の時に1回だけ作る)
+        latency : dict
+            直前のget_race_frameの段階ごとの時間(秒)
+        その他はCrawlerと同じ
+
+        Examples:
+        ----------
+        store = FeatureStore(["Rank", "Jockey"], rolling_columns=["Rank"])
+        crawler = LiveRaceCrawler(store, read_umainfo_table())
+        df = crawler.get_race_frame("202305010211")
+        crawler.latency                    # {"card": 0.4, "odds": 0.2, "features": 0.05, "total": 0.65}
+        """
+        super().__init__(sleep_time, if_exception, input_dir, output_dir)
+        self.feature_store = feature_store
+        self.umainfo = umainfo
+        if history_index is None:
+            history = feature_store.history if feature_store is not None else pd.DataFrame()
+            history_index = HistoryIndex(history)
+        self.history_index = history_index
+        self.latency = {}
+
+    def __call__(self, *race_ids):
+        """指定したレースのデータフレームをまとめて返す
+
+        Parameters
+        ----------
+        race_ids : tuple
+            レースid
+
+        Returns
+        -------
+        df_race : pandas.DataFrame
+            get_race_frameの出力をまとめたもの
+        """
+        return pd.concat([self.get_race_frame(race_id) for race_id in race_ids], ignore_index=True)
+
+    def get_race_frame(self, race_id):
+        """1レース分の予測に使えるデータフレームを作る
+
+        Parameters
+        ----------
+        race_id : str
+            レースid
+
+        Returns
+        -------
+        df_race : pandas.DataFrame
+            出馬表，単勝オッズ，人気，過去レースの特徴量，馬情報(馬番順)
+        """
+        self.id = str(race_id)
+        start = perf_counter()
+        with self.metrics.stage("card"):
+            data = self.get_one_id_race_data()
+        card_time = perf_counter()
+        with self.metrics.stage("odds"):
+            odds = self.get_odds()
+        odds_time = perf_counter()
+        with self.metrics.stage("features"):
+            buffer = RaceBuffer()
+            buffer.extend(data)
+            df_race = buffer.to_frame()
+            # 過去レースと同じように発走時刻まで入れる(同じ日の前のレースより後になるように)
+            df_race["Date"] = pd.to_datetime(df_race.Date).dt.strftime("%Y-%m-%d")
+            df_race = to_datetime(df_race)
+            df_race["Tansho"] = df_race.Number.map(lambda number: odds.get(number, ("", ""))[0])
+            df_race["Ninki"] = df_race.Number.map(lambda number: odds.get(number, ("", ""))[1])
+            df_race = self.add_features(df_race)
+        end = perf_counter()
+        self.latency = {"card": card_time - start, "odds": odds_time - card_time, "features": end - odds_time, "total": end - start}
+        return df_race
+
+    def add_features(self, df_race):
+        """過去レースの特徴量と馬情報を付ける"""
+        if self.feature_store is not None:
+            df_past = self.history_index.get(df_race.Uma_Id)
+            df = pd.concat([df_past, df_race], ignore_index=True)
+            card_index = df.index[len(df_past):]
+            df = df.sort_values(by=["Uma_Id", "Date"], kind="stable")
+            features = self.feature_store.compute(df)
+            features.index = df.index
+            df_race = pd.concat([df_race, features.loc[card_index].set_axis(df_race.index)], axis=1)
+        if self.umainfo is not None:
+            df_race = join_umainfo(df_race, self.umainfo)
+        return df_race.sort_values(by="Number").reset_index(drop=True)
+
+    def get_one_id_race_data(self, id=None) -> list:
+        """出馬表を取得する
+
+        Parameters
+        ----------
+        id : str, default None
+            レースid
+
+        Returns
+        -------
+        data : RaceRows
+            馬ごとの情報(着順などレース後に分かる列は空)とレース情報
+        """
+        if id is not None:
+            self.id = id
+        race = self.get_soup(self.base_url + "/race/shutuba.html?race_id=" + self.id)
+        uma_table = race.find(class_="Shutuba_Table").find_all("tr", class_="HorseList")
+        race_info = self.get_race_info(race, len(uma_table))
+        rows = [self.get_detail_row(uma_list) for uma_list in uma_table if "Cancel" not in uma_list.get("class", [])]
+        return RaceRows(rows, race_info)
+
+    def get_race_info(self, race, tousuu):
+        """出馬表のレース情報を取得(Race_Crawler.get_race_infoと同じ列)"""
+        race_data01 = race.find(class_="RaceData01").text
+        race_data02 = race.find(class_="RaceData02").text
+        race_name = race.find(class_="RaceName")
+        class_text = race_name.text + race_data02
+        for icon in race_name.find_all("span"):
+            class_text += "".join(GRADE_ICONS.get(name, "") for name in icon.get("class", []))
+
+        # 日付(開催日のリンクが無い場合は今日)
+        date = re.search(r"kaisai_date=(\d{8})", str(race.find(id="RaceList_DateList")))
+        date = datetime.datetime.strptime(date.group(1), "%Y%m%d") if date else datetime.datetime.combine(datetime.date.today(), datetime.time())
+        start_time = re.search(r"(\d{1,2}:\d{2})", race_data01)
+        kyori = re.search(r"(\d+)m", race_data01)
+        course = race_data01.split("/")[1] if "/" in race_data01 else ""
+        weather = re.search(r"天候:(\S+)", race_data01)
+        baba = re.search(r"馬場:(\S+)", race_data01)
+
+        race_info = {}
+        race_info["Date"] = date
+        race_info["Start_Time"] = start_time.group(1) if start_time else ""
+        race_info["Place"], race_info["Place_Id"] = find_code(race_data02, PLACES, 10)
+        race_info["Race_Num"] = int_(self.id[-2:])
+        race_info["Race_Id"] = self.id
+        race_info["Class"], race_info["Class_Id"] = find_code(class_text, CLASSES, 1)
+        race_info["Tousuu"] = tousuu
+        race_info["Field"], race_info["Field_Id"] = find_code(course, FIELDS, 10)
+        race_info["Kyori"] = int_(kyori.group(1)) if kyori else ""
+        race_info["Mawari"], race_info["Mawari_Id"] = find_code(course, MAWARIS, 10)
+        race_info["Baba"], race_info["BaBa_Id"] = find_code(baba.group(1) if baba else "", BABAS, 10)
+        race_info["Weather"], race_info["Weather_Id"] = find_code(weather.group(1) if weather else "", WEATHERS, 10)
+        return race_info
+
+    def get_detail_row(self, uma_list):
+        """出馬表の馬ごとの情報をタプルで取得(ENTRY_COLUMNSの順，レース後に分かる列は空)"""
+        waku = int_(uma_list.find("td", class_=re.compile("^Waku")).text.strip())
+        uma_num = int_(uma_list.find("td", class_=re.compile("^Umaban")).text.strip())
+        horse = uma_list.find(class_="HorseInfo").find("a")
+        name = horse.text.strip()
+        uma_id = int_(re.search(r"horse/(\d+)", horse.get("href")).group(1))
+        barei = uma_list.find(class_="Barei")
+        sex_age = barei.text.strip()
+        sex, sex_id = sex_age[0], find_code(sex_age[0], SEXES, 10)[1]
+        age = int_(sex_age[1:])
+        jockey_weight = float(barei.find_next_sibling("td").text.strip())
+        jockey, jockey_id = get_link(uma_list.find(class_="Jockey"))
+        trainer, trainer_id = get_link(uma_list.find(class_="Trainer"))
+        # 馬体重(発表前は空)
+        weight = uma_list.find(class_="Weight")
+        weight = weight.text.replace("(","").replace(")","").strip() if weight is not None else ""
+        if weight == "計不" or weight == "":
+            weight_today = ""
+            weight_change = ""
+        else:
+            weight_today = int_(weight[:3])
+            weight_change = int_(weight[3:])
+
+        # ENTRY_COLUMNSの順
+        return ("", waku, uma_num, name, uma_id, sex, sex_id, age, jockey_weight, jockey, jockey_id,
+                "", "", "", "", "", "", weight_today, weight_change,
+                trainer, trainer_id, "", "")
+
+    def get_odds(self, id=None):
+        """単勝オッズと人気を取得する
+
+        Parameters
+        ----------
+        id : str, default None
+            レースid
+
+        Returns
+        -------
+        odds : dict
+            馬番 -> (単勝オッズ, 人気)(発売前は空)
+        """
+        if id is not None:
+            self.id = id
+        tansho = self.get_odds_data("tansho")
+        odds = {}
+        for number, values in tansho.items():
+            odds[int(number)] = (float_or_empty(values[0]), int_(values[2]) if len(values) > 2 and values[2] else "")
+        return odds
+
+    def get_odds_data(self, bet_type):
+        """オッズのjsonから1券種分を取り出す
+
+        Parameters
+        ----------
+        bet_type : str
+            券種(ODDS_TYPESのキー)
+
+        Returns
+        -------
+        odds : dict
+            馬番を2桁ずつつなげた文字列("01", "0102"など) -> [オッズ, (複勝の上限), 人気](発売前は空)
+        """
+        api_type, key = ODDS_TYPES[bet_type]
+        response = self.get_response("{}/api/api_get_jra_odds.html?race_id={}&type={}".format(self.base_url, self.id, api_type))
+        data = response.json().get("data") or {}
+        return (data.get("odds") or {}).get(key) or {}
+
+    def get_odds_table(self, bet_type, id=None):
+        """1券種分のオッズを取得する
+
+        Parameters
+        ----------
+        bet_type : str
+            券種(ODDS_TYPESのキー)
+        id : str, default None
+            レースid
+
+        Returns
+        -------
+        odds : dict
+            馬番のタプル -> オッズ(複勝は下限)，オッズが数字でない組み合わせ(取消など)は含まない
+        """
+        if id is not None:
+            self.id = id
+        odds = {}
+        for numbers, values in self.get_odds_data(bet_type).items():
+            value = float_or_empty(values[0])
+            if value != "":
+                odds[tuple(int(numbers[i:i+2]) for i in range(0, len(numbers), 2))] = value
+        return odds
+
+    def new_buffer(self):
+        return RaceBuffer()
+
+    def build_frame(self, buffer):
+        return buffer.to_frame()
+
+    def output(self, output_filename):
+        """取得した出馬表を出力"""
+        super().output("{}_card".format(output_filename))
+
+def find_code(text, table, default_id):
+    """文字列から値と番号を判定する(見つからない場合は("", default_id))"""
+    for keywords, value, code in table:
+        if any(keyword in text for keyword in keywords):
+            return value, code
+    return "", default_id
+
+def get_link(td):
+    """リンクの文字とid(URLの最後の数字)"""
+    if td is None or td.find("a") is None:
+        return "", ""
+    a = td.find("a")
+    id_ = re.search(r"(\d+)/?$", a.get("href", ""))
+    return a.text.strip(), int_(id_.group(1)) if id_ else ""
+
+def float_or_empty(value):
+    """数字でない場合(発売前の"---.-"など)は空"""
+    try:
+        return float(value)
+    except ValueError:
+        return ""
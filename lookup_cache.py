@@ -0,0 +1,188 @@
+# lookup_cache.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   LookupCache : 関数の結果を引数ごとに覚えておくキャッシュ(LRU，有効期限，ヒット数の記録)
+#   HorseCache  : 馬ごとの過去レース，馬情報の読み込みの前に置くキャッシュ
+# ---------------------------------------------------------------------------
+# 注意点
+#   読み込み先は引数1つで結果を返す関数なら何でもよい
+#       過去レース : RaceArchive.get_history, PySQL.history, HistoryIndex.get_one
+#       馬情報     : read_umainfo_tableのテーブル(Uma_Idで引く)または Uma_Id -> 1行 の関数
+#   maxsizeを超えると最も長く使われていないものから捨てる
+#   ttl秒より前に読み込んだものは読み直す(Noneの場合は捨てられるまで使う)
+#   キャッシュした結果(データフレーム)は共有しているので変更しない(変更する場合はコピーする)
+#   複数のスレッドから使ってよい
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import time
+import threading
+from collections import OrderedDict
+import pandas as pd
+from horse_racing_crawler.df_io import to_datetime
+
+class LookupCache:
+    def __init__(self, function, maxsize=10000, ttl=None):
+        """関数の結果を覚えておくキャッシュ
+
+        Attributes:
+        ----------
+        function : callable
+            読み込みを行う関数
+        maxsize : int, default 10000
+            覚えておく結果の数
+        ttl : float, default None
+            結果を使う秒数(Noneの場合は無期限)
+        hits, misses, evictions, expired : int
+            ヒット数，ミス数，maxsizeを超えて捨てた数，期限切れで読み直した数
+
+        Examples:
+        ----------
+        history = LookupCache(RaceArchive().get_history, maxsize=50000)
+        history(2017105318)        # 読み込む
+        history(2017105318)        # キャッシュから返す
+        history.stats()            # {"hits": 1, "misses": 1, ...}
+        """
+        self.function = function
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict() # キー -> (読み込んだ時刻, 結果)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def __call__(self, *args, **kwargs):
+        """キャッシュにあればそれを，無ければ読み込んで返す"""
+        key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if self.ttl is None or now - entry[0] < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self.expired += 1
+            self.misses += 1
+        # 読み込み中はロックを外す(同じキーを同時に読み込むことはある)
+        value = self.function(*args, **kwargs)
+        with self.lock:
+            self.entries[key] = (now, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, *args, **kwargs):
+        """指定した引数の結果を捨てる(引数が無い場合は全て)"""
+        with self.lock:
+            if not args and not kwargs:
+                self.entries.clear()
+                return
+            key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+            self.entries.pop(key, None)
+
+    def stats(self):
+        """ヒット数などの集計
+
+        Returns
+        -------
+        stats : dict
+            hits, misses, evictions, expired, size(今覚えている数), hit_rate
+        """
+        with self.lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "expired": self.expired,
+                    "size": len(self.entries), "hit_rate": self.hits / total if total else 0.0}
+
+class HorseCache:
+    def __init__(self, history=None, profile=None, maxsize=10000, ttl=None):
+        """馬ごとの過去レース，馬情報のキャッシュ
+
+        Attributes:
+        ----------
+        history : callable, default None
+            Uma_Id -> その馬の過去レースのデータフレーム(RaceArchive.get_historyなど)
+        profile : callable or pandas.DataFrame, default None
+            Uma_Id -> 馬情報の1行，またはUma_Idをインデックスにした馬情報テーブル
+        maxsize : int, default 10000
+            過去レース，馬情報それぞれで覚えておく馬の数
+        ttl : float, default None
+            結果を使う秒数(Noneの場合は無期限)
+
+        Examples:
+        ----------
+        cache = HorseCache(RaceArchive().get_history, read_umainfo_table(), maxsize=50000)
+        crawler = LiveRaceCrawler(store, history_index=cache)  # 過去レースはcache.getで取り出す
+        cache.stats()
+        """
+        if isinstance(profile, pd.DataFrame):
+            profile = self.table_lookup(profile)
+        self.history_cache = LookupCache(self.read_history(history), maxsize, ttl) if history is not None else None
+        self.profile_cache = LookupCache(profile, maxsize, ttl) if profile is not None else None
+
+    def read_history(self, history):
+        """Date列をdatetime型にしてから覚える(FeatureStore.historyと同じ形にする)"""
+        def read(uma_id):
+            df_history = history(uma_id)
+            if df_history.empty:
+                return df_history
+            return to_datetime(df_history.copy())
+        return read
+
+    def table_lookup(self, df_umainfo):
+        """馬情報テーブルから1行取り出す関数(無い馬はNone)"""
+        def lookup(uma_id):
+            if uma_id not in df_umainfo.index:
+                return None
+            return df_umainfo.loc[uma_id]
+        return lookup
+
+    def history(self, uma_id):
+        """1頭の過去レース"""
+        return self.history_cache(uma_id)
+
+    def get(self, uma_ids):
+        """複数の馬の過去レース(HistoryIndex.getと同じ)
+
+        Parameters
+        ----------
+        uma_ids : list
+            馬id
+
+        Returns
+        -------
+        df_race : pandas.DataFrame
+            指定した馬の過去レース(過去レースが無い馬は含まれない)
+        """
+        df_list = [df for df in map(self.history, uma_ids) if not df.empty]
+        if not df_list:
+            return pd.DataFrame()
+        return pd.concat(df_list, ignore_index=True)
+
+    def profile(self, uma_id):
+        """1頭の馬情報(無い馬はNone)"""
+        return self.profile_cache(uma_id)
+
+    def profiles(self, uma_ids):
+        """複数の馬の馬情報(Uma_Idをインデックスにしたデータフレーム，無い馬は含まれない)"""
+        rows = {uma_id: row for uma_id, row in zip(uma_ids, map(self.profile, uma_ids)) if row is not None}
+        return pd.DataFrame.from_dict(rows, orient="index").rename_axis("Uma_Id")
+
+    def stats(self):
+        """過去レース，馬情報それぞれのヒット数などの集計"""
+        stats = {}
+        if self.history_cache is not None:
+            stats["history"] = self.history_cache.stats()
+        if self.profile_cache is not None:
+            stats["profile"] = self.profile_cache.stats()
+        return stats
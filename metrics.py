@@ -0,0 +1,210 @@
+# metrics.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   CrawlMetrics : クロールの計測(id毎の通信時間，バイト数，解析時間，リトライ，例外)
+# ---------------------------------------------------------------------------
+# 注意点
+#   Crawlerは1年分(1ファイル分)取得するたびに
+#   crawl_metrics/<filename>_<クラス名>.json と .prom を出力する
+#   .promはPrometheusのテキスト形式(node_exporterのtextfile collectorで読める)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import json
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# ヒストグラムの区切り(秒)
+BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+class CrawlMetrics:
+    def __init__(self, name="crawl"):
+        """クロールの計測結果を記録するクラス
+
+        Attributes:
+        ----------
+        name : str
+            計測の名前(出力するメトリクスのラベルに使う)
+        records : list
+            id毎の計測結果
+        stage_time : dict
+            段階(network, parse, dataframe, sleep, output)ごとの合計時間
+        """
+        self.name = name
+        self.records = []
+        self.stage_time = defaultdict(float)
+        self.record = None
+        self.start_time = time.perf_counter()
+
+    def start_id(self, id):
+        """id一つ分の計測を始める"""
+        self.record = {"id": id, "fetch_time": 0.0, "bytes": 0, "parse_time": 0.0, "wait_time": 0.0,
+                       "retries": 0, "status": None, "error": None}
+        self.id_start_time = time.perf_counter()
+
+    def end_id(self, error=None):
+        """id一つ分の計測を終える
+
+        Parameters
+        ----------
+        error : Exception, default None
+            発生した例外
+        """
+        if self.record is None:
+            return
+        total = time.perf_counter() - self.id_start_time
+        # 通信，待ち時間以外の時間は解析(BeautifulSoupの変換と値の取り出し)とみなす
+        self.record["parse_time"] = max(total - self.record["fetch_time"] - self.record["wait_time"], 0.0)
+        self.stage_time["parse"] += self.record["parse_time"]
+        if error is not None:
+            self.record["error"] = type(error).__name__
+        self.records.append(self.record)
+        self.record = None
+
+    def add_fetch(self, fetch_time, nbytes, status, retries=0):
+        """通信1回分を記録する
+
+        Parameters
+        ----------
+        fetch_time : float
+            通信にかかった時間(秒)
+        nbytes : int
+            受信したバイト数
+        status : int
+            HTTPステータスコード
+        retries : int, default 0
+            リトライした回数
+        """
+        self.stage_time["network"] += fetch_time
+        if self.record is None:
+            return
+        self.record["fetch_time"] += fetch_time
+        self.record["bytes"] += nbytes
+        self.record["status"] = status
+        self.record["retries"] += retries
+
+    @contextmanager
+    def stage(self, name):
+        """with文の中の時間をname段階の時間として記録する(idの途中のsleepはそのidの待ち時間にもする)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stage_time[name] += elapsed
+            if name == "sleep" and self.record is not None:
+                self.record["wait_time"] += elapsed
+
+    def summary(self):
+        """計測結果をまとめる
+
+        Returns
+        -------
+        summary : dict
+            集計結果
+        """
+        elapsed = time.perf_counter() - self.start_time
+        errors = Counter(record["error"] for record in self.records if record["error"] is not None)
+        return {
+            "name": self.name,
+            "elapsed": elapsed,
+            "ids": len(self.records),
+            "errors": sum(errors.values()),
+            "errors_by_class": dict(errors),
+            "ids_per_second": len(self.records) / elapsed if elapsed > 0 else 0.0,
+            "bytes": sum(record["bytes"] for record in self.records),
+            "retries": sum(record["retries"] for record in self.records),
+            "status": dict(Counter(str(record["status"]) for record in self.records)),
+            "stage_time": dict(self.stage_time),
+            "fetch_time": histogram([record["fetch_time"] for record in self.records]),
+            "parse_time": histogram([record["parse_time"] for record in self.records]),
+        }
+
+    def to_json(self, file_path, with_records=True):
+        """集計結果(とid毎の計測結果)をjsonで出力する"""
+        summary = self.summary()
+        if with_records:
+            summary["records"] = self.records
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, file_path):
+        """集計結果をPrometheusのテキスト形式で出力する"""
+        summary = self.summary()
+        label = 'crawler="{}"'.format(self.name)
+        lines = []
+        for key in ["fetch_time", "parse_time"]:
+            metric = "crawl_{}_seconds".format(key.replace("_time", ""))
+            lines.append("# TYPE {} histogram".format(metric))
+            for le, count in summary[key]["buckets"].items():
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(metric, label, le, count))
+            lines.append("{}_sum{{{}}} {}".format(metric, label, summary[key]["sum"]))
+            lines.append("{}_count{{{}}} {}".format(metric, label, summary[key]["count"]))
+        lines.append("# TYPE crawl_stage_seconds_total counter")
+        for stage, seconds in summary["stage_time"].items():
+            lines.append('crawl_stage_seconds_total{{{},stage="{}"}} {}'.format(label, stage, seconds))
+        lines.append("# TYPE crawl_errors_total counter")
+        for error, count in summary["errors_by_class"].items():
+            lines.append('crawl_errors_total{{{},exception="{}"}} {}'.format(label, error, count))
+        for key in ["ids", "bytes", "retries"]:
+            lines.append("# TYPE crawl_{}_total counter".format(key))
+            lines.append("crawl_{}_total{{{}}} {}".format(key, label, summary[key]))
+        lines.append("# TYPE crawl_ids_per_second gauge")
+        lines.append("crawl_ids_per_second{{{}}} {}".format(label, summary["ids_per_second"]))
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def export(self, output_dir, filename):
+        """json, promの両方を出力する
+
+        Parameters
+        ----------
+        output_dir : str
+            出力するフォルダ名
+        filename : str
+            ファイル名(拡張子不要)
+        """
+        if not os.path.exists(output_dir):
+            os.mkdir(output_dir)
+        self.to_json("{}/{}.json".format(output_dir, filename))
+        self.to_prometheus("{}/{}.prom".format(output_dir, filename))
+
+def histogram(values, buckets=BUCKETS):
+    """累積ヒストグラムを作る
+
+    Parameters
+    ----------
+    values : list
+        値のリスト
+    buckets : list
+        区切り
+
+    Returns
+    -------
+    histogram : dict
+        buckets(区切り -> その値以下の個数), sum, count, 平均, 50/90/99パーセンタイル
+    """
+    values = sorted(values)
+    count = len(values)
+    cumulative = {str(le): bisect_left(values, le + 1e-12) for le in buckets}
+    cumulative["+Inf"] = count
+    def percentile(q):
+        return values[min(int(q * count), count - 1)] if count else 0.0
+    return {
+        "buckets": cumulative,
+        "sum": sum(values),
+        "count": count,
+        "mean": sum(values) / count if count else 0.0,
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+    }
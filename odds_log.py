@@ -0,0 +1,326 @@
+# odds_log.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   OddsLog       : オッズの時系列を追記のみのバイナリファイルに保存する
+#   OddsCollector : 発走前のレースのオッズを一定間隔で取得してOddsLogに保存する
+# ---------------------------------------------------------------------------
+# 注意点
+#   odds_log/<race_id[:10]>.odds  : 1開催日1会場分のオッズ(RECORD_DTYPEの固定長レコード，19バイト)
+#   odds_log/<race_id[:10]>.start : レースid<TAB>発走時刻
+#   前回から変わったオッズだけを書き込む(ある時刻のオッズはその時刻以前の最後のレコード)
+#   組み合わせは馬番を20進数にした整数(1-2 -> 1*400 + 2*20 + 0)
+#   複勝，ワイドのオッズは下限
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import datetime
+import numpy as np
+import pandas as pd
+from time import sleep, monotonic
+from horse_racing_crawler.payout_store import BET_SIZES
+
+# 券種の番号(BET_SIZESの順)
+BET_TYPE_CODES = {bet_type: code for code, bet_type in enumerate(BET_SIZES)}
+# 1レコードの形式
+RECORD_DTYPE = np.dtype([("race_id", "<i8"), ("time", "<u4"), ("bet_type", "u1"), ("combination", "<u2"), ("odds", "<f4")])
+# 組み合わせの桁(馬番の最大値+1)
+BASE = 20
+# 時刻はこの時刻からの秒数(タイムゾーンなし，日本時間のまま)
+EPOCH = datetime.datetime(1970, 1, 1)
+
+class OddsLog:
+    def __init__(self, log_dir="odds_log"):
+        """オッズの時系列を保存するクラス
+
+        Attributes:
+        ----------
+        log_dir : str
+            保存するフォルダ名
+        last_odds : dict
+            (race_id, bet_type, combination) -> 最後に書き込んだオッズ(発走したレースは消す)
+
+        Examples:
+        ----------
+        log = OddsLog()
+        log.append("202105010311", "tansho", {(1,): 2.3, (2,): 5.1})
+        log.read("202105010311")                                   # 全ての記録
+        log.at("202105010311", datetime.datetime(2021, 2, 7, 15, 35))
+        log.minutes_before("202105010311", 10)                    # 発走10分前のオッズ
+        """
+        self.current_dir = os.getcwd().replace(os.sep,'/')
+        self.log_dir = log_dir
+        self.last_odds = {}
+        if not os.path.exists(log_dir):
+            os.mkdir(log_dir)
+
+    def file_path(self, race_id, suffix=".odds"):
+        """レースidの記録が入っているファイル"""
+        return "{}/{}/{}{}".format(self.current_dir, self.log_dir, str(race_id)[:10], suffix)
+
+    def append(self, race_id, bet_type, odds, timestamp=None):
+        """1レース1券種分のオッズを追記する(前回から変わったものだけ)
+
+        Parameters
+        ----------
+        race_id : str
+            レースid
+        bet_type : str
+            券種
+        odds : dict
+            馬番のタプル -> オッズ(LiveRaceCrawler.get_odds_tableの出力)
+        timestamp : datetime.datetime, default None
+            取得時刻(Noneの場合は現在時刻)
+
+        Returns
+        -------
+        count : int
+            書き込んだレコード数
+        """
+        if timestamp is None:
+            timestamp = datetime.datetime.now()
+        race_id = str(race_id)
+        records = []
+        for numbers, value in odds.items():
+            combination = encode(numbers)
+            key = (race_id, bet_type, combination)
+            if self.last_odds.get(key) == np.float32(value):
+                continue
+            self.last_odds[key] = np.float32(value)
+            records.append((int(race_id), int((timestamp - EPOCH).total_seconds()), BET_TYPE_CODES[bet_type], combination, value))
+        if records:
+            with open(self.file_path(race_id), "ab") as f:
+                np.array(records, dtype=RECORD_DTYPE).tofile(f)
+        return len(records)
+
+    def set_start_time(self, race_id, start_time):
+        """発走時刻を記録する"""
+        with open(self.file_path(race_id, ".start"), "a", encoding="utf-8") as f:
+            f.write("{}\t{}\n".format(race_id, start_time.isoformat()))
+
+    def get_start_time(self, race_id):
+        """記録された発走時刻(無い場合はNone)"""
+        start_time = None
+        if os.path.exists(self.file_path(race_id, ".start")):
+            with open(self.file_path(race_id, ".start"), encoding="utf-8") as f:
+                for s in f:
+                    id_, time = s.rstrip("\n").split("\t")
+                    if id_ == str(race_id):
+                        start_time = datetime.datetime.fromisoformat(time) # 後に書かれた時刻で上書き
+        return start_time
+
+    def finish(self, race_id):
+        """発走したレースの前回のオッズをメモリから消す"""
+        race_id = str(race_id)
+        self.last_odds = {key: value for key, value in self.last_odds.items() if key[0] != race_id}
+
+    def records(self, race_id):
+        """レースの全レコード(numpyの構造化配列，ファイルはメモリマップで読む)"""
+        path = self.file_path(race_id)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(os.path.getsize(path) // RECORD_DTYPE.itemsize,))
+        return records[records["race_id"] == int(race_id)]
+
+    def read(self, race_id, bet_type=None):
+        """レースの記録をデータフレームにする
+
+        Parameters
+        ----------
+        race_id : str
+            レースid
+        bet_type : str, default None
+            券種(Noneの場合は全て)
+
+        Returns
+        -------
+        df_odds : pandas.DataFrame
+            Race_Id, Bet_Type, Num1, Num2, Num3, Time, Odds(時刻順)
+        """
+        records = self.records(race_id)
+        if bet_type is not None:
+            records = records[records["bet_type"] == BET_TYPE_CODES[bet_type]]
+        combination = records["combination"].astype(np.int64)
+        df_odds = pd.DataFrame({
+            "Race_Id": str(race_id),
+            "Bet_Type": np.array(list(BET_SIZES), dtype=object)[records["bet_type"]],
+            "Num1": combination // (BASE * BASE),
+            "Num2": combination // BASE % BASE,
+            "Num3": combination % BASE,
+            "Time": pd.to_datetime(records["time"].astype(np.int64), unit="s"),
+            "Odds": records["odds"].astype(float),
+        })
+        return df_odds.sort_values("Time", kind="stable").reset_index(drop=True)
+
+    def at(self, race_id, time, bet_type="tansho"):
+        """ある時刻のオッズ(その時刻以前の最後の記録)
+
+        Parameters
+        ----------
+        race_id : str
+            レースid
+        time : datetime.datetime
+            時刻
+        bet_type : str, default "tansho"
+            券種
+
+        Returns
+        -------
+        df_odds : pandas.DataFrame
+            組み合わせごとに1行(readと同じ列，Timeは記録された時刻)
+        """
+        df_odds = self.read(race_id, bet_type)
+        df_odds = df_odds[df_odds.Time <= pd.Timestamp(time)]
+        df_odds = df_odds.drop_duplicates(subset=["Num1", "Num2", "Num3"], keep="last")
+        return df_odds.sort_values(["Num1", "Num2", "Num3"]).reset_index(drop=True)
+
+    def minutes_before(self, race_id, minutes, bet_type="tansho", start_time=None):
+        """発走minutes分前のオッズ
+
+        Parameters
+        ----------
+        race_id : str
+            レースid
+        minutes : float
+            発走の何分前か
+        bet_type : str, default "tansho"
+            券種
+        start_time : datetime.datetime, default None
+            発走時刻(Noneの場合は記録された発走時刻)
+
+        Returns
+        -------
+        df_odds : pandas.DataFrame
+            atと同じ
+        """
+        if start_time is None:
+            start_time = self.get_start_time(race_id)
+            if start_time is None:
+                raise ValueError("start time of {} is not recorded".format(race_id))
+        return self.at(race_id, start_time - datetime.timedelta(minutes=minutes), bet_type)
+
+class OddsCollector:
+    def __init__(self, crawler, odds_log=None, bet_types=("tansho", "fukusho", "umaren"), interval=60,
+                 final_interval=15, final_minutes=10, start_time_ttl=300):
+        """発走前のオッズを一定間隔で取得するクラス
+
+        Attributes:
+        ----------
+        crawler : LiveRaceCrawler
+            出馬表，オッズの取得に使うクローラー
+        odds_log : OddsLog, default None
+            保存先(Noneの場合はodds_log/)
+        bet_types : tuple
+            取得する券種
+        interval : float, default 60
+            取得の間隔(秒)
+        final_interval : float, default 15
+            発走final_minutes分前からの取得の間隔(秒)
+        final_minutes : float, default 10
+            final_intervalに切り替える時間(分)
+        start_time_ttl : float, default 300
+            出馬表に発走時刻が無かったレースを，出馬表を取り直さずに「未定」として扱う秒数
+
+        Examples:
+        ----------
+        collector = OddsCollector(LiveRaceCrawler())
+        collector.run(["202105010301", "202105010302"])   # 全レースが発走するまで取得を続ける
+        """
+        self.crawler = crawler
+        self.odds_log = odds_log if odds_log is not None else OddsLog()
+        self.bet_types = bet_types
+        self.interval = interval
+        self.final_interval = final_interval
+        self.final_minutes = final_minutes
+        self.start_time_ttl = start_time_ttl
+        self.start_times = {}
+        self.unknown_start_times = {} # 発走時刻が無かったレースid -> 出馬表を確認した時刻(monotonic)
+
+    def get_start_time(self, race_id):
+        """発走時刻(初回だけ出馬表から取得して記録する)
+
+        出馬表に無い場合はNone(start_time_ttl秒の間は出馬表を取り直さずにNoneを返す)
+        """
+        race_id = str(race_id)
+        if race_id not in self.start_times:
+            checked_at = self.unknown_start_times.get(race_id)
+            if checked_at is not None and monotonic() - checked_at < self.start_time_ttl:
+                return None
+            start_time = self.odds_log.get_start_time(race_id)
+            if start_time is None:
+                race_info = self.crawler.get_one_id_race_data(race_id).race_info
+                if not race_info["Start_Time"]:
+                    self.unknown_start_times[race_id] = monotonic()
+                    return None
+                hour, minute = race_info["Start_Time"].split(":")
+                start_time = race_info["Date"].replace(hour=int(hour), minute=int(minute))
+                self.odds_log.set_start_time(race_id, start_time)
+            self.unknown_start_times.pop(race_id, None)
+            self.start_times[race_id] = start_time
+        return self.start_times[race_id]
+
+    def poll(self, race_ids, now=None):
+        """発走前のレースのオッズを1回取得する
+
+        Parameters
+        ----------
+        race_ids : list
+            レースid
+        now : datetime.datetime, default None
+            現在時刻(テスト用)
+
+        Returns
+        -------
+        waiting : list
+            まだ発走していないレースid(発走時刻が分からないレースを含む)
+        """
+        waiting = []
+        for race_id in race_ids:
+            now_ = now if now is not None else datetime.datetime.now()
+            start_time = self.get_start_time(race_id)
+            if start_time is not None and now_ >= start_time:
+                self.odds_log.finish(race_id)
+                continue
+            waiting.append(race_id)
+            self.crawler.id = str(race_id)
+            for bet_type in self.bet_types:
+                odds = self.crawler.get_odds_table(bet_type)
+                self.odds_log.append(race_id, bet_type, odds, now_)
+        return waiting
+
+    def next_interval(self, race_ids, now=None):
+        """次の取得までの時間(発走が近いレースがあればfinal_interval)"""
+        if now is None:
+            now = datetime.datetime.now()
+        final = datetime.timedelta(minutes=self.final_minutes)
+        start_times = [self.get_start_time(race_id) for race_id in race_ids]
+        if any(start_time is not None and start_time - now <= final for start_time in start_times):
+            return self.final_interval
+        return self.interval
+
+    def run(self, race_ids):
+        """全てのレースが発走するまでオッズを取得し続ける
+
+        Parameters
+        ----------
+        race_ids : list
+            レースid
+        """
+        race_ids = [str(race_id) for race_id in race_ids]
+        while race_ids:
+            race_ids = self.poll(race_ids)
+            print("\r{} : 残り{}レース".format(datetime.datetime.now().strftime("%H:%M:%S"), len(race_ids)), end="")
+            if race_ids:
+                sleep(self.next_interval(race_ids))
+        print("\r全レース発走\n", end="")
+
+def encode(numbers):
+    """馬番のタプルを組み合わせの整数にする"""
+    numbers = list(numbers) + [0] * (3 - len(numbers))
+    return (numbers[0] * BASE + numbers[1]) * BASE + numbers[2]
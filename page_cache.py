@@ -0,0 +1,114 @@
+# page_cache.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   PageCache    : URLごとのETag, Last-Modified, 本文のハッシュを保存する
+#   PageNotModified : 前回取得した時からページが変わっていない時の例外
+# ---------------------------------------------------------------------------
+# 注意点
+#   crawler.page_cache = PageCache() とするとCrawler.get_responseが条件付きリクエストを送る
+#   304が返ってきた時と本文のハッシュが前回と同じ時はPageNotModifiedを出し，解析を行わない
+#   (クローラーはそのidを変更なしとして数え，エラーにはしない)
+#   ハッシュなどは解析まで成功した時だけ保存する(失敗したページは次回も取得し直す)
+#   クローラーのクラスごとに記録する(Race_CrawlerとPayout_Crawlerが同じURLを取得してもよい)
+#   変更のないページは出力に入らないので，年ごとのcsvを作り直す時ではなく
+#   取り直し(HorseCrawlPlannerなど，出力を既存のデータに上書きする場合)に使う
+#   (Crawler.merges_outputがFalseのクローラーに付けるとValueError)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import time
+import hashlib
+import sqlite3
+
+class PageNotModified(Exception):
+    """前回取得した時からページが変わっていない"""
+
+class PageCache:
+    def __init__(self, path="page_cache.sqlite"):
+        """URLごとのETag, Last-Modified, 本文のハッシュを保存するクラス
+
+        Attributes:
+        ----------
+        path : str
+            SQLiteのファイル名
+        pending : dict
+            (crawler, url) -> (etag, last_modified, hash)，まだ保存していないもの(解析が成功したらsaveで保存)
+
+        Examples:
+        ----------
+        crawler = Horse_Info_Crawler(id_registry=planner.id_registry, skip_fetched=False)
+        crawler.page_cache = PageCache()
+        crawler("plan_2018_2022")          # 変わっていない馬は解析せずcrawler.unchanged_idに入る
+        """
+        self.path = path
+        self.con = sqlite3.connect(path, timeout=60)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS pages (
+            crawler TEXT, url TEXT, etag TEXT, last_modified TEXT, hash TEXT, fetched_at REAL,
+            PRIMARY KEY (crawler, url))""")
+        self.con.commit()
+        self.pending = {}
+
+    def get(self, crawler, url):
+        """保存された(etag, last_modified, hash)，無い場合はNone"""
+        return self.con.execute("SELECT etag, last_modified, hash FROM pages WHERE crawler = ? AND url = ?",
+                                (crawler, url)).fetchone()
+
+    def request_headers(self, crawler, url):
+        """条件付きリクエストのヘッダー"""
+        page = self.get(crawler, url)
+        headers = {}
+        if page is not None:
+            etag, last_modified, _ = page
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def check(self, crawler, url, response):
+        """レスポンスが前回と同じか確認する
+
+        Parameters
+        ----------
+        crawler : str
+            クローラーのクラス名
+        url : str
+            URL
+        response : requests.Response
+            レスポンス
+
+        Raises
+        ------
+        PageNotModified
+            304の時，または本文のハッシュが前回と同じ時
+        """
+        if response.status_code == 304:
+            raise PageNotModified(url)
+        if response.status_code != 200:
+            return
+        content_hash = hashlib.sha1(response.content).hexdigest()
+        page = self.get(crawler, url)
+        if page is not None and page[2] == content_hash:
+            raise PageNotModified(url)
+        self.pending[(crawler, url)] = (response.headers.get("ETag"), response.headers.get("Last-Modified"), content_hash)
+
+    def save(self):
+        """解析が成功したページのETagなどを保存する"""
+        if not self.pending:
+            return
+        now = time.time()
+        self.con.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                             [key + page + (now,) for key, page in self.pending.items()])
+        self.con.commit()
+        self.pending = {}
+
+    def discard(self):
+        """解析が失敗したページのETagなどを捨てる"""
+        self.pending = {}
@@ -0,0 +1,309 @@
+# payout_store.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   PayoutStore : 全ての年の払い戻し(1組み合わせ1行)をまとめ，買い目の払い戻しをまとめて引く
+# ---------------------------------------------------------------------------
+# 関数
+#   normalize_bets : 買い目の馬番を並べ替える(順番に意味のない券種は小さい順)
+#   wide_to_long   : 今までの<year>_all_payout.csvとレースデータから1組み合わせ1行の形式を作る
+# ---------------------------------------------------------------------------
+# 注意点
+#   1組み合わせ1行の形式(PAYOUT_COLUMNS)
+#       Race_Id, Bet_Type, Num1, Num2, Num3, Payout
+#       Bet_Type : BET_TYPESの値(tansho, fukusho, ...)
+#       Num1~3   : 馬番(枠連は枠番)，使わない所は0
+#       Payout   : 100円あたりの払い戻し(円)
+#   Payout_Crawler(output_mode="long" or "both")で<year>_payout_long.csvが出力される
+#   買い目はRace_Id, Bet_Type, Num1~3の列を持つデータフレームで渡す(Strategy列で戦略を分ける)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import numpy as np
+import pandas as pd
+from horse_racing_crawler.df_io import read_race_data
+
+# 払い戻し表の見出し -> 券種
+BET_TYPES = {
+    "単勝": "tansho",
+    "複勝": "fukusho",
+    "枠連": "wakuren",
+    "馬連": "umaren",
+    "ワイド": "wide",
+    "馬単": "umatan",
+    "三連複": "sanrenpuku",
+    "三連単": "sanrentan",
+}
+# 券種 -> 選ぶ馬の数
+BET_SIZES = {
+    "tansho": 1,
+    "fukusho": 1,
+    "wakuren": 2,
+    "umaren": 2,
+    "wide": 2,
+    "umatan": 2,
+    "sanrenpuku": 3,
+    "sanrentan": 3,
+}
+# 着順通りに当てる券種(これ以外は馬番を小さい順に並べる)
+ORDERED_BET_TYPES = ("umatan", "sanrentan")
+
+NUM_COLUMNS = ["Num1", "Num2", "Num3"]
+KEY_COLUMNS = ["Race_Id", "Bet_Type"] + NUM_COLUMNS
+PAYOUT_COLUMNS = KEY_COLUMNS + ["Payout"]
+# データベースに書き込む時の列の型
+PAYOUT_TYPES = dict(zip(PAYOUT_COLUMNS, (int, str, int, int, int, int)))
+
+class PayoutStore:
+    def __init__(self, store_dir="payout_store"):
+        """全ての年の払い戻しをまとめたもの
+
+        Attributes:
+        ----------
+        store_dir : str
+            payout.pickleを保存するフォルダ名
+        table : pandas.DataFrame
+            Payout列のデータフレーム(インデックスはRace_Id, Bet_Type, Num1, Num2, Num3でソート済み)
+
+        Examples:
+        ----------
+        store = PayoutStore()
+        store.build(2010, 2022)                  # payout_csv_dataから作成
+        df_bets["Payout"] = store.lookup(df_bets)  # 買い目ごとの払い戻し(外れは0)
+        store.evaluate(df_bets)                  # Strategyごとの的中率，回収率
+        """
+        self.current_dir = os.getcwd().replace(os.sep,'/')
+        self.store_dir = store_dir
+        self.table = None
+        self.load()
+
+    def file_path(self):
+        """保存先のファイルパス"""
+        return "{}/{}/payout.pickle".format(self.current_dir, self.store_dir)
+
+    def load(self):
+        """保存されたデータを読み込む"""
+        if os.path.exists(self.file_path()):
+            self.table = pd.read_pickle(self.file_path())
+
+    def save(self):
+        """データを保存する"""
+        if not os.path.exists(self.store_dir):
+            os.mkdir(self.store_dir)
+        self.table.to_pickle(self.file_path())
+
+    def build(self, start_year, end_year=None, input_dir="payout_csv_data", race_dir="race_csv_data"):
+        """年ごとの払い戻しを読み込んで作り直す
+
+        Parameters
+        ----------
+        start_year : int
+            読み込む最初の年
+        end_year : int, default None
+            読み込む最後の年(Noneの場合はstart_yearのみ)
+        input_dir : str
+            <year>_payout_long.csvまたは<year>_all_payout.csvのフォルダ名
+        race_dir : str
+            <year>_all_race.csvのフォルダ名(<year>_all_payout.csvから変換する時に使う)
+
+        Returns
+        -------
+        table : pandas.DataFrame
+            作成したデータ
+        """
+        if end_year is None:
+            end_year = start_year
+        df_list = []
+        for year in range(start_year, end_year+1):
+            long_path = "{}/{}/{}_payout_long.csv".format(self.current_dir, input_dir, year)
+            if os.path.exists(long_path):
+                df_list.append(pd.read_csv(long_path, encoding="shift-jis"))
+                continue
+            # 1組み合わせ1行の形式が無い年は今までの形式から変換する
+            df_payout = pd.read_csv("{}/{}/{}_all_payout.csv".format(self.current_dir, input_dir, year), encoding="shift-jis")
+            df_race = read_race_data(year, race_dir)
+            df_list.append(wide_to_long(df_payout, df_race))
+            print("\r{} : {}_all_payout.csvから変換\n".format(year, year), end="")
+        self.table = None
+        return self.update(pd.concat(df_list, ignore_index=True))
+
+    def update(self, df_new):
+        """払い戻しを追加する(同じ組み合わせは新しい方で上書き)
+
+        Parameters
+        ----------
+        df_new : pandas.DataFrame
+            PAYOUT_COLUMNSの列を持つデータフレーム(Payout_Crawler.payout_longなど)
+
+        Returns
+        -------
+        table : pandas.DataFrame
+            更新後のデータ
+        """
+        df_new = normalize_bets(df_new[PAYOUT_COLUMNS])
+        df_new = df_new.set_index(KEY_COLUMNS)[["Payout"]]
+        if self.table is not None:
+            df_new = pd.concat([self.table, df_new])
+        df_new = df_new[~df_new.index.duplicated(keep="last")]
+        self.table = df_new.sort_index()
+        self.save()
+        return self.table
+
+    def lookup(self, bets):
+        """買い目ごとの払い戻しを引く
+
+        Parameters
+        ----------
+        bets : pandas.DataFrame
+            Race_Id, Bet_Type, Num1(, Num2, Num3)の列を持つ買い目
+
+        Returns
+        -------
+        payout : numpy.ndarray
+            100円あたりの払い戻し(外れは0)，betsと同じ順番
+        """
+        bets = normalize_bets(bets)
+        index = pd.MultiIndex.from_frame(bets[KEY_COLUMNS])
+        return self.table["Payout"].reindex(index).fillna(0).to_numpy()
+
+    def evaluate(self, bets, by="Strategy", stake=100):
+        """買い目をまとめて評価する
+
+        Parameters
+        ----------
+        bets : pandas.DataFrame
+            lookupと同じ買い目(Stake列があれば1点ごとの賭け金として使う)
+        by : str or list, default "Strategy"
+            まとめる列(betsに無い場合は全体で1行)
+        stake : int, default 100
+            Stake列が無い時の1点あたりの賭け金
+
+        Returns
+        -------
+        df_result : pandas.DataFrame
+            Bets(点数), Hits(的中数), Stake(賭け金), Return(払い戻し), Hit_Rate, ROI(回収率)
+        """
+        bets_stake = bets["Stake"].to_numpy() if "Stake" in bets.columns else np.full(len(bets), stake)
+        payout = self.lookup(bets)
+        df = pd.DataFrame({
+            "Bets": 1,
+            "Hits": (payout > 0).astype(int),
+            "Stake": bets_stake,
+            "Return": payout * bets_stake / 100,
+        }, index=bets.index)
+        if isinstance(by, str):
+            by = [by]
+        by = [column for column in by if column in bets.columns]
+        if by:
+            df_result = df.groupby([bets[column] for column in by]).sum()
+        else:
+            df_result = df.sum().to_frame().T.astype(df.dtypes.to_dict())
+        df_result["Hit_Rate"] = df_result["Hits"] / df_result["Bets"]
+        df_result["ROI"] = df_result["Return"] / df_result["Stake"]
+        return df_result
+
+def normalize_bets(bets):
+    """買い目の形をそろえる
+
+    Parameters
+    ----------
+    bets : pandas.DataFrame
+        Race_Id, Bet_Type, Num1(, Num2, Num3)の列を持つデータフレーム
+
+    Returns
+    -------
+    bets : pandas.DataFrame
+        Race_Idは文字列，Num1~3は整数(使わない所は0)，順番に意味のない券種は小さい順にしたもの
+    """
+    bets = bets.copy()
+    bets["Race_Id"] = bets["Race_Id"].astype(str)
+    for column in NUM_COLUMNS:
+        if column not in bets.columns:
+            bets[column] = 0
+    nums = bets[NUM_COLUMNS].fillna(0).to_numpy(dtype=np.int64, copy=True)
+    unordered = ~bets["Bet_Type"].isin(ORDERED_BET_TYPES).to_numpy()
+    # 0(使わない所)を後ろに回して小さい順に並べる
+    sorted_nums = np.sort(np.where(nums == 0, np.iinfo(np.int64).max, nums), axis=1)
+    sorted_nums[sorted_nums == np.iinfo(np.int64).max] = 0
+    nums[unordered] = sorted_nums[unordered]
+    bets[NUM_COLUMNS] = nums
+    return bets
+
+def split_numbers(value):
+    """"1 - 2"や"1 → 2 → 3"を馬番のリストにする"""
+    if value != value: # 欠損値
+        return []
+    value = str(value).replace("→", "-")
+    return [int(float(s)) for s in value.split("-") if s.strip()]
+
+def wide_to_long(df_payout, df_race):
+    """今までの<year>_all_payout.csvを1組み合わせ1行の形式にする
+
+    Parameters
+    ----------
+    df_payout : pandas.DataFrame
+        Payout_Crawlerのデータフレーム(Huku_Num1, Wide_Odds1などの列を持つ形式)
+    df_race : pandas.DataFrame
+        同じ年のRace_Crawlerのデータフレーム(Rank, Number, Wakuから組み合わせを求める)
+
+    Returns
+    -------
+    df_long : pandas.DataFrame
+        PAYOUT_COLUMNSの列のデータフレーム
+
+    Notes
+    -----
+    単勝，枠連，馬連，馬単，三連複，三連単の組み合わせは着順から求めるので，同着のレースは正しくない場合がある
+    """
+    df_list = []
+    # 複勝，ワイドは組み合わせも保存されている
+    for name, bet_type in [("Huku", "fukusho"), ("Wide", "wide")]:
+        i = 1
+        while "{}_Num{}".format(name, i) in df_payout.columns:
+            df = df_payout[["Race_Id", "{}_Num{}".format(name, i), "{}_Odds{}".format(name, i)]].dropna()
+            nums = [split_numbers(value) + [0, 0] for value in df["{}_Num{}".format(name, i)]]
+            df_list.append(pd.DataFrame({
+                "Race_Id": df["Race_Id"].to_numpy(),
+                "Bet_Type": bet_type,
+                "Num1": [num[0] for num in nums],
+                "Num2": [num[1] for num in nums],
+                "Num3": [num[2] for num in nums],
+                "Payout": df["{}_Odds{}".format(name, i)].to_numpy() * 100,
+            }))
+            i += 1
+
+    # それ以外は1~3着の馬番，枠番から求める
+    rank = pd.to_numeric(df_race["Rank"], errors="coerce")
+    df_top = df_race[rank.isin([1, 2, 3])].assign(Rank=rank).sort_values(["Race_Id", "Rank"])
+    df_top = df_top.drop_duplicates(subset=["Race_Id", "Rank"])
+    number = df_top.pivot(index="Race_Id", columns="Rank", values="Number")
+    waku = df_top.pivot(index="Race_Id", columns="Rank", values="Waku")
+    df_top = pd.DataFrame({
+        "Number1": number.get(1), "Number2": number.get(2), "Number3": number.get(3),
+        "Waku1": waku.get(1), "Waku2": waku.get(2),
+    }).dropna().astype(int)
+    df_top = df_top.join(df_payout.set_index("Race_Id"), how="inner")
+    for bet_type, column, num_columns in [
+            ("tansho", "Tansho", ["Number1"]),
+            ("wakuren", "Wakuren", ["Waku1", "Waku2"]),
+            ("umaren", "Umaren", ["Number1", "Number2"]),
+            ("umatan", "Umatan", ["Number1", "Number2"]),
+            ("sanrenpuku", "Sanrenpuku", ["Number1", "Number2", "Number3"]),
+            ("sanrentan", "Sanrentan", ["Number1", "Number2", "Number3"])]:
+        if column not in df_top.columns:
+            continue
+        df = df_top[df_top[column].notna()]
+        df_long = pd.DataFrame({"Race_Id": df.index, "Bet_Type": bet_type, "Payout": df[column].to_numpy() * 100})
+        for num_column, df_column in zip(NUM_COLUMNS, num_columns + [None] * 2):
+            df_long[num_column] = df[df_column].to_numpy() if df_column is not None else 0
+        df_list.append(df_long)
+
+    df_long = normalize_bets(pd.concat(df_list, ignore_index=True))
+    df_long["Payout"] = df_long["Payout"].round().astype(int)
+    return df_long[PAYOUT_COLUMNS]
@@ -0,0 +1,204 @@
+# race_archive.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   RaceArchive : 過去のレースデータをブロックごとに圧縮して保存し，Race_Id, Uma_Idで一部だけ読み込む
+# ---------------------------------------------------------------------------
+# 注意点
+#   race_archive/<year>.blocks : block_racesレースずつのデータフレームをpickleしてzlibで圧縮したものを連結
+#   race_archive/<year>.index  : ブロックの位置とRace_Id, Uma_Id -> ブロック番号の索引(pickle)
+#   1レース，1頭分を読む時は該当するブロックだけを展開する(年のファイル全体は読まない)
+#   索引は最初に使う時に読み込んでメモリに置く(1年数十KB)
+#   同じ年をもう一度writeすると置き換える
+#   レースが無い年はブロック0個の索引を保存する(read_yearは空のデータフレームを返す)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import zlib
+import pickle
+import numpy as np
+import pandas as pd
+from horse_racing_crawler.df_io import read_race_data
+
+class RaceArchive:
+    def __init__(self, archive_dir="race_archive", block_races=50, level=6):
+        """レースデータを圧縮して保存するクラス
+
+        Attributes:
+        ----------
+        archive_dir : str
+            保存するフォルダ名
+        block_races : int, default 50
+            1ブロックのレース数(小さいほど1件の読み込みは速く，圧縮率は下がる)
+        level : int, default 6
+            zlibの圧縮レベル
+        indexes : dict
+            年 -> 索引(offsets, first_race_ids, uma_ids, uma_blocks)
+
+        Examples:
+        ----------
+        archive = RaceArchive()
+        archive.write(2020)                         # race_csv_data/2020_all_race.csvを保存
+        archive.get_race(202005010101)              # 1レース分
+        archive.get_history(2017105318)             # 1頭の全ての年の出走
+        archive.read_year(2020)                     # 1年分
+        """
+        self.current_dir = os.getcwd().replace(os.sep,'/')
+        self.archive_dir = archive_dir
+        self.block_races = block_races
+        self.level = level
+        self.indexes = {}
+        if not os.path.exists(archive_dir):
+            os.mkdir(archive_dir)
+
+    def file_path(self, year, suffix):
+        """年ごとのファイルパス"""
+        return "{}/{}/{}{}".format(self.current_dir, self.archive_dir, year, suffix)
+
+    def years(self):
+        """保存されている年"""
+        return sorted(int(name[:-len(".index")]) for name in os.listdir(self.archive_dir) if name.endswith(".index"))
+
+    def write(self, year, df_race=None, input_dir="race_csv_data"):
+        """1年分のレースデータを保存する
+
+        Parameters
+        ----------
+        year : int
+            年
+        df_race : pandas.DataFrame, default None
+            保存するデータ(Noneの場合は<input_dir>/<year>_all_race.csvなどを読み込む)
+        input_dir : str
+            レースデータのフォルダ名
+
+        Returns
+        -------
+        info : dict
+            rows(行数), blocks(ブロック数), bytes(圧縮後のサイズ)
+        """
+        if df_race is None:
+            df_race = read_race_data(year, input_dir)
+        df_race = df_race.sort_values(["Race_Id", "Number"], kind="stable").reset_index(drop=True)
+        race_ids = df_race["Race_Id"].to_numpy(dtype=np.int64)
+        # レースの先頭の行からblock_racesレースごとにブロックの境目を決める(レースが無い年はブロック0個)
+        race_starts = np.flatnonzero(np.r_[True, race_ids[1:] != race_ids[:-1]]) if len(df_race) else np.zeros(0, dtype=np.int64)
+        block_starts = np.r_[race_starts[::self.block_races], len(df_race)]
+
+        offsets = [0]
+        block_numbers = np.zeros(len(df_race), dtype=np.int32)
+        try:
+            with open(self.file_path(year, ".blocks.tmp"), "wb") as f:
+                for block, (start, end) in enumerate(zip(block_starts[:-1], block_starts[1:])):
+                    data = zlib.compress(pickle.dumps(df_race.iloc[start:end], protocol=pickle.HIGHEST_PROTOCOL), self.level)
+                    f.write(data)
+                    offsets.append(offsets[-1] + len(data))
+                    block_numbers[start:end] = block
+
+            # Uma_Id -> ブロック番号(重複なし，Uma_Id順)
+            uma_index = pd.DataFrame({"Uma_Id": pd.to_numeric(df_race["Uma_Id"], errors="coerce"), "Block": block_numbers})
+            uma_index = uma_index.dropna().astype(np.int64).drop_duplicates().sort_values(["Uma_Id", "Block"])
+            index = {
+                "offsets": np.array(offsets, dtype=np.int64),
+                "first_race_ids": race_ids[block_starts[:-1]],
+                "uma_ids": uma_index["Uma_Id"].to_numpy(),
+                "uma_blocks": uma_index["Block"].to_numpy(dtype=np.int32),
+            }
+            with open(self.file_path(year, ".index.tmp"), "wb") as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(self.file_path(year, ".blocks.tmp"), self.file_path(year, ".blocks"))
+            os.replace(self.file_path(year, ".index.tmp"), self.file_path(year, ".index"))
+        finally:
+            # 途中で失敗した場合に一時ファイルを残さない(前に保存した年のファイルはそのまま)
+            for suffix in [".blocks.tmp", ".index.tmp"]:
+                if os.path.exists(self.file_path(year, suffix)):
+                    os.remove(self.file_path(year, suffix))
+        self.indexes[int(year)] = index
+        return {"rows": len(df_race), "blocks": len(offsets) - 1, "bytes": offsets[-1]}
+
+    def get_index(self, year):
+        """年の索引(無い場合はNone)"""
+        year = int(year)
+        if year not in self.indexes:
+            if not os.path.exists(self.file_path(year, ".index")):
+                return None
+            with open(self.file_path(year, ".index"), "rb") as f:
+                self.indexes[year] = pickle.load(f)
+        return self.indexes[year]
+
+    def read_blocks(self, year, blocks):
+        """ブロックを展開してデータフレームのリストにする"""
+        offsets = self.get_index(year)["offsets"]
+        df_list = []
+        with open(self.file_path(year, ".blocks"), "rb") as f:
+            for block in blocks:
+                f.seek(offsets[block])
+                df_list.append(pickle.loads(zlib.decompress(f.read(offsets[block+1] - offsets[block]))))
+        return df_list
+
+    def get_race(self, race_id):
+        """1レース分のデータ
+
+        Parameters
+        ----------
+        race_id : int or str
+            レースid
+
+        Returns
+        -------
+        df_race : pandas.DataFrame
+            そのレースの行(無い場合は空のデータフレーム)
+        """
+        race_id = int(race_id)
+        index = self.get_index(str(race_id)[:4])
+        if index is None:
+            return pd.DataFrame()
+        block = np.searchsorted(index["first_race_ids"], race_id, side="right") - 1
+        if block < 0:
+            return pd.DataFrame()
+        df_block = self.read_blocks(str(race_id)[:4], [block])[0]
+        return df_block[df_block["Race_Id"].astype(np.int64) == race_id].reset_index(drop=True)
+
+    def get_history(self, uma_id, years=None):
+        """1頭の出走したレースの行
+
+        Parameters
+        ----------
+        uma_id : int or str
+            馬id
+        years : list, default None
+            探す年(Noneの場合は保存されている全ての年)
+
+        Returns
+        -------
+        df_history : pandas.DataFrame
+            その馬の行(Race_Id順)
+        """
+        uma_id = int(uma_id)
+        df_list = []
+        for year in (self.years() if years is None else years):
+            index = self.get_index(year)
+            if index is None:
+                continue
+            start, end = np.searchsorted(index["uma_ids"], [uma_id, uma_id + 1])
+            if start == end:
+                continue
+            for df_block in self.read_blocks(year, index["uma_blocks"][start:end]):
+                df_list.append(df_block[pd.to_numeric(df_block["Uma_Id"], errors="coerce") == uma_id])
+        if not df_list:
+            return pd.DataFrame()
+        return pd.concat(df_list, ignore_index=True)
+
+    def read_year(self, year):
+        """1年分のデータ(Race_Id, 馬番順)"""
+        index = self.get_index(year)
+        if index is None:
+            raise ValueError("{} is not archived".format(year))
+        if len(index["offsets"]) == 1:
+            return pd.DataFrame()
+        return pd.concat(self.read_blocks(year, range(len(index["offsets"]) - 1)), ignore_index=True)
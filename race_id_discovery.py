@@ -0,0 +1,268 @@
+# race_id_discovery.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   RaceIdDiscovery : race_id/<year>.txtを作成する
+# ---------------------------------------------------------------------------
+# 注意点
+#   レースidは 年(4桁) + 会場(2桁) + 回(2桁) + 日目(2桁) + レース(2桁)
+#   例) 202005010111 : 2020年 東京 1回 1日目 11R
+#   回，日目は1から連番なので，存在しないページが出たところで打ち切る
+#   会場ごとに並列で調べる
+#   通信エラー，429/5xxはmax_retries回まで取り直し，それでも失敗した開催日は飛ばしてfailed_daysに記録する
+#   (存在しないものとは扱わないので，次に実行した時に調べ直す)
+#   見つかったidは途中で止まった場合も<year>.txtに追記する
+#   base_urlを変えればローカルのテスト用サーバーでも実行できる
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import threading
+import requests
+from time import sleep, monotonic
+from concurrent.futures import ThreadPoolExecutor
+from horse_racing_crawler.rate_control import AdaptiveRateController
+
+# 会場id(レースidの5，6桁目)
+PLACE_IDS = {
+    "01": "札幌",
+    "02": "函館",
+    "03": "福島",
+    "04": "新潟",
+    "05": "東京",
+    "06": "中山",
+    "07": "中京",
+    "08": "京都",
+    "09": "阪神",
+    "10": "小倉",
+}
+
+class RaceIdDiscovery:
+    def __init__(self, sleep_time=0.5, max_workers=4, output_dir="race_id", base_url="https://db.netkeiba.com",
+                 max_kai=6, max_day=12, max_race=12, timeout=30, max_retries=2):
+        """レースidを調べてrace_id/<year>.txtを作成するクラス
+
+        Attributes:
+        ----------
+        sleep_time : float, "auto" or AdaptiveRateController, default 0.5
+            1ページ毎に停止する時間(スレッドごと)
+            "auto"の場合は全スレッド共通で間隔を自動で調整する
+        max_workers : int, default 4
+            同時に調べる会場の数
+        output_dir : str
+            idを保存するフォルダ名(Race_Crawlerのinput_dir)
+        base_url : str
+            取得先のURL
+        max_kai : int, default 6
+            1年の最大の回
+        max_day : int, default 12
+            1回の最大の日目
+        max_race : int, default 12
+            1日の最大のレース数
+        timeout : float, default 30
+            1ページの応答を待つ秒数(応答が無いページでスレッドが止まり続けないようにする)
+        max_retries : int, default 2
+            通信エラー，429/5xxの時に取り直す回数
+        failed_days : list
+            取り直しても失敗したため飛ばした開催日(年+会場+回+日目)
+
+        Examples:
+        ----------
+        discovery = RaceIdDiscovery()
+        discovery(2021, 2022)               # race_id/2021.txt, race_id/2022.txt に新しいidを追記
+        discovery.discover(2022, print)     # 見つかった順にidを渡す
+        """
+        if sleep_time == "auto":
+            sleep_time = AdaptiveRateController()
+        self.rate_controller = sleep_time if isinstance(sleep_time, AdaptiveRateController) else None
+        self.sleep_time = sleep_time
+        self.max_workers = max_workers
+        self.current_dir = os.getcwd().replace(os.sep,'/')
+        self.output_dir = output_dir
+        self.base_url = base_url
+        self.max_kai = max_kai
+        self.max_day = max_day
+        self.max_race = max_race
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.failed_days = []
+        self.lock = threading.Lock()
+
+    def __call__(self, *years):
+        """指定した年のレースidを調べて追記する
+
+        Parameters
+        ----------
+        years : tuple
+            調べる年
+
+        Returns
+        -------
+        new_ids : list
+            新しく見つかったレースid
+        """
+        new_ids = []
+        for year in years:
+            new_ids.extend(self.discover(year))
+        return new_ids
+
+    def exists(self, race_id):
+        """レースのページがあるかどうか
+
+        Parameters
+        ----------
+        race_id : str
+            レースid
+
+        Returns
+        -------
+        exists : bool
+            レース結果の表があればTrue
+
+        Raises
+        ------
+        requests.RequestException
+            max_retries回取り直しても通信エラー，429/5xxの場合
+        """
+        url = self.base_url + "/race/" + race_id + "/"
+        for retry in range(self.max_retries + 1):
+            if self.rate_controller is not None:
+                self.rate_controller.wait()
+            start = monotonic()
+            try:
+                race_html = requests.get(url, timeout=self.timeout)
+                if race_html.status_code == 429 or race_html.status_code >= 500:
+                    race_html.raise_for_status()
+            except requests.RequestException:
+                if self.rate_controller is not None:
+                    self.rate_controller.record(monotonic() - start, error=True)
+                else:
+                    sleep(self.sleep_time)
+                if retry == self.max_retries:
+                    raise
+                continue
+            if self.rate_controller is not None:
+                self.rate_controller.record(monotonic() - start, race_html.status_code)
+            else:
+                sleep(self.sleep_time)
+            return race_html.status_code == 200 and "race_table_01" in race_html.text
+
+    def known_ids(self, year):
+        """既にrace_id/<year>.txtにあるレースid"""
+        file_path = "{}/{}/{}.txt".format(self.current_dir, self.output_dir, year)
+        if not os.path.exists(file_path):
+            return set()
+        with open(file_path, encoding="utf-8") as f:
+            return set(s.strip() for s in f if s.strip())
+
+    def discover(self, year, callback=None):
+        """1年分のレースidを調べ，新しいidをrace_id/<year>.txtに追記する
+
+        Parameters
+        ----------
+        year : int
+            調べる年
+        callback : function, default None
+            新しいidが見つかるたびに呼ばれる関数(クロールのキューに直接渡す場合に使う)
+
+        Returns
+        -------
+        new_ids : list
+            新しく見つかったレースid(ソート済み)
+        """
+        known_ids = self.known_ids(year)
+        new_ids = []
+
+        def add(race_id):
+            with self.lock:
+                if race_id in known_ids:
+                    return
+                known_ids.add(race_id)
+                new_ids.append(race_id)
+            if callback is not None:
+                callback(race_id)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                list(executor.map(lambda place_id: self.discover_place(year, place_id, add, known_ids), PLACE_IDS))
+        finally:
+            # 途中で止まった場合も見つかった分は追記する
+            new_ids.sort()
+            if not os.path.exists(self.output_dir):
+                os.mkdir(self.output_dir)
+            with open("{}/{}/{}.txt".format(self.current_dir, self.output_dir, year), "a", encoding="utf-8") as f:
+                f.writelines(map(lambda x: x + "\n", new_ids))
+            print("\r{}年 : 新しいレース{}件\n".format(year, len(new_ids)), end="")
+        return new_ids
+
+    def discover_place(self, year, place_id, add, known_ids):
+        """1会場分のレースidを調べる
+
+        Parameters
+        ----------
+        year : int
+            調べる年
+        place_id : str
+            会場id
+        add : function
+            見つかったidを渡す関数
+        known_ids : set
+            既に分かっているレースid(これに含まれるものはページを取得しない)
+        """
+        for kai in range(1, self.max_kai+1):
+            for day in range(1, self.max_day+1):
+                day_id = "{}{}{:02}{:02}".format(year, place_id, kai, day)
+                try:
+                    # 1Rが無ければその回は終わり
+                    if not self.discover_day(day_id, add, known_ids):
+                        break
+                except requests.RequestException as e:
+                    # 取り直しても失敗した開催日は飛ばす(存在しないものとは扱わない)
+                    with self.lock:
+                        self.failed_days.append(day_id)
+                    print("\r{} : {!r}\n".format(day_id, e), end="")
+            else:
+                continue
+            # 1日目が無ければその会場の開催は終わり
+            if day == 1:
+                break
+
+    def discover_day(self, day_id, add, known_ids):
+        """1開催日分のレースidを調べる
+
+        Parameters
+        ----------
+        day_id : str
+            年+会場+回+日目
+        add : function
+            見つかったidを渡す関数
+        known_ids : set
+            既に分かっているレースid
+
+        Returns
+        -------
+        exists : bool
+            1Rがあった場合True
+        """
+        first_id = day_id + "01"
+        if first_id not in known_ids and not self.exists(first_id):
+            return False
+        add(first_id)
+        # 最終レースがあれば間のレースもあるとみなす
+        last_id = "{}{:02}".format(day_id, self.max_race)
+        if last_id in known_ids or self.exists(last_id):
+            for race in range(2, self.max_race+1):
+                add("{}{:02}".format(day_id, race))
+        else:
+            for race in range(2, self.max_race):
+                race_id = "{}{:02}".format(day_id, race)
+                if race_id in known_ids or self.exists(race_id):
+                    add(race_id)
+                else:
+                    break
+        return True
@@ -0,0 +1,113 @@
+# rate_control.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   AdaptiveRateController : 応答時間，エラーを見てリクエストの間隔を自動で調整
+# ---------------------------------------------------------------------------
+# 注意点
+#   調子が良い間は1秒あたりのリクエスト数を少しずつ増やし(加算)，
+#   429/5xx，通信エラー，応答時間の急増があれば大きく減らす(乗算)
+#   max_rateより速くはならない
+#   応答時間が遅いまま続く場合は平常時の値が少しずつ追いつき，再び増やし始める
+#   Crawler(sleep_time="auto")またはCrawler(sleep_time=AdaptiveRateController(...))で使う
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import threading
+from collections import deque
+from time import sleep, monotonic
+
+class AdaptiveRateController:
+    def __init__(self, initial_rate=1.0, max_rate=5.0, min_rate=0.05, increase=0.05, backoff=0.5,
+                 latency_factor=3.0, window=20, max_error_rate=0.1, spike_weight=0.02):
+        """リクエストの間隔を自動で調整するクラス
+
+        Attributes:
+        ----------
+        initial_rate : float, default 1.0
+            最初のリクエスト数(1秒あたり)
+        max_rate : float, default 5.0
+            リクエスト数の上限(1秒あたり)
+        min_rate : float, default 0.05
+            リクエスト数の下限(1秒あたり)
+        increase : float, default 0.05
+            調子が良い時に1リクエストごとに増やすリクエスト数
+        backoff : float, default 0.5
+            429/5xx，通信エラーの時にリクエスト数に掛ける値
+        latency_factor : float, default 3.0
+            応答時間が平常時の何倍を超えたら減らすか
+        window : int, default 20
+            エラー率を計算する直近のリクエスト数
+        max_error_rate : float, default 0.1
+            直近のエラー率がこれを超えている間は増やさない
+        spike_weight : float, default 0.02
+            応答時間の急増の時に平常時の値へ混ぜる割合(遅い状態が続けば平常時の値もゆっくり追いつく)
+        """
+        self.rate = initial_rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.backoff = backoff
+        self.latency_factor = latency_factor
+        self.max_error_rate = max_error_rate
+        self.spike_weight = spike_weight
+        self.errors = deque(maxlen=window)
+        self.latency = None # 平常時の応答時間(指数移動平均)
+        self.next_time = monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def interval(self):
+        """現在のリクエストの間隔(秒)"""
+        return 1.0 / self.rate
+
+    def wait(self):
+        """次のリクエストを送ってよい時刻まで停止する
+
+        Returns
+        -------
+        waited : float
+            停止した時間(秒)
+        """
+        with self.lock:
+            now = monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        waited = start - now
+        if waited > 0:
+            sleep(waited)
+        return waited
+
+    def record(self, latency, status=None, error=False):
+        """リクエスト1回分の結果を記録し，リクエスト数を調整する
+
+        Parameters
+        ----------
+        latency : float
+            応答時間(秒)
+        status : int, default None
+            HTTPステータスコード
+        error : bool, default False
+            通信エラーが起きたかどうか
+        """
+        with self.lock:
+            failed = error or status == 429 or (status is not None and status >= 500)
+            self.errors.append(failed)
+            if failed:
+                self.rate = max(self.rate * self.backoff, self.min_rate)
+                # 次のリクエストも遅らせる
+                self.next_time = max(self.next_time, monotonic() + self.interval)
+                return
+            if self.latency is not None and latency > self.latency * self.latency_factor:
+                # 応答時間の急増(平常時の値にはゆっくりだけ反映する)
+                self.rate = max(self.rate * self.backoff, self.min_rate)
+                self.latency = (1 - self.spike_weight) * self.latency + self.spike_weight * latency
+                return
+            self.latency = latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+            if sum(self.errors) / len(self.errors) <= self.max_error_rate:
+                self.rate = min(self.rate + self.increase, self.max_rate)
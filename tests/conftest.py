@@ -0,0 +1,108 @@
+# conftest.py
+#----------------------------------------------------------------------------
+# テストの共通設定
+#   リポジトリのフォルダをhorse_racing_crawlerとしてimportできるようにする
+#   (インストールしていない場合，フォルダ名がhorse_racing_crawlerでない場合も動く)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import sys
+import time
+import threading
+import importlib.util
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import pandas as pd
+import pytest
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "horse_racing_crawler" not in sys.modules:
+    try:
+        import horse_racing_crawler
+    except ImportError:
+        spec = importlib.util.spec_from_file_location("horse_racing_crawler", os.path.join(PACKAGE_DIR, "__init__.py"),
+                                                      submodule_search_locations=[PACKAGE_DIR])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["horse_racing_crawler"] = module
+        spec.loader.exec_module(module)
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """カレントディレクトリを一時フォルダにする(各モジュールはカレントディレクトリに入出力する)"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+class FixtureServer:
+    def __init__(self):
+        """ローカルのテスト用サーバー(pagesに パス -> 本文(str) を入れる，無いパスは404)"""
+        self.pages = {}
+        self.requests = [] # 受け取ったパス
+        self.delay = 0 # 応答を遅らせる秒数
+        self.failures = {} # パス -> 500を返す残りの回数
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.path)
+                time.sleep(server.delay)
+                if server.failures.get(self.path, 0) > 0:
+                    server.failures[self.path] -= 1
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                body = server.pages.get(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                data = body.encode(server.encoding)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset={}".format(server.encoding))
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.encoding = "euc-jp"
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}".format(self.httpd.server_address[1])
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def fixture_server():
+    """ローカルのテスト用サーバー(base_urlに.urlを入れて使う)"""
+    server = FixtureServer()
+    yield server
+    server.close()
+
+def make_race_data(n_races=4, n_horses=3, year=2020, seed=0):
+    """Race_Crawlerのワイド形式と同じ列のレースデータを作る(1レースn_horses頭，馬は使い回す)"""
+    from horse_racing_crawler.Race_ver2_03 import ENTRY_COLUMNS, RACE_COLUMNS
+    rng = np.random.default_rng(seed)
+    rows = []
+    for race in range(n_races):
+        race_id = int("{}0501{:02d}{:02d}".format(year, race // 12 + 1, race % 12 + 1))
+        race_info = {column: "" for column in RACE_COLUMNS}
+        race_info.update({"Date": "{}-01-{:02d}".format(year, race + 1), "Start_Time": "10:{:02d}".format(race),
+                          "Place": "東京", "Place_Id": 5, "Race_Num": race % 12 + 1, "Race_Id": race_id,
+                          "Class": "未勝利", "Class_Id": 1, "Tousuu": n_horses, "Field": "芝", "Field_Id": 0,
+                          "Kyori": 1600, "Weather": "晴", "Weather_Id": 0})
+        for number in range(1, n_horses + 1):
+            entry = {column: "" for column in ENTRY_COLUMNS}
+            entry.update({"Rank": number, "Waku": number, "Number": number, "Name": "馬{}".format(number),
+                          "Uma_Id": 2017100000 + number, "Sex": "牡", "Sex_Id": 0, "Age": 3, "Jockey_Weight": 55.0,
+                          "Jockey": "騎手{}".format(number % 2), "Jockey_Id": 1000 + number % 2,
+                          "Time": round(95 + number + float(rng.random()), 1), "Ninki": number,
+                          "Tansho": round(1.5 * number, 1), "3F": 35.0, "Weight": 480, "Weight_Change": 0,
+                          "Trainer": "調教師", "Trainer_Id": 1088, "Owner": "馬主", "Owner_Id": 2000})
+            rows.append({**entry, **race_info})
+    return pd.DataFrame(rows, columns=list(ENTRY_COLUMNS) + list(RACE_COLUMNS))
@@ -0,0 +1,68 @@
+# test_backtest.py
+#----------------------------------------------------------------------------
+# backtest.pyのテスト(手で計算した3レースの成績と比べる)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+import pytest
+from horse_racing_crawler.backtest import Backtest
+from horse_racing_crawler.payout_store import PayoutStore
+
+PAYOUTS = [
+    # 202005010101 : 1着3番, 2着7番, 3着5番
+    ("202005010101", "tansho", 3, 0, 0, 230), ("202005010101", "fukusho", 3, 0, 0, 120),
+    ("202005010101", "fukusho", 7, 0, 0, 310), ("202005010101", "fukusho", 5, 0, 0, 180),
+    ("202005010101", "umaren", 3, 7, 0, 1500), ("202005010101", "wide", 3, 7, 0, 600),
+    ("202005010101", "wide", 3, 5, 0, 400), ("202005010101", "wide", 5, 7, 0, 900),
+    # 202005010102 : 1着4番, 2着2番, 3着8番
+    ("202005010102", "tansho", 4, 0, 0, 500), ("202005010102", "fukusho", 4, 0, 0, 150),
+    ("202005010102", "fukusho", 2, 0, 0, 110), ("202005010102", "fukusho", 8, 0, 0, 200),
+    ("202005010102", "umaren", 4, 2, 0, 800), ("202005010102", "wide", 2, 4, 0, 300),
+    ("202005010102", "wide", 4, 8, 0, 700), ("202005010102", "wide", 2, 8, 0, 450),
+    # 202106010101 : 1着5番, 2着6番, 3着7番
+    ("202106010101", "tansho", 5, 0, 0, 1200), ("202106010101", "umaren", 5, 6, 0, 3000),
+]
+SCORES = [
+    ("202005010101", 3, 0.5), ("202005010101", 5, 0.3), ("202005010101", 1, 0.2),
+    ("202005010102", 2, 0.6), ("202005010102", 4, 0.3), ("202005010102", 6, 0.1),
+    ("202106010101", 1, 0.4), ("202106010101", 2, 0.35), ("202106010101", 3, 0.25),
+    ("202006010101", 1, 0.9), # 払い戻しの無いレースは買わない
+]
+
+@pytest.fixture
+def backtest(workdir):
+    store = PayoutStore()
+    store.update(pd.DataFrame(PAYOUTS, columns=["Race_Id", "Bet_Type", "Num1", "Num2", "Num3", "Payout"]))
+    df_score = pd.DataFrame(SCORES, columns=["Race_Id", "Number", "Score"]).astype({"Race_Id": int})
+    return Backtest(df_score, store)
+
+def test_tansho_top1(backtest):
+    result = backtest.run("tansho", k=1)
+    # 3番(的中230円), 2番(外れ), 1番(外れ): 収支 +130, -100, -100
+    assert result.to_dict() == {"Races": 3, "Bets": 3, "Hits": 1, "Stake": 300.0, "Return": 230.0,
+                                "Hit_Rate": pytest.approx(1 / 3), "ROI": pytest.approx(230 / 300),
+                                "Max_Drawdown": 200.0}
+
+def test_wide_box_and_umaren_nagashi(backtest):
+    # ワイド上位3頭ボックス: (3,5)400円, (2,4)300円が的中，9点
+    result = backtest.run("wide", k=3)
+    assert (result.Bets, result.Hits, result.Return, result.ROI) == (9, 2, 700.0, pytest.approx(700 / 900))
+    # 馬連1位から2,3位へ流し: (2,4)800円が的中，6点
+    result = backtest.run("umaren", k=3, mode="nagashi")
+    assert (result.Bets, result.Hits, result.Return, result.ROI) == (6, 1, 800.0, pytest.approx(800 / 600))
+
+def test_min_score_and_by_year(backtest):
+    result = backtest.run("tansho", k=1, min_score=0.45)
+    assert (result.Races, result.Bets, result.Return) == (2, 2, 230.0)
+    df_year = backtest.run("tansho", k=1, by_year=True)
+    assert df_year[["Bets", "Return"]].to_dict("index") == {2020: {"Bets": 2, "Return": 230.0},
+                                                            2021: {"Bets": 1, "Return": 0.0}}
+
+def test_bets_agree_with_payout_store(backtest, workdir):
+    df_bets = backtest.bets("wide", k=3)
+    assert df_bets.Payout.sum() == 700
+    df_result = PayoutStore().evaluate(df_bets)
+    assert df_result.ROI.iloc[0] == pytest.approx(backtest.run("wide", k=3).ROI)
+    assert np.array_equal(PayoutStore().lookup(df_bets), df_bets.Payout.to_numpy())
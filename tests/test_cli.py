@@ -0,0 +1,61 @@
+# test_cli.py
+#----------------------------------------------------------------------------
+# cli.pyのテスト(ジョブの読み込みと段階の実行順，各段階はテスト用の関数に置き換える)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import json
+import pytest
+from horse_racing_crawler import cli
+from horse_racing_crawler.Race_ver2_03 import Race_Crawler
+
+@pytest.fixture
+def stages(monkeypatch):
+    """各段階を呼ばれた順番とジョブを記録する関数にする"""
+    calls = []
+    for stage in cli.STAGES:
+        monkeypatch.setitem(cli.STAGE_FUNCTIONS, stage, lambda job, stage=stage: calls.append((stage, job)))
+    return calls
+
+def test_job_file_and_command_line(workdir, monkeypatch):
+    jobs = []
+    monkeypatch.setattr(cli, "run_job", jobs.append)
+    with open("job.json", "w", encoding="utf-8") as f:
+        json.dump({"years": [2018, 2019], "stages": ["crawl", "ids"], "sleep_time": "auto",
+                   "queue": {"workers": 2, "rate": 0.5}}, f)
+
+    assert cli.main(["--job", "job.json", "--years", "2020", "2021", "--no-progress", "--queue", "q.sqlite"]) == 0
+    job, = jobs
+    # コマンドラインの指定はジョブファイルより優先し，指定しなかった項目はジョブファイルの値を使う
+    assert job["years"] == [2020, 2021] and job["stages"] == ["crawl", "ids"]
+    assert (job["sleep_time"], job["progress"]) == ("auto", False)
+    assert job["queue"] == {"workers": 2, "rate": 0.5, "path": "q.sqlite"}
+    assert "workers" not in job # 初期値はrun_jobで補う
+
+    with pytest.raises(SystemExit):
+        cli.main(["--years", "2020"]) # 段階が無い
+    with pytest.raises(SystemExit):
+        cli.main(["--stages", "unknown"])
+
+def test_run_job_dispatches_stages_in_order(workdir, stages):
+    os.mkdir("data")
+    cli.run_job({"stages": ["ids", "crawl", "sql"], "years": [2020, 2020], "work_dir": "data"})
+    assert [stage for stage, _ in stages] == ["ids", "crawl", "sql"]
+    job = stages[0][1]
+    assert (job["sleep_time"], job["workers"], job["progress"]) == (1, 1, True) # DEFAULT_JOBの値
+    assert os.path.basename(os.getcwd()) == "data"
+
+    # 知らない段階がある場合は何も実行しない
+    with pytest.raises(ValueError, match="unknown stage"):
+        cli.run_job({"stages": ["crawl", "crawll"]})
+    assert len(stages) == 3
+
+def test_no_progress_reaches_crawler(workdir, monkeypatch):
+    crawlers = []
+    monkeypatch.setattr(Race_Crawler, "get_one_year_race_data", lambda self, filename: crawlers.append(self))
+    cli.run_job({"stages": ["crawl"], "years": [2020, 2020], "id_registry": None, "progress": False})
+    crawler, = crawlers
+    assert crawler.progress is False
+    assert "TQDM_DISABLE" not in os.environ
+    assert Race_Crawler.progress is True
@@ -0,0 +1,24 @@
+# test_crawl_planner.py
+#----------------------------------------------------------------------------
+# crawl_planner.pyのテスト
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+from horse_racing_crawler.crawl_planner import HorseCrawlPlanner
+from horse_racing_crawler.id_registry import IdRegistry
+
+def test_changed_ids_with_float_id_columns(workdir):
+    # 欠損値があるとread_csvで調教師，馬主のidはfloatになる
+    df_umainfo = pd.DataFrame({"Uma_Id": [2017100001, 2017100002, 2017100003],
+                               "Trainer_Id": [1088.0, 1089.0, np.nan],
+                               "Owner_Id": [2000.0, 2000.0, 2001.0]}).set_index("Uma_Id")
+    df_umainfo.to_pickle("umainfo_table.pickle")
+    df_race = pd.DataFrame({"Date": ["2020-01-05", "2020-01-05", "2020-01-12"],
+                            "Uma_Id": [2017100001, 2017100002, 2017100003],
+                            "Trainer_Id": [1088, 1090, np.nan],
+                            "Owner_Id": [2000, 2000, 2001]})
+    planner = HorseCrawlPlanner(IdRegistry())
+    # 調教師が変わった馬だけ
+    assert planner.changed_ids(df_race) == ["2017100002"]
@@ -0,0 +1,126 @@
+# test_crawl_queue.py
+#----------------------------------------------------------------------------
+# crawl_queue.pyのテスト(一時フォルダのSQLiteと複数プロセスのワーカーを使う)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import time
+import pickle
+import multiprocessing
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import make_race_data
+from horse_racing_crawler.crawl_queue import CrawlQueue, run_worker
+from horse_racing_crawler.Race_ver2_03 import Race_Crawler
+
+# ワーカーのプロセスはforkで作る(テスト用のクローラーをそのまま使う)
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="fork is not available")
+
+class StubRaceCrawler(Race_Crawler):
+    """ページを取得せず1レース分のデータを返すクローラー(末尾が13のidは必ず失敗する)"""
+    metrics_dir = None
+
+    def get_one_id_race_data(self, id=None):
+        if self.id.endswith("13"):
+            raise RuntimeError("no result table")
+        df = make_race_data(n_races=1).assign(Race_Id=int(self.id), Fetched_At=time.time())
+        return df.to_dict("records")
+
+def race_ids():
+    return ["2020050101{:02}".format(race) for race in range(1, 17)]
+
+def test_workers_share_queue_rate_and_merge(workdir):
+    rate = 20.0
+    os.mkdir("race_id") # 失敗したidはrace_id/error_<filename>.txtに出力される
+    queue = CrawlQueue("queue.sqlite", rate=rate)
+    assert queue.enqueue("race", 2020, race_ids()) == 16
+    assert queue.enqueue("race", 2020, race_ids()) == 0 # 既に入っているidは無視
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=run_worker, args=("queue.sqlite", "race"),
+                                 kwargs={"worker": "w{}".format(i), "rate": rate, "wait": 0.1,
+                                         "crawler_class": StubRaceCrawler}) for i in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    assert queue.is_finished("race")
+    assert queue.progress("race") == {"done": 15, "failed": 1}
+    # 失敗したidはmax_attempts回試して理由を残す
+    attempts, error = queue.con.execute("SELECT attempts, error FROM jobs WHERE id = '202005010113'").fetchone()
+    assert attempts == queue.max_attempts and error == "RuntimeError: no result table"
+    # 複数のワーカーが取得した
+    assert queue.con.execute("SELECT COUNT(DISTINCT worker) FROM jobs WHERE status = 'done'").fetchone()[0] > 1
+
+    crawler = StubRaceCrawler(sleep_time=0)
+    queue.merge(crawler, "race", 2020)
+    df = pd.read_csv("race_csv_data/2020_all_race.csv", encoding="shift-jis")
+    assert sorted(df.Race_Id.astype(str).unique()) == [id_ for id_ in race_ids() if id_ != "202005010113"]
+    with open("race_id/error_2020.txt") as f:
+        assert f.read().split() == ["202005010113"]
+
+    # 全ワーカー合計で1秒あたりrate回を超えない(rateの行を共有している)
+    results = queue.con.execute("SELECT result FROM jobs WHERE status = 'done'").fetchall()
+    fetched_at = np.sort([pickle.loads(result)[0]["Fetched_At"] for result, in results])
+    assert fetched_at[-1] - fetched_at[0] >= 0.9 * (len(fetched_at) - 1) / rate
+    assert (fetched_at[1:] - fetched_at[:-1]).min() >= 0.5 / rate
+
+def test_expired_lease_goes_to_another_worker(workdir):
+    queue = CrawlQueue("queue.sqlite", lease_seconds=0.3)
+    queue.enqueue("race", 2020, ["202005010101"])
+    assert queue.lease("race", "dead-worker") == [("2020", "202005010101")]
+    # 貸し出し中は他のワーカーに回さない
+    assert queue.lease("race", "worker") == []
+    assert queue.progress("race") == {"leased": 1}
+    time.sleep(0.4)
+    assert queue.progress("race") == {"pending": 1}
+    assert queue.lease("race", "worker") == [("2020", "202005010101")]
+    queue.complete("race", "2020", "202005010101", [])
+    worker, attempts = queue.con.execute("SELECT worker, attempts FROM jobs").fetchone()
+    assert (worker, attempts) == ("worker", 2)
+    assert queue.is_finished("race")
+
+def test_fail_retries_until_max_attempts(workdir):
+    queue = CrawlQueue("queue.sqlite", max_attempts=2)
+    queue.enqueue("race", 2020, ["202005010101"])
+    for _ in range(2):
+        (filename, id_), = queue.lease("race", "worker")
+        queue.fail("race", filename, id_, "HTTPError: 500")
+    assert queue.lease("race", "worker") == []
+    assert queue.progress("race") == {"failed": 1}
+
+def test_enqueue_again_retries_failed_and_keeps_done(workdir):
+    queue = CrawlQueue("queue.sqlite", max_attempts=1)
+    ids = ["202005010101", "202005010102", "202005010103"]
+    queue.enqueue("race", 2020, ids)
+    (filename, id_), = queue.lease("race", "worker")
+    queue.fail("race", filename, id_, "HTTPError: 500")
+    (filename, id_), = queue.lease("race", "worker")
+    queue.complete("race", filename, id_, [{"Race_Id": int(id_)}])
+    assert queue.progress("race") == {"failed": 1, "done": 1, "pending": 1}
+
+    # 前回失敗したidはやり直す(取得済みと待っているidはそのまま)
+    assert queue.enqueue("race", 2020, ids) == 1
+    assert queue.progress("race") == {"done": 1, "pending": 2}
+    status, attempts, error = queue.con.execute(
+        "SELECT status, attempts, error FROM jobs WHERE id = '202005010101'").fetchone()
+    assert (status, attempts, error) == ("pending", 0, None)
+
+    # recrawl=Trueの場合は取得済みのidも取り直す
+    assert queue.enqueue("race", 2020, ids, recrawl=True) == 1
+    assert queue.progress("race") == {"pending": 3}
+    assert queue.con.execute("SELECT COUNT(*) FROM jobs WHERE result IS NOT NULL").fetchone()[0] == 0
+
+def test_enqueue_again_retries_expired_lease_out_of_attempts(workdir):
+    queue = CrawlQueue("queue.sqlite", lease_seconds=0.1, max_attempts=1)
+    queue.enqueue("race", 2020, ["202005010101"])
+    queue.lease("race", "dead-worker")
+    assert queue.enqueue("race", 2020, ["202005010101"]) == 0 # 貸し出し中はそのまま
+    time.sleep(0.2)
+    assert queue.progress("race") == {"failed": 1}
+    assert queue.enqueue("race", 2020, ["202005010101"]) == 1
+    assert queue.lease("race", "worker") == [("2020", "202005010101")]
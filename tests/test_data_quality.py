@@ -0,0 +1,68 @@
+# test_data_quality.py
+#----------------------------------------------------------------------------
+# data_quality.pyと出力ごとの確認(Race_Crawler.validator)のテスト
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import pandas as pd
+from conftest import make_race_data
+from horse_racing_crawler.data_quality import DataValidator
+from horse_racing_crawler.Race_ver2_03 import Race_Crawler
+
+def bad_race_data():
+    """確認の種類ごとに1か所ずつ問題を入れたレースデータ(4レース3頭)"""
+    df = make_race_data().astype({"Time": object, "Age": object})
+    df.loc[0, "Time"] = "abc"      # type    : 1レース目
+    df.loc[1, "Age"] = ""          # missing : 1レース目
+    df.loc[3, "Weight"] = 900      # range   : 2レース目
+    df.loc[7, "Number"] = 1        # unique  : 3レース目の馬番1が2頭
+    return df.drop(index=11)       # tousuu  : 4レース目が2頭しかいない
+
+def test_check_finds_each_kind_of_problem():
+    df = bad_race_data()
+    df_umainfo = pd.DataFrame({"Father": ["父", "父"]}, index=pd.Index([2017100001, 2017100002], name="Uma_Id"))
+    df_report = DataValidator(df_umainfo).check(df)
+
+    df_failed = df_report[df_report.Failed > 0]
+    assert dict(zip(zip(df_failed.Check, df_failed.Column), df_failed.Failed)) == {
+        ("type", "Time"): 1, ("missing", "Age"): 1, ("range", "Weight"): 1,
+        ("unique", "Race_Id,Number"): 2, ("tousuu", "Tousuu"): 2,
+        ("umainfo", "Uma_Id"): 3, # 馬番3の馬は馬情報テーブルに無い
+    }
+    race_ids = df.Race_Id.astype(str).unique()
+    examples = df_report.set_index(["Check", "Column"]).Examples
+    assert examples["type", "Time"] == race_ids[0]
+    assert examples["range", "Weight"] == race_ids[1]
+    assert examples["unique", "Race_Id,Number"] == race_ids[2]
+    assert examples["tousuu", "Tousuu"] == race_ids[3]
+    assert examples["umainfo", "Uma_Id"] == " ".join(race_ids[:3])
+
+def test_clean_data_passes():
+    df_report = DataValidator().check(make_race_data())
+    assert df_report.Failed.sum() == 0
+
+class StubRaceCrawler(Race_Crawler):
+    """ページを取得せず1レース分のデータを返すクローラー(末尾が02のレースは馬体重がおかしい)"""
+    metrics_dir = None
+    validate_first = 0 # 辞書のリストを返すのでRaceRowsの確認はしない
+
+    def get_one_id_race_data(self, id=None):
+        df = make_race_data(n_races=1).assign(Race_Id=int(self.id))
+        if self.id.endswith("02"):
+            df["Weight"] = 900
+        return df.to_dict("records")
+
+def test_crawler_validates_each_output(workdir):
+    os.mkdir("race_id")
+    with open("race_id/2020.txt", "w") as f:
+        f.writelines(["202005010101\n", "202005010102\n"])
+    crawler = StubRaceCrawler(sleep_time=0, if_exception="raise")
+    crawler.validator = DataValidator()
+    crawler(2020)
+
+    # 問題があっても出力は止めない
+    assert len(pd.read_csv("race_csv_data/2020_all_race.csv", encoding="shift-jis")) == 6
+    df_report = pd.read_csv("data_quality/2020.csv", encoding="shift-jis", dtype={"Examples": str})
+    df_failed = df_report[df_report.Failed > 0]
+    assert df_failed[["Check", "Column", "Failed", "Examples"]].values.tolist() == [["range", "Weight", 3, "202005010102"]]
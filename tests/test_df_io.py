@@ -0,0 +1,95 @@
+# test_df_io.py
+#----------------------------------------------------------------------------
+# df_io.pyのテスト
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import make_race_data
+from horse_racing_crawler.df_io import read_race_data, asof_join, build_umainfo_table, merge_umainfo
+from horse_racing_crawler.Race_ver2_03 import split_race_data, get_id
+from horse_racing_crawler.get_past_race import read_all_data
+
+def write_normalized(df_race, year, output_dir="race_csv_data"):
+    """Race_Crawler(output_mode="normalized")と同じファイルだけを出力する"""
+    os.makedirs(output_dir, exist_ok=True)
+    df_races, df_entries = split_race_data(df_race)
+    df_races.to_csv("{}/{}_races.csv".format(output_dir, year), encoding="shift-jis", index=False)
+    df_entries.to_csv("{}/{}_entries.csv".format(output_dir, year), encoding="shift-jis", index=False)
+
+def test_read_race_data_joins_normalized_output(workdir):
+    df_race = make_race_data()
+    write_normalized(df_race, 2020)
+    df_race.to_csv("wide.csv", encoding="shift-jis", index=False)
+    expected = pd.read_csv("wide.csv", encoding="shift-jis")
+    pd.testing.assert_frame_equal(read_race_data(2020), expected)
+
+def test_readers_work_without_wide_file(workdir):
+    write_normalized(make_race_data(year=2020), 2020)
+    write_normalized(make_race_data(year=2021), 2021)
+    assert not os.path.exists("race_csv_data/2020_all_race.csv")
+
+    df_all_race = read_all_data(2020, 2021)
+    assert df_all_race.Race_Id.nunique() == 8
+
+    get_id(2020)
+    with open("uma_id/2020.txt") as f:
+        assert sorted(int(line) for line in f) == [2017100001, 2017100002, 2017100003]
+
+def brute_force_asof_join(df_entry, df_history, by, on, columns, n):
+    """asof_joinと同じ結果を1行ずつ絞り込んで作る"""
+    rows = []
+    for _, entry in df_entry.iterrows():
+        df_past = df_history[(df_history[by] == entry[by]) & (df_history[on] < entry[on])]
+        df_past = df_past.sort_values(on, kind="stable")
+        row = {}
+        for k in range(1, n+1):
+            for column in columns:
+                row["past_{}_{}".format(column, k)] = df_past[column].iloc[-k] if len(df_past) >= k else np.nan
+        rows.append(row)
+    return pd.DataFrame(rows, index=df_entry.index, dtype=float)
+
+def test_asof_join_matches_brute_force():
+    rng = np.random.default_rng(0)
+    # 同じ時刻の記録，馬の無い記録，記録の無い馬，時刻の無い行を含める
+    df_history = pd.DataFrame({"Uma_Id": rng.choice([1, 2, 3, 4, np.nan], 200), "Date": rng.integers(0, 30, 200),
+                               "Rank": rng.integers(1, 19, 200).astype(float), "Time": rng.random(200)})
+    df_entry = pd.DataFrame({"Uma_Id": rng.choice([1, 2, 3, 4, 5], 50), "Date": rng.integers(0, 35, 50).astype(float)},
+                            index=rng.permutation(np.arange(100, 150)))
+    df_entry.loc[df_entry.index[:3], "Date"] = np.nan
+
+    df_past = asof_join(df_entry, df_history, "Uma_Id", "Date", ["Rank", "Time"], n=3)
+    expected = brute_force_asof_join(df_entry, df_history, "Uma_Id", "Date", ["Rank", "Time"], 3)
+    pd.testing.assert_frame_equal(df_past.astype(float), expected)
+
+def write_umainfo(year, uma_ids, father):
+    os.makedirs("umainfo_csv_data", exist_ok=True)
+    df = pd.DataFrame({"Uma_Id": uma_ids, "Father": father, "M_Mother_Id": 1})
+    df.to_csv("umainfo_csv_data/{}.csv".format(year), encoding="shift-jis", index=False)
+
+def test_umainfo_table_uses_existing_years(workdir):
+    write_umainfo(1998, [2017100001], "父A")
+    write_umainfo(2024, [2017100001, 2017100002], "父B")
+    write_umainfo("plan_2020_2024", [2017100003], "父C") # 年ではないファイルは使わない
+    df_umainfo = build_umainfo_table(output_path="umainfo_table.pickle")
+    assert df_umainfo.index.tolist() == [2017100001, 2017100002]
+    assert df_umainfo.Father.tolist() == ["父B", "父B"] # 後の年を残す
+    assert build_umainfo_table(1990, 2000).Father.tolist() == ["父A"]
+
+    with pytest.raises(ValueError, match="no umainfo csv"):
+        build_umainfo_table(2001, 2023)
+
+def test_merge_umainfo_without_umainfo_csv(workdir):
+    os.mkdir("race_csv_data_with_past_race_data")
+    make_race_data().to_csv("race_csv_data_with_past_race_data/2020_all_race.csv", encoding="shift-jis", index=False)
+    with pytest.raises(ValueError, match="run the horse stage first"):
+        merge_umainfo(2020)
+
+    write_umainfo(2024, [2017100001, 2017100002], "父B")
+    merge_umainfo(2020)
+    df_race = pd.read_csv("race_csv_data_with_umainfo/2020_all_race.csv", encoding="shift-jis")
+    assert df_race.Father.isna().tolist()[:3] == [False, False, True] # 3頭目は馬情報が無い
+    assert df_race.Father.dropna().unique().tolist() == ["父B"]
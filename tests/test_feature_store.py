@@ -0,0 +1,50 @@
+# test_feature_store.py
+#----------------------------------------------------------------------------
+# feature_store.pyのテスト(差分更新の結果を全て作り直した結果と比べる)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import pandas as pd
+from conftest import make_race_data
+from horse_racing_crawler.feature_store import FeatureStore
+
+def make_store(store_dir):
+    return FeatureStore(["Rank", "Jockey", "Time"], n_past=2, rolling_columns=["Time"], store_dir=store_dir)
+
+def race_days():
+    """1日1レースを6日分(馬は毎日同じ3頭，4日目だけ4頭目が出走)"""
+    df_race = make_race_data(n_races=6, n_horses=3, seed=1)
+    df_extra = df_race[df_race.Race_Id == df_race.Race_Id.unique()[3]].head(1)
+    df_extra = df_extra.assign(Uma_Id=2017100004, Number=4, Rank=4)
+    df_race = pd.concat([df_race, df_extra], ignore_index=True)
+    return [df_day for _, df_day in df_race.groupby("Date")]
+
+def test_update_matches_full_rebuild(workdir):
+    days = race_days()
+    full = make_store("full")
+    full.update(pd.concat(days, ignore_index=True))
+
+    store = make_store("incremental")
+    for i in [0, 1, 2, 4, 5]:
+        store.update(days[i])
+    # 間の日を後から追加すると，出走した馬のその日以降の出走だけ再計算する
+    updated = store.update(days[3])
+    assert sorted(updated) == sorted((race_id, uma_id) for df_day in days[3:] for race_id, uma_id
+                                     in zip(df_day.Race_Id, df_day.Uma_Id) if uma_id in set(days[3].Uma_Id))
+
+    pd.testing.assert_frame_equal(store.get(), full.get(), check_dtype=False)
+    # 保存したストアを読み直しても同じ
+    pd.testing.assert_frame_equal(make_store("incremental").get(), full.get(), check_dtype=False)
+
+def test_update_replaces_existing_race(workdir):
+    days = race_days()
+    store = make_store("feature_store")
+    store.update(pd.concat(days, ignore_index=True))
+    # 1日目の着順を直して取り直した場合，後のレースの過去レースの特徴量も変わる
+    df_fixed = days[0].assign(Rank=days[0].Rank[::-1].to_numpy())
+    store.update(df_fixed)
+
+    full = make_store("full")
+    full.update(pd.concat([df_fixed] + days[1:], ignore_index=True))
+    pd.testing.assert_frame_equal(store.get(), full.get(), check_dtype=False)
+    assert len(store.history) == sum(map(len, days))
@@ -0,0 +1,43 @@
+# test_id_registry.py
+#----------------------------------------------------------------------------
+# id_registry.pyとHorse_Info_Crawlerの取得済みの記録のテスト
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import pytest
+from horse_racing_crawler.id_registry import IdRegistry
+from horse_racing_crawler.Race_ver2_03 import Horse_Info_Crawler
+
+class StubHorseCrawler(Horse_Info_Crawler):
+    """ページを取得せず馬情報を返すクローラー(fail_idで例外を出す)"""
+    metrics_dir = None
+    fail_id = None
+
+    def get_one_id_race_data(self, id=None):
+        if self.id == self.fail_id:
+            raise RuntimeError("crawl stopped")
+        return [{"Uma_Id": self.id, "Father": "父"}]
+
+def write_ids(ids, filename="2020"):
+    os.makedirs("uma_id", exist_ok=True)
+    with open("uma_id/{}.txt".format(filename), "w") as f:
+        f.writelines("{}\n".format(id_) for id_ in ids)
+
+def test_interrupted_crawl_marks_nothing_fetched(workdir):
+    write_ids([2017100001, 2017100002, 2017100003])
+    crawler = StubHorseCrawler(sleep_time=0, if_exception="raise", id_registry=IdRegistry())
+    crawler.fail_id = "2017100003"
+    with pytest.raises(RuntimeError):
+        crawler(2020)
+    assert IdRegistry().unfetched("Uma_Id", ["2017100001", "2017100002", "2017100003"]) == \
+        ["2017100001", "2017100002", "2017100003"]
+
+def test_output_marks_saved_horses_fetched(workdir):
+    write_ids([2017100001, 2017100002, 2017100003])
+    crawler = StubHorseCrawler(sleep_time=0, if_exception="pass", id_registry=IdRegistry())
+    crawler.fail_id = "2017100002"
+    crawler(2020)
+    assert os.path.exists("umainfo_csv_data/2020.csv")
+    # 失敗した馬だけが次回の対象になる
+    assert IdRegistry().unfetched("Uma_Id", ["2017100001", "2017100002", "2017100003"]) == ["2017100002"]
@@ -0,0 +1,76 @@
+# test_live_race.py
+#----------------------------------------------------------------------------
+# live_race.pyのテスト(tests/fixturesの出馬表とオッズをローカルのテスト用サーバーから返す)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import pandas as pd
+import pytest
+from conftest import make_race_data
+from horse_racing_crawler.live_race import LiveRaceCrawler
+from horse_racing_crawler.feature_store import FeatureStore
+from horse_racing_crawler.Race_ver2_03 import ENTRY_COLUMNS, RACE_COLUMNS
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RACE_ID = "202005010105"
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+@pytest.fixture
+def race_day(fixture_server):
+    """出馬表と単勝・複勝，馬連のオッズを返すサーバー"""
+    fixture_server.pages["/race/shutuba.html?race_id={}".format(RACE_ID)] = read_fixture("shutuba_{}.html".format(RACE_ID))
+    for api_type in ["1", "4"]:
+        fixture_server.pages["/api/api_get_jra_odds.html?race_id={}&type={}".format(RACE_ID, api_type)] = \
+            read_fixture("odds_{}_{}.json".format(RACE_ID, api_type))
+    return fixture_server
+
+def make_crawler(server, feature_store=None, umainfo=None):
+    crawler = LiveRaceCrawler(feature_store, umainfo)
+    crawler.base_url = server.url
+    return crawler
+
+def test_get_race_frame_columns_and_odds(workdir, race_day):
+    df = make_crawler(race_day).get_race_frame(RACE_ID)
+    assert list(df.columns) == list(ENTRY_COLUMNS) + list(RACE_COLUMNS)
+    # 取消の馬は入らない(頭数は出馬表の行数)
+    assert df.Number.tolist() == [1, 2, 4]
+    assert df.Uma_Id.tolist() == [2017100001, 2017100002, 2017100009]
+    assert df.Tansho.tolist() == [2.3, 5.8, 12.4]
+    assert df.Ninki.tolist() == [1, 2, 3]
+    assert df.Date.iloc[0] == pd.Timestamp("2020-01-05 10:30")
+    assert df.loc[0, ["Place", "Place_Id", "Class", "Class_Id", "Field", "Kyori", "Mawari", "Weather", "Baba"]].tolist() == \
+        ["東京", 4, "未勝利", 2, "芝", 1600, "左", "晴", "良"]
+    assert df.Tousuu.iloc[0] == 4
+    assert df.Weight.tolist() == [480, 452, ""]
+
+def test_past_race_features_and_latency(workdir, race_day):
+    store = FeatureStore(["Rank", "Jockey"], rolling_columns=["Rank"])
+    store.update(make_race_data(n_races=4))
+    umainfo = pd.DataFrame({"Father": ["父1", "父2"]}, index=pd.Index([2017100001, 2017100002], name="Uma_Id"))
+    crawler = make_crawler(race_day, store, umainfo)
+    df = crawler.get_race_frame(RACE_ID)
+
+    assert set(store.feature_columns()) <= set(df.columns)
+    # 過去4レースとも馬番と同じ着順
+    assert df.past_Rank_1.tolist()[:2] == [1, 2]
+    assert df.rolling_Rank_5.tolist()[:2] == [1.0, 2.0]
+    # 馬1は同じ騎手，馬2は乗り替わり
+    assert df.past_Jockey_1.tolist()[:2] == [1, 0]
+    # 初出走の馬は過去レースも馬情報も無い
+    assert df.past_Rank_1.isna().iloc[2] and df.past_Rank_5.isna().iloc[0]
+    assert df.Father.tolist()[:2] == ["父1", "父2"] and pd.isna(df.Father.iloc[2])
+
+    assert set(crawler.latency) == {"card", "odds", "features", "total"}
+    assert all(value >= 0 for value in crawler.latency.values())
+    parts = crawler.latency["card"] + crawler.latency["odds"] + crawler.latency["features"]
+    assert crawler.latency["total"] == pytest.approx(parts)
+
+def test_odds_table(workdir, race_day):
+    crawler = make_crawler(race_day)
+    crawler.id = RACE_ID
+    assert crawler.get_odds_table("tansho") == {(1,): 2.3, (2,): 5.8, (4,): 12.4}
+    assert crawler.get_odds_table("umaren") == {(1, 2): 8.4, (1, 4): 25.1, (2, 4): 40.9}
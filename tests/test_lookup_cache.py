@@ -0,0 +1,83 @@
+# test_lookup_cache.py
+#----------------------------------------------------------------------------
+# lookup_cache.pyのテスト(LRUで捨てる順番，有効期限，ヒット数の記録)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import pandas as pd
+import pytest
+from horse_racing_crawler import lookup_cache
+from horse_racing_crawler.lookup_cache import LookupCache, HorseCache
+
+class Loader:
+    """読み込んだ引数を記録する関数"""
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, key, scale=1):
+        self.calls.append(key)
+        return key * scale
+
+@pytest.fixture
+def clock(monkeypatch):
+    """LookupCacheが使う時刻を進められるようにする"""
+    now = [1000.0]
+    monkeypatch.setattr(lookup_cache.time, "monotonic", lambda: now[0])
+    return now
+
+def test_evicts_least_recently_used():
+    loader = Loader()
+    cache = LookupCache(loader, maxsize=2)
+    assert [cache(1), cache(2), cache(1)] == [1, 2, 1]
+    cache(3) # 最も長く使われていない2を捨てる
+    assert list(cache.entries) == [(1,), (3,)]
+    cache(2)
+    assert loader.calls == [1, 2, 3, 2]
+    assert cache.stats() == {"hits": 1, "misses": 4, "evictions": 2, "expired": 0, "size": 2, "hit_rate": 0.2}
+
+def test_ttl_reloads_expired_entries(clock):
+    loader = Loader()
+    cache = LookupCache(loader, ttl=10)
+    cache(1)
+    clock[0] += 9.9
+    cache(1)
+    assert loader.calls == [1]
+    clock[0] += 0.2 # 読み込んでから10秒を過ぎた
+    cache(1)
+    assert loader.calls == [1, 1]
+    clock[0] += 5 # 読み直した時刻から数える
+    cache(1)
+    assert loader.calls == [1, 1]
+    assert (cache.stats()["hits"], cache.stats()["expired"]) == (2, 1)
+
+def test_keyword_arguments_and_invalidate():
+    loader = Loader()
+    cache = LookupCache(loader)
+    assert (cache(2), cache(2, scale=3), cache(2, scale=3)) == (2, 6, 6)
+    assert loader.calls == [2, 2]
+    cache.invalidate(2, scale=3)
+    cache(2, scale=3)
+    cache(2)
+    assert loader.calls == [2, 2, 2]
+    cache.invalidate()
+    assert cache.stats()["size"] == 0
+
+def test_horse_cache_table_profile_and_history():
+    df_umainfo = pd.DataFrame({"Father": ["父A", "父B"]}, index=pd.Index([2017100001, 2017100002], name="Uma_Id"))
+    histories = {2017100001: pd.DataFrame({"Uma_Id": [2017100001], "Date": ["2020-01-05"]})}
+    calls = []
+
+    def history(uma_id):
+        calls.append(uma_id)
+        return histories.get(uma_id, pd.DataFrame())
+
+    cache = HorseCache(history, df_umainfo)
+
+    assert cache.profile(2017100003) is None
+    df_profiles = cache.profiles([2017100002, 2017100003, 2017100001])
+    assert df_profiles.Father.to_dict() == {2017100002: "父B", 2017100001: "父A"}
+
+    df_race = cache.get([2017100001, 2017100002, 2017100001])
+    assert len(df_race) == 2 and df_race.Date.dtype.kind == "M" # Dateはdatetime型にしてから覚える
+    assert calls == [2017100001, 2017100002]
+    assert cache.stats()["history"]["hits"] == 1
@@ -0,0 +1,78 @@
+# test_metrics.py
+#----------------------------------------------------------------------------
+# metrics.CrawlMetricsとCrawler.get_responseの計測のテスト
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import json
+import time
+import pytest
+from horse_racing_crawler.metrics import CrawlMetrics, histogram
+from horse_racing_crawler.rate_control import AdaptiveRateController
+from horse_racing_crawler.Race_ver2_03 import Crawler
+
+def test_record_per_id_and_summary():
+    metrics = CrawlMetrics("Race_Crawler")
+    metrics.start_id("202005010101")
+    metrics.add_fetch(0.2, 1000, 200)
+    metrics.add_fetch(0.3, 500, 200, retries=1)
+    metrics.end_id()
+    metrics.start_id("202005010102")
+    metrics.add_fetch(0.1, 100, 404)
+    metrics.end_id(KeyError("Race_Id"))
+
+    first, second = metrics.records
+    assert (first["fetch_time"], first["bytes"], first["retries"]) == (pytest.approx(0.5), 1500, 1)
+    assert (second["status"], second["error"]) == (404, "KeyError")
+    summary = metrics.summary()
+    assert (summary["ids"], summary["errors"], summary["bytes"], summary["retries"]) == (2, 1, 1600, 1)
+    assert summary["errors_by_class"] == {"KeyError": 1}
+    assert summary["status"] == {"200": 1, "404": 1}
+    assert summary["stage_time"]["network"] == pytest.approx(0.6)
+
+def test_sleep_during_id_is_not_parse_time():
+    metrics = CrawlMetrics()
+    metrics.start_id("202005010101")
+    with metrics.stage("sleep"):
+        time.sleep(0.1)
+    metrics.end_id()
+    record = metrics.records[0]
+    assert record["wait_time"] >= 0.1
+    assert record["parse_time"] < 0.05
+
+def test_histogram():
+    result = histogram([0.01, 0.2, 0.2, 3.0, 60.0], buckets=[0.1, 0.5, 5])
+    assert result["buckets"] == {"0.1": 1, "0.5": 3, "5": 4, "+Inf": 5}
+    assert (result["count"], result["p50"], result["p99"]) == (5, 0.2, 60.0)
+
+def test_export_json_and_prometheus(tmp_path):
+    metrics = CrawlMetrics("Race_Crawler")
+    metrics.start_id("202005010101")
+    metrics.add_fetch(0.2, 1000, 200)
+    metrics.end_id()
+    metrics.export(str(tmp_path / "crawl_metrics"), "2020_Race_Crawler")
+
+    with open(tmp_path / "crawl_metrics" / "2020_Race_Crawler.json", encoding="utf-8") as f:
+        summary = json.load(f)
+    assert summary["ids"] == 1 and summary["records"][0]["id"] == "202005010101"
+    with open(tmp_path / "crawl_metrics" / "2020_Race_Crawler.prom", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert 'crawl_fetch_seconds_bucket{crawler="Race_Crawler",le="0.25"} 1' in lines
+    assert 'crawl_bytes_total{crawler="Race_Crawler"} 1000' in lines
+
+def test_get_response_excludes_rate_controller_wait(fixture_server):
+    fixture_server.pages["/race/202005010101/"] = "<html></html>"
+    # 1秒あたり5回なので2回目は約0.2秒待つ
+    crawler = Crawler(sleep_time=AdaptiveRateController(initial_rate=5.0, max_rate=5.0))
+    crawler.base_url = fixture_server.url
+    crawler.metrics.start_id("202005010101")
+    for _ in range(2):
+        crawler.get_response(crawler.base_url + "/race/202005010101/")
+    crawler.metrics.end_id()
+
+    record = crawler.metrics.records[0]
+    assert record["wait_time"] >= 0.15
+    # 待ち時間は通信時間にも解析時間にも入らない
+    assert record["fetch_time"] < 0.15
+    assert record["parse_time"] < 0.1
+    assert crawler.metrics.stage_time["network"] == pytest.approx(record["fetch_time"])
@@ -0,0 +1,100 @@
+# test_odds_log.py
+#----------------------------------------------------------------------------
+# odds_log.pyのテスト(OddsLogは追記した記録を読み戻す，OddsCollectorはtests/fixturesの出馬表とオッズを使う)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import datetime
+import pandas as pd
+import pytest
+from horse_racing_crawler import odds_log as odds_log_module
+from horse_racing_crawler.odds_log import OddsLog, OddsCollector
+from horse_racing_crawler.live_race import LiveRaceCrawler
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+RACE_ID = "202005010101"
+T0 = datetime.datetime(2020, 1, 5, 9, 30)
+T1 = T0 + datetime.timedelta(minutes=5)
+
+@pytest.fixture
+def odds_log(workdir):
+    log = OddsLog()
+    assert log.append(RACE_ID, "tansho", {(1,): 2.3, (2,): 5.1, (3,): 10.0}, T0) == 3
+    assert log.append(RACE_ID, "umaren", {(1, 2): 12.5, (2, 3): 30.0}, T0) == 2
+    # 変わったオッズだけを書き込む
+    assert log.append(RACE_ID, "tansho", {(1,): 2.3, (2,): 4.8, (3,): 10.0}, T1) == 1
+    assert log.append(RACE_ID, "tansho", {(1,): 2.3, (2,): 4.8, (3,): 10.0}, T1) == 0
+    # 同じ開催日の別のレースは同じファイルに入る
+    assert log.append("202005010102", "tansho", {(1,): 1.5}, T0) == 1
+    return log
+
+def test_read_round_trip(odds_log):
+    df_odds = OddsLog().read(RACE_ID) # 新しく開いても同じ記録を読める
+    assert list(df_odds.columns) == ["Race_Id", "Bet_Type", "Num1", "Num2", "Num3", "Time", "Odds"]
+    assert len(df_odds) == 6 and (df_odds.Race_Id == RACE_ID).all()
+    assert df_odds.Time.tolist() == [pd.Timestamp(T0)] * 5 + [pd.Timestamp(T1)]
+
+    df_umaren = odds_log.read(RACE_ID, "umaren")
+    assert df_umaren[["Num1", "Num2", "Num3"]].values.tolist() == [[1, 2, 0], [2, 3, 0]]
+    assert df_umaren.Odds.tolist() == pytest.approx([12.5, 30.0])
+
+def test_at_returns_latest_odds_before_time(odds_log):
+    df_odds = odds_log.at(RACE_ID, T0 + datetime.timedelta(minutes=1))
+    assert df_odds.Odds.tolist() == pytest.approx([2.3, 5.1, 10.0])
+    df_odds = odds_log.at(RACE_ID, T1)
+    assert df_odds.Num1.tolist() == [1, 2, 3]
+    assert df_odds.Odds.tolist() == pytest.approx([2.3, 4.8, 10.0])
+    assert df_odds.Time.tolist() == [pd.Timestamp(T0), pd.Timestamp(T1), pd.Timestamp(T0)]
+    assert odds_log.at(RACE_ID, T0 - datetime.timedelta(seconds=1)).empty
+
+def test_minutes_before_start_time(odds_log):
+    with pytest.raises(ValueError):
+        odds_log.minutes_before(RACE_ID, 10)
+    odds_log.set_start_time(RACE_ID, datetime.datetime(2020, 1, 5, 9, 50))
+    odds_log.set_start_time(RACE_ID, T1 + datetime.timedelta(minutes=10)) # 後に書いた時刻を使う
+    assert odds_log.get_start_time(RACE_ID) == T1 + datetime.timedelta(minutes=10)
+    assert odds_log.minutes_before(RACE_ID, 10).Odds.tolist() == pytest.approx([2.3, 4.8, 10.0])
+    assert odds_log.minutes_before(RACE_ID, 12).Odds.tolist() == pytest.approx([2.3, 5.1, 10.0])
+
+def test_finish_forgets_last_odds(odds_log):
+    odds_log.finish(RACE_ID)
+    # 前回のオッズを忘れたので同じオッズでも書き込む(他のレースは覚えたまま)
+    assert odds_log.append(RACE_ID, "tansho", {(1,): 2.3}, T1) == 1
+    assert odds_log.append("202005010102", "tansho", {(1,): 1.5}, T1) == 0
+
+@pytest.fixture
+def race_day(fixture_server):
+    """発走時刻が未定の出馬表と単勝のオッズを返すサーバー(tests/fixturesの202005010105)"""
+    race_id = "202005010105"
+    with open(os.path.join(FIXTURE_DIR, "shutuba_{}.html".format(race_id)), encoding="utf-8") as f:
+        fixture_server.pages["/race/shutuba.html?race_id={}".format(race_id)] = f.read().replace("10:30発走", "発走時刻未定")
+    with open(os.path.join(FIXTURE_DIR, "odds_{}_1.json".format(race_id)), encoding="utf-8") as f:
+        fixture_server.pages["/api/api_get_jra_odds.html?race_id={}&type=1".format(race_id)] = f.read()
+    return fixture_server
+
+def test_collector_without_start_time(workdir, race_day, monkeypatch):
+    race_id = "202005010105"
+    page = "/race/shutuba.html?race_id={}".format(race_id)
+    clock = [1000.0]
+    monkeypatch.setattr(odds_log_module, "monotonic", lambda: clock[0])
+    crawler = LiveRaceCrawler()
+    crawler.base_url = race_day.url
+    collector = OddsCollector(crawler, OddsLog(), bet_types=("tansho",), start_time_ttl=300)
+    now = datetime.datetime(2020, 1, 5, 10, 0)
+
+    # 発走時刻が分からない間もオッズを取得し続ける
+    assert collector.get_start_time(race_id) is None
+    assert collector.poll([race_id], now=now) == [race_id]
+    assert collector.next_interval([race_id], now=now) == collector.interval
+    assert len(collector.odds_log.read(race_id)) == 3
+    # start_time_ttl秒の間は出馬表を取り直さない
+    assert race_day.requests.count(page) == 1
+
+    # 発走時刻が出た後，start_time_ttl秒経つと取り直して記録する
+    race_day.pages[page] = race_day.pages[page].replace("発走時刻未定", "10:30発走")
+    clock[0] += 301
+    assert collector.get_start_time(race_id) == datetime.datetime(2020, 1, 5, 10, 30)
+    assert race_day.requests.count(page) == 2
+    assert collector.poll([race_id], now=datetime.datetime(2020, 1, 5, 10, 30)) == []
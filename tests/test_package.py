@@ -0,0 +1,22 @@
+# test_package.py
+#----------------------------------------------------------------------------
+# __init__.pyのテスト
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import types
+import importlib
+import horse_racing_crawler
+
+def test_function_is_not_replaced_by_submodule():
+    importlib.import_module("horse_racing_crawler.get_past_race")
+    importlib.import_module("horse_racing_crawler.get_past_race_ver1")
+    assert isinstance(horse_racing_crawler.get_past_race, types.FunctionType)
+    assert horse_racing_crawler.get_past_race.__module__ == "horse_racing_crawler.get_past_race"
+    from horse_racing_crawler import sort_all_race_data
+    assert callable(sort_all_race_data)
+
+def test_submodules_are_still_importable():
+    from horse_racing_crawler.get_past_race import sort_all_race_data
+    assert callable(sort_all_race_data)
+    assert isinstance(horse_racing_crawler.df_io, types.ModuleType)
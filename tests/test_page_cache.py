@@ -0,0 +1,76 @@
+# test_page_cache.py
+#----------------------------------------------------------------------------
+# page_cache.pyと馬情報の取り直し(cli.stage_horse)のテスト(ローカルのテスト用サーバーを使う)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import datetime
+import pytest
+from horse_racing_crawler.cli import run_job
+from horse_racing_crawler.df_io import read_umainfo_table
+from horse_racing_crawler.id_registry import IdRegistry
+from horse_racing_crawler.page_cache import PageCache
+from horse_racing_crawler.Race_ver2_03 import Race_Crawler, Horse_Info_Crawler
+
+UMA_IDS = ["2017100001", "2017100002"]
+
+def horse_page(uma_id, result="5戦1勝 [1-0-0-4]"):
+    """馬のページ(Horse_Info_Crawlerが読む部分だけ)"""
+    blood = "".join('<td><a href="/horse/ped/{0}{1}/">血統{1}</a></td>'.format(uma_id, i) for i in range(6))
+    return """<html><body>
+<table class="db_prof_table">
+<tr><th>生年月日</th><td>2017年3月1日</td></tr>
+<tr><th>調教師</th><td><a href="/trainer/01088/">調教師</a></td></tr>
+<tr><th>馬主</th><td><a href="/owner/002000/">馬主</a></td></tr>
+<tr><th>生産者</th><td><a href="/breeder/000300/">生産者</a></td></tr>
+<tr><th>産地</th><td>日高町</td></tr>
+<tr><th>通算成績</th><td>{}</td></tr>
+</table>
+<table class="blood_table"><tr>{}</tr></table>
+</body></html>""".format(result, blood)
+
+@pytest.fixture
+def horse_server(fixture_server, monkeypatch):
+    """馬のページを返すサーバー(Horse_Info_Crawlerの取得先にする)"""
+    for uma_id in UMA_IDS:
+        fixture_server.pages["/horse/{}/".format(uma_id)] = horse_page(uma_id)
+    monkeypatch.setattr(Horse_Info_Crawler, "base_url", fixture_server.url)
+    monkeypatch.setattr(Horse_Info_Crawler, "metrics_dir", None)
+    return fixture_server
+
+def make_stale():
+    """全ての馬を取り直しの対象にする(取得日時を古くする)"""
+    IdRegistry().mark_fetched("Uma_Id", UMA_IDS, fetched_at=datetime.datetime(2020, 1, 1))
+
+def test_year_crawler_rejects_page_cache(workdir):
+    crawler = Race_Crawler(sleep_time=0)
+    crawler.page_cache = PageCache()
+    with pytest.raises(ValueError, match="page_cache"):
+        crawler(2020)
+
+def test_stage_horse_skips_apply_when_nothing_changed(workdir, horse_server):
+    os.mkdir("uma_id")
+    with open("uma_id/2020.txt", "w") as f:
+        f.writelines("{}\n".format(uma_id) for uma_id in UMA_IDS)
+    job = {"years": [2020, 2020], "stages": ["horse"], "sleep_time": 0, "page_cache": "page_cache.sqlite", "progress": False}
+
+    # 1回目: 全ての馬を取得して馬情報テーブルに反映する
+    run_job(job)
+    df_umainfo = read_umainfo_table()
+    assert sorted(str(uma_id) for uma_id in df_umainfo.index) == UMA_IDS
+    assert df_umainfo.Result_Rate.tolist() == [0.2, 0.2]
+
+    # 2回目: ページが変わっていないので出力が無く，前回の出力を反映し直さない
+    os.remove("umainfo_csv_data/plan_2020_2020.csv")
+    make_stale()
+    run_job(job)
+    assert not os.path.exists("umainfo_csv_data/plan_2020_2020.csv")
+    assert IdRegistry().unfetched("Uma_Id", UMA_IDS) == []
+
+    # 3回目: 変わった馬だけ取得して反映する
+    horse_server.pages["/horse/2017100002/"] = horse_page("2017100002", "10戦5勝 [5-0-0-5]")
+    make_stale()
+    run_job(job)
+    df_umainfo = read_umainfo_table()
+    assert df_umainfo.Result_Rate.tolist() == [0.2, 0.5]
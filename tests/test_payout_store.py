@@ -0,0 +1,85 @@
+# test_payout_store.py
+#----------------------------------------------------------------------------
+# payout_store.pyのテスト(今までの形式から変換した払い戻しとPayout_Crawlerの1組み合わせ1行の形式を比べる)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import pandas as pd
+from conftest import make_race_data
+from horse_racing_crawler.payout_store import PayoutStore, PAYOUT_COLUMNS, normalize_bets, wide_to_long
+
+def race_data():
+    """2レース分(1レース目は1着1番, 2着2番, 3着3番，2レース目は1着4番, 2着3番, 3着2番)"""
+    df_race = make_race_data(n_races=2, n_horses=4)
+    second = df_race.Race_Id == df_race.Race_Id.max()
+    df_race.loc[second, "Number"] = 5 - df_race.loc[second, "Number"]
+    df_race.loc[second, "Waku"] = df_race.loc[second, "Number"]
+    return df_race
+
+def payouts():
+    """Payout_Crawlerの今までの形式(1レース1行)と1組み合わせ1行の形式(馬番は払い戻し表の順)"""
+    wide = [
+        {"Race_Id": 202005010101, "Tansho": 2.3, "Huku_Num1": "1", "Huku_Odds1": 1.2, "Huku_Num2": "2", "Huku_Odds2": 1.8,
+         "Huku_Num3": "3", "Huku_Odds3": 3.1, "Wakuren": 5.5, "Umaren": 6.4, "Wide_Num1": "1 - 2", "Wide_Odds1": 2.5,
+         "Wide_Num2": "1 - 3", "Wide_Odds2": 4.0, "Umatan": 9.9, "Sanrenpuku": 12.0, "Sanrentan": 40.7},
+        # 2レース目は複勝が2頭分だけ，枠連が無い
+        {"Race_Id": 202005010102, "Tansho": 8.1, "Huku_Num1": "4", "Huku_Odds1": 2.0, "Huku_Num2": "3", "Huku_Odds2": 1.5,
+         "Umaren": 20.0, "Wide_Num1": "3 - 4", "Wide_Odds1": 7.0, "Umatan": 45.3, "Sanrenpuku": 30.0,
+         "Sanrentan": 210.2},
+    ]
+    long = [
+        (202005010101, "tansho", 1, 0, 0, 230), (202005010101, "fukusho", 1, 0, 0, 120),
+        (202005010101, "fukusho", 2, 0, 0, 180), (202005010101, "fukusho", 3, 0, 0, 310),
+        (202005010101, "wakuren", 1, 2, 0, 550), (202005010101, "umaren", 1, 2, 0, 640),
+        (202005010101, "wide", 1, 2, 0, 250), (202005010101, "wide", 1, 3, 0, 400),
+        (202005010101, "umatan", 1, 2, 0, 990), (202005010101, "sanrenpuku", 1, 2, 3, 1200),
+        (202005010101, "sanrentan", 1, 2, 3, 4070),
+        (202005010102, "tansho", 4, 0, 0, 810), (202005010102, "fukusho", 4, 0, 0, 200),
+        (202005010102, "fukusho", 3, 0, 0, 150), (202005010102, "umaren", 4, 3, 0, 2000),
+        (202005010102, "wide", 3, 4, 0, 700), (202005010102, "umatan", 4, 3, 0, 4530),
+        (202005010102, "sanrenpuku", 4, 3, 2, 3000), (202005010102, "sanrentan", 4, 3, 2, 21020),
+    ]
+    return pd.DataFrame(wide), pd.DataFrame(long, columns=PAYOUT_COLUMNS)
+
+def sort_payouts(df):
+    return df.sort_values(PAYOUT_COLUMNS[:-1]).reset_index(drop=True)
+
+def test_normalize_bets():
+    bets = pd.DataFrame({"Race_Id": [202005010102] * 4, "Bet_Type": ["umaren", "umatan", "sanrenpuku", "tansho"],
+                         "Num1": [4, 4, 4, 4], "Num2": [3, 3, 0, None], "Num3": [None, None, 2, None]})
+    df = normalize_bets(bets)
+    assert df.Race_Id.tolist() == ["202005010102"] * 4
+    # 順番に意味のない券種だけ小さい順(使わない所は0のまま後ろ)
+    assert df[["Num1", "Num2", "Num3"]].values.tolist() == [[3, 4, 0], [4, 3, 0], [2, 4, 0], [4, 0, 0]]
+    pd.testing.assert_frame_equal(normalize_bets(df), df)
+    # Num2, Num3が無い買い目は0で補う
+    df = normalize_bets(pd.DataFrame({"Race_Id": ["202005010101"], "Bet_Type": ["tansho"], "Num1": [1]}))
+    assert df[["Num1", "Num2", "Num3"]].values.tolist() == [[1, 0, 0]]
+
+def test_wide_to_long_matches_long_rows():
+    df_wide, df_long = payouts()
+    df_converted = wide_to_long(df_wide, race_data())
+    assert list(df_converted.columns) == PAYOUT_COLUMNS
+    pd.testing.assert_frame_equal(sort_payouts(df_converted), sort_payouts(normalize_bets(df_long)), check_dtype=False)
+
+def test_build_from_both_formats(workdir):
+    df_wide, df_long = payouts()
+    os.mkdir("payout_csv_data")
+    os.mkdir("race_csv_data")
+    # 2019年は今までの形式だけ，2020年は1組み合わせ1行の形式がある
+    df_race_2019 = race_data().assign(Race_Id=lambda df: df.Race_Id - 100000000)
+    df_race_2019.to_csv("race_csv_data/2019_all_race.csv", encoding="shift-jis", index=False)
+    df_wide.assign(Race_Id=df_wide.Race_Id - 100000000).to_csv("payout_csv_data/2019_all_payout.csv", encoding="shift-jis",
+                                                            index=False)
+    df_long.to_csv("payout_csv_data/2020_payout_long.csv", encoding="shift-jis", index=False)
+
+    table = PayoutStore().build(2019, 2020)
+    assert len(table) == 2 * len(df_long)
+    # 保存したものを読み直し，同じ買い目は同じ払い戻しになる
+    store = PayoutStore()
+    df_bets = df_long.assign(Num1=df_long.Num2.where(df_long.Bet_Type == "umaren", df_long.Num1),
+                             Num2=df_long.Num1.where(df_long.Bet_Type == "umaren", df_long.Num2))
+    assert store.lookup(df_bets).tolist() == df_long.Payout.tolist()
+    df_bets_2019 = df_long.assign(Race_Id=df_long.Race_Id - 100000000)
+    assert store.lookup(df_bets_2019).tolist() == df_long.Payout.tolist()
@@ -0,0 +1,122 @@
+# test_pysql.py
+#----------------------------------------------------------------------------
+# pysql.pyのテスト(SQLiteを使う)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+from conftest import make_race_data
+from horse_racing_crawler.pysql import PySQL, AsyncSQLWriter
+from horse_racing_crawler.Race_ver2_03 import Race_Crawler, Payout_Crawler, PayoutRows, PayoutBuffer, RaceBuffer
+
+def payout_rows(race_id, wakuren):
+    """1レース分の払い戻し(枠連，複勝3頭目はレースによって無い)"""
+    details = {"Race_Id": race_id, "Tansho": 2.3, "Huku_Num1": "3", "Huku_Odds1": 1.2, "Huku_Num2": "5", "Huku_Odds2": 1.8}
+    rows = [(race_id, "tansho", 3, 0, 0, 230), (race_id, "fukusho", 3, 0, 0, 120), (race_id, "fukusho", 5, 0, 0, 180)]
+    if wakuren:
+        details.update({"Huku_Num3": "7", "Huku_Odds3": 3.1, "Wakuren": 12.5})
+        rows += [(race_id, "fukusho", 7, 0, 0, 310), (race_id, "wakuren", 2, 4, 0, 1250)]
+    return PayoutRows(details, rows)
+
+def test_payout_batches_with_different_wide_columns(workdir):
+    engine = sa.create_engine("sqlite:///{}/test.sqlite".format(workdir))
+    crawler = Payout_Crawler(sleep_time=0)
+    crawler.sql_writer = AsyncSQLWriter(engine)
+    for race_id, wakuren in [("202005010101", False), ("202005010102", True)]:
+        crawler.sql_batch = PayoutBuffer()
+        crawler.sql_batch.extend(payout_rows(race_id, wakuren))
+        crawler.flush_sql(2020)
+    crawler.sql_writer.close()
+
+    df = pd.read_sql("SELECT * FROM \"2020_payout_long\"", engine)
+    assert len(df) == 8
+    assert df.loc[df.Bet_Type == "wakuren", "Payout"].tolist() == [1250]
+
+def test_race_table_types_do_not_depend_on_first_batch(workdir):
+    engine = sa.create_engine("sqlite:///{}/test.sqlite".format(workdir))
+    crawler = Race_Crawler(sleep_time=0)
+    crawler.sql_writer = AsyncSQLWriter(engine)
+    df_race = make_race_data(n_races=2).astype({"Race_Id": str})
+    # 最初のバッチは取消などで着順，タイムなどが全て空
+    first = df_race.head(3).assign(Rank="", Time="", Delay="", Ninki="", Tansho="", Jockey_Id="")
+    second = df_race.tail(3).assign(Delay="クビ", Corner="1-1")
+    for df in [first, second]:
+        crawler.sql_batch = RaceBuffer()
+        crawler.sql_batch.extend(df.to_dict("records"))
+        crawler.flush_sql(2020)
+    crawler.sql_writer.close()
+
+    types = {column["name"]: type(column["type"]) for column in sa.inspect(engine).get_columns("2020_all_race")}
+    assert list(types) == list(crawler.sql_types())
+    assert (types["Rank"], types["Time"], types["Delay"], types["Race_Id"]) == (sa.BIGINT, sa.FLOAT, sa.TEXT, sa.BIGINT)
+    df = pd.read_sql("SELECT Rank, Delay, Race_Id FROM \"2020_all_race\"", engine)
+    assert df.Rank.isna().tolist() == [True] * 3 + [False] * 3
+    assert df.Delay.tolist()[3:] == ["クビ"] * 3
+    assert df.Race_Id.tolist() == [202005010101] * 3 + [202005010102] * 3
+
+@pytest.fixture
+def pysql(workdir):
+    """2018〜2020年のレースのテーブル(1年4レース，1月1日から1日1レース)と年ではないテーブルを入れたSQLite"""
+    pysql = PySQL(url="sqlite:///{}/races.sqlite".format(workdir), database_name=None)
+    for year in [2018, 2019, 2020]:
+        pysql.to_sql(df_race=make_race_data(year=year), tbl_name="{}_all_race".format(year))
+    pysql.to_sql(df_race=make_race_data(year=2020), tbl_name="2020_all_race_backup")
+    return pysql
+
+def test_races_include_end_day(pysql):
+    df_race = pysql.races("2020-01-02", pd.Timestamp("2020-01-03 09:00"))
+    assert df_race.Date.unique().tolist() == ["2020-01-02", "2020-01-03"]
+    assert df_race.Number.tolist() == [1, 2, 3] * 2
+    # 年をまたぐ期間は年ごとのテーブルをまとめる(年ではないテーブルは使わない)
+    df_race = pysql.races("2019-01-04", "2020-01-01")
+    assert df_race.Date.unique().tolist() == ["2019-01-04", "2020-01-01"]
+    assert pysql.get_race_tables() == {2018: "2018_all_race", 2019: "2019_all_race", 2020: "2020_all_race"}
+    assert pysql.races("2021-01-01", "2021-12-31").empty
+
+def test_history_prunes_years_after_before(pysql):
+    df_history = pysql.history(2017100001, before="2019-01-03")
+    assert df_history.Date.tolist() == ["2018-01-0{}".format(day) for day in range(1, 5)] + ["2019-01-01", "2019-01-02"]
+    assert set(pysql.statements) == {("history", (2018, 2019))}
+    # beforeが無い場合は全ての年
+    assert len(pysql.history("2017100002")) == 12
+    assert ("history", (2018, 2019, 2020)) in pysql.statements
+    assert pysql.history(2017100001, before="2018-01-01").empty
+
+def test_jockey_entries(pysql):
+    df_entries = pysql.jockey_entries(1001, "2019-01-04", "2020-01-01")
+    assert df_entries.Date.tolist() == ["2019-01-04"] * 2 + ["2020-01-01"] * 2
+    assert df_entries.Number.tolist() == [1, 3, 1, 3]
+    assert len(pysql.jockey_entries(1000)) == 12 # 期間を指定しない場合は全ての年
+
+def test_statement_cache_is_rebuilt_after_refresh(pysql):
+    pysql.races("2020-01-01", "2020-01-01")
+    statement = pysql.statements[("races", (2020,))]
+    assert len(pysql.races("2020-01-02", "2020-01-02")) == 3 # 値が違っても同じクエリを使う
+    assert pysql.statements == {("races", (2020,)): statement}
+
+    # テーブルを追加しても調べ直すまでは前の年のテーブルだけを使う
+    pysql.to_sql(df_race=make_race_data(year=2021), tbl_name="2021_all_race")
+    assert pysql.races("2021-01-01", "2021-01-04").empty
+    assert 2021 in pysql.get_race_tables(refresh=True)
+    assert pysql.statements == {}
+    assert len(pysql.races("2021-01-01", "2021-01-04")) == 12
+    statement = pysql.statements[("races", (2021,))]
+    pysql.races("2021-01-02", "2021-01-02")
+    assert pysql.statements[("races", (2021,))] is statement
+
+def test_create_indexes(pysql):
+    pysql.to_sql(df_race=pd.DataFrame({"Uma_Id": [2017100001], "Date": ["2021-01-01"]}), tbl_name="2021_all_race")
+    pysql.create_indexes([2019, 2021, 2030])
+    inspector = sa.inspect(pysql.engine)
+    indexes = {tbl_name: {index["name"]: index["column_names"] for index in inspector.get_indexes(tbl_name)}
+               for tbl_name in ["2018_all_race", "2019_all_race", "2021_all_race"]}
+    assert indexes["2019_all_race"] == {"ix_2019_all_race_uma_id": ["Uma_Id"], "ix_2019_all_race_jockey_id": ["Jockey_Id"],
+                                        "ix_2019_all_race_race_id": ["Race_Id"]}
+    assert indexes["2021_all_race"] == {"ix_2021_all_race_uma_id": ["Uma_Id"]} # 無い列には作らない
+    assert indexes["2018_all_race"] == {}
+    # 2回目は作り済みの索引を飛ばす
+    pysql.create_indexes()
+    assert len(sa.inspect(pysql.engine).get_indexes("2019_all_race")) == 3
+    assert len(sa.inspect(pysql.engine).get_indexes("2018_all_race")) == 3
@@ -0,0 +1,44 @@
+# test_race_archive.py
+#----------------------------------------------------------------------------
+# race_archive.pyのテスト
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import pandas as pd
+import pytest
+from conftest import make_race_data
+from horse_racing_crawler.race_archive import RaceArchive
+
+def test_round_trip_by_race_and_horse(workdir):
+    df_race = make_race_data(n_races=5)
+    archive = RaceArchive(block_races=2)
+    assert archive.write(2020, df_race) == {"rows": 15, "blocks": 3, "bytes": os.path.getsize("race_archive/2020.blocks")}
+
+    pd.testing.assert_frame_equal(archive.read_year(2020), df_race)
+    race_id = df_race.Race_Id.iloc[9]
+    pd.testing.assert_frame_equal(archive.get_race(race_id), df_race[df_race.Race_Id == race_id].reset_index(drop=True))
+    pd.testing.assert_frame_equal(archive.get_history(2017100002), df_race[df_race.Uma_Id == 2017100002].reset_index(drop=True))
+    assert archive.get_race(202005019999).empty
+
+def test_empty_year_writes_empty_index(workdir):
+    archive = RaceArchive()
+    archive.write(2020, make_race_data())
+    assert archive.write(2021, make_race_data(year=2021).iloc[0:0]) == {"rows": 0, "blocks": 0, "bytes": 0}
+    assert sorted(os.listdir("race_archive")) == ["2020.blocks", "2020.index", "2021.blocks", "2021.index"]
+
+    # 新しく読み込んでも空の年を扱える
+    archive = RaceArchive()
+    assert archive.years() == [2020, 2021]
+    assert archive.read_year(2021).empty
+    assert archive.get_race(202105010101).empty
+    assert len(archive.get_history(2017100001)) == 4
+
+def test_failed_write_leaves_no_temporary_files(workdir):
+    archive = RaceArchive()
+    archive.write(2020, make_race_data())
+    with pytest.raises(KeyError):
+        archive.write(2020, make_race_data().drop(columns="Uma_Id"))
+    # 前に保存したものはそのまま
+    assert sorted(os.listdir("race_archive")) == ["2020.blocks", "2020.index"]
+    assert len(RaceArchive().read_year(2020)) == 12
@@ -0,0 +1,43 @@
+# test_race_buffer.py
+#----------------------------------------------------------------------------
+# RaceRows, RaceBufferのテスト(今までの辞書のリストから作るデータフレームと同じになるか)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import pandas as pd
+from conftest import make_race_data
+from horse_racing_crawler.Race_ver2_03 import ENTRY_COLUMNS, RACE_COLUMNS, RaceRows, RaceBuffer
+
+def race_rows():
+    """レースごとのRaceRows(頭数はレースによって違う)"""
+    df = make_race_data(n_races=4, n_horses=4).drop(index=[2, 3, 13])
+    return [RaceRows(list(df_one[list(ENTRY_COLUMNS)].itertuples(index=False, name=None)),
+                     df_one[list(RACE_COLUMNS)].iloc[0].to_dict())
+            for _, df_one in df.groupby("Race_Id", sort=False)]
+
+def test_to_frame_matches_dict_rows():
+    races = race_rows()
+    buffer = RaceBuffer()
+    for data in races:
+        buffer.extend(data)
+    # 今まで通り1頭ずつの辞書を並べて作ったデータフレーム
+    expected = pd.DataFrame([details for data in races for details in data])
+    assert len(buffer) == len(expected) == 13
+    df = buffer.to_frame()
+    assert list(df.columns) == list(ENTRY_COLUMNS) + list(RACE_COLUMNS)
+    pd.testing.assert_frame_equal(df, expected[df.columns])
+
+def test_dict_rows_and_race_rows_give_same_frame():
+    races = race_rows()
+    buffer, dict_buffer = RaceBuffer(), RaceBuffer()
+    for data in races:
+        buffer.extend(data)
+        dict_buffer.extend(list(data)) # 1頭ずつの辞書のリストで渡す
+    dict_buffer.extend(RaceRows([], races[0].race_info)) # 馬がいないレースは追加しない
+    pd.testing.assert_frame_equal(dict_buffer.to_frame(), buffer.to_frame())
+
+def test_race_rows_get_column():
+    data = race_rows()[1]
+    assert data.get_column("Number") == [row["Number"] for row in data]
+    assert data.get_column("Race_Id") == [data.race_info["Race_Id"]] * len(data)
+    assert data.get_column("Unknown") == []
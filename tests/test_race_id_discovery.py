@@ -0,0 +1,81 @@
+# test_race_id_discovery.py
+#----------------------------------------------------------------------------
+# race_id_discovery.pyのテスト(ローカルのテスト用サーバーを使う)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import pytest
+import requests
+from horse_racing_crawler.race_id_discovery import RaceIdDiscovery
+
+RACE_PAGE = '<html><body><table class="race_table_01"></table></body></html>'
+
+def race_ids():
+    """2020年 東京1回1日目，2日目(12R)と中山1回1日目(8R)"""
+    ids = ["2020050101{:02}".format(race) for race in range(1, 13)]
+    ids += ["2020050102{:02}".format(race) for race in range(1, 13)]
+    ids += ["2020060101{:02}".format(race) for race in range(1, 9)]
+    return ids
+
+def test_discover_probes_pages_and_skips_known_ids(workdir, fixture_server):
+    for race_id in race_ids():
+        fixture_server.pages["/race/{}/".format(race_id)] = RACE_PAGE
+    # 結果の表が無いページは存在しないものとして扱う
+    fixture_server.pages["/race/202006010109/"] = "<html><body>no result</body></html>"
+    known = ["202005010101", "202005010112"]
+    (workdir / "race_id").mkdir()
+    (workdir / "race_id" / "2020.txt").write_text("".join(race_id + "\n" for race_id in known))
+
+    discovery = RaceIdDiscovery(sleep_time=0, max_workers=2, base_url=fixture_server.url, max_kai=2)
+    new_ids = discovery(2020)
+
+    assert new_ids == sorted(set(race_ids()) - set(known))
+    with open("race_id/2020.txt") as f:
+        lines = [s.strip() for s in f]
+    assert sorted(lines) == sorted(race_ids())
+    # 既に分かっているidのページは取得しない
+    assert "/race/202005010101/" not in fixture_server.requests
+    assert "/race/202005010112/" not in fixture_server.requests
+
+    # 2回目は新しいidなし
+    assert discovery(2020) == []
+
+def test_stalled_probe_times_out(workdir, fixture_server):
+    fixture_server.pages["/race/202005010101/"] = RACE_PAGE
+    fixture_server.delay = 2
+    discovery = RaceIdDiscovery(sleep_time=0, base_url=fixture_server.url, timeout=0.2)
+    with pytest.raises(requests.Timeout):
+        discovery.exists("202005010101")
+
+def test_failing_day_is_skipped_and_retried(workdir, fixture_server):
+    for race_id in race_ids():
+        fixture_server.pages["/race/{}/".format(race_id)] = RACE_PAGE
+    fixture_server.failures["/race/202005010101/"] = 1   # 1回だけ失敗(取り直しで見つかる)
+    fixture_server.failures["/race/202006010101/"] = 100 # ずっと失敗
+    discovery = RaceIdDiscovery(sleep_time=0, max_workers=2, base_url=fixture_server.url, max_kai=2, max_retries=2)
+    new_ids = discovery(2020)
+
+    # 失敗し続けた開催日は飛ばし，他の会場のidは保存する
+    assert new_ids == [race_id for race_id in race_ids() if not race_id.startswith("2020060101")]
+    assert discovery.failed_days == ["2020060101"]
+    assert fixture_server.requests.count("/race/202006010101/") == 3
+
+    # 次に実行した時に調べ直す
+    fixture_server.failures.clear()
+    assert discovery(2020) == [race_id for race_id in race_ids() if race_id.startswith("2020060101")]
+
+def test_found_ids_are_saved_when_interrupted(workdir, fixture_server):
+    for race_id in race_ids():
+        fixture_server.pages["/race/{}/".format(race_id)] = RACE_PAGE
+
+    def callback(race_id):
+        if race_id == "202005010201":
+            raise KeyboardInterrupt
+
+    discovery = RaceIdDiscovery(sleep_time=0, max_workers=1, base_url=fixture_server.url, max_kai=2)
+    with pytest.raises(KeyboardInterrupt):
+        discovery.discover(2020, callback)
+    with open("race_id/2020.txt") as f:
+        saved = [s.strip() for s in f]
+    # 止まる前に見つかった東京1回1日目は保存されている
+    assert saved[:12] == ["2020050101{:02}".format(race) for race in range(1, 13)]
@@ -0,0 +1,61 @@
+# test_race_schema.py
+#----------------------------------------------------------------------------
+# Race_Crawler.get_column_indexのテスト(見出しの並び替え，表記ゆれ，欠けた見出し)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import pytest
+from bs4 import BeautifulSoup
+from horse_racing_crawler.Race_ver2_03 import (Race_Crawler, SchemaError, RESULT_HEADERS, RESULT_POSITIONS,
+                                               normalize_header)
+
+# netkeibaのレース結果の表の見出し(今までの並び)
+HEADERS = ["着順", "枠番", "馬番", "馬名", "性齢", "斤量", "騎手", "タイム", "着差", "ﾀｲﾑ指数", "通過", "上り", "単勝",
+           "人気", "馬体重", "調教ﾀｲﾑ", "厩舎ｺﾒﾝﾄ", "備考", "調教師", "馬主", "賞金(万円)"]
+# 見出し -> 1頭目のセル
+CELLS = {
+    "着順": "2", "枠番": "1", "馬番": "1", "馬名": '<a href="/horse/2017100001/">馬1</a>', "性齢": "牝3",
+    "斤量": "54", "枠": "1", "騎手": '<a href="/jockey/result/recent/01000/">騎手0</a>', "タイム": "1:36.5", "着差": "クビ",
+    "通過": "3-3", "上り": "35.1", "単勝": "4.5", "人気": "2", "馬体重": "480(+4)",
+    "調教師": '<a href="/trainer/result/recent/01088/">調教師</a>', "馬主": '<a href="/owner/result/recent/002000/">馬主</a>',
+}
+
+def table(headers):
+    """見出しと1頭分の行(CELLSは表記ゆれをそろえて引く，無い見出しは空のセル)"""
+    html = "<table><tr>{}</tr><tr>{}</tr></table>".format(
+        "".join("<th>{}</th>".format(header) for header in headers),
+        "".join("<td>{}</td>".format(CELLS.get(normalize_header(header), "")) for header in headers))
+    return BeautifulSoup(html, "html.parser").find_all("tr")
+
+def test_usual_headers_match_positions():
+    header, _ = table(HEADERS)
+    assert Race_Crawler().get_column_index(header) == RESULT_POSITIONS
+
+def test_reordered_headers_are_read_by_name():
+    headers = ["馬番", "枠", "着順", "馬 名", "性齢", "騎手", "斤量", "ﾀｲﾑ", "着差", "通過", "上り", "人気", "単勝",
+               "馬体重", "馬主", "調教師"]
+    header, row = table(headers)
+    crawler = Race_Crawler()
+    crawler.column_index = crawler.get_column_index(header)
+    assert set(crawler.column_index) == set(RESULT_HEADERS)
+    # 半角カナ，空白，"枠"も同じ見出しとして扱う
+    assert (crawler.column_index["waku"], crawler.column_index["name"], crawler.column_index["time"]) == (1, 3, 7)
+
+    row = crawler.get_detail_row(row)
+    assert row[:9] == (2, 1, 1, "馬1", 2017100001, "牝", 1, 3, 54.0)
+    assert row[9:] == ("騎手0", 1000, 96.5, "クビ", 2, 4.5, 35.1, "3-3", 480, 4, "調教師", 1088, "馬主", 2000)
+
+@pytest.mark.parametrize("removed", ["着順", "馬名", "馬主"])
+def test_missing_header_raises_schema_error(removed):
+    header, _ = table([text for text in HEADERS if text != removed])
+    with pytest.raises(SchemaError, match=removed):
+        Race_Crawler().get_column_index(header)
+
+def test_renamed_header_raises_schema_error():
+    header, _ = table(["順位" if text == "着順" else text for text in HEADERS])
+    with pytest.raises(SchemaError, match="headers: 順位"):
+        Race_Crawler().get_column_index(header)
+
+def test_no_headers_use_usual_positions():
+    header = BeautifulSoup("<table><tr><td>1</td></tr></table>", "html.parser").find("tr")
+    assert Race_Crawler().get_column_index(header) == RESULT_POSITIONS
@@ -0,0 +1,76 @@
+# test_rate_control.py
+#----------------------------------------------------------------------------
+# rate_control.AdaptiveRateControllerのテスト(時刻と停止はテスト用の時計に置き換える)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import pytest
+from horse_racing_crawler import rate_control
+from horse_racing_crawler.rate_control import AdaptiveRateController
+
+@pytest.fixture
+def clock(monkeypatch):
+    """monotonicとsleepをテスト用の時計にする(sleepは時計を進めるだけ)"""
+    now = [100.0]
+    slept = []
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+    monkeypatch.setattr(rate_control, "monotonic", lambda: now[0])
+    monkeypatch.setattr(rate_control, "sleep", sleep)
+    return now, slept
+
+def test_wait_spaces_requests_by_interval(clock):
+    now, slept = clock
+    controller = AdaptiveRateController(initial_rate=4.0)
+    assert controller.wait() == 0 # 最初は待たない
+    assert controller.wait() == pytest.approx(0.25)
+    now[0] += 1.0 # 間隔より長く空いた場合は待たない
+    assert controller.wait() == 0
+    assert slept == [pytest.approx(0.25)]
+
+def test_success_increases_until_max_rate(clock):
+    controller = AdaptiveRateController(initial_rate=1.0, max_rate=1.2, increase=0.05)
+    for _ in range(3):
+        controller.record(0.1, 200)
+    assert controller.rate == pytest.approx(1.15)
+    for _ in range(10):
+        controller.record(0.1, 200)
+    assert controller.rate == 1.2
+
+def test_errors_back_off_and_delay_next_request(clock):
+    now, _ = clock
+    controller = AdaptiveRateController(initial_rate=2.0, min_rate=0.3)
+    controller.wait()
+    controller.record(0.1, 429)
+    assert controller.rate == 1.0
+    assert controller.next_time == pytest.approx(now[0] + 1.0)
+    controller.record(0.1, error=True)
+    controller.record(0.1, 503)
+    assert controller.rate == 0.3 # min_rateより遅くはしない
+    # 直近のエラー率がmax_error_rateを超えている間は増やさない
+    controller.record(0.1, 200)
+    assert controller.rate == 0.3
+
+def test_latency_spike_backs_off(clock):
+    controller = AdaptiveRateController(initial_rate=2.0, increase=0.0)
+    for _ in range(5):
+        controller.record(0.1, 200)
+    controller.record(0.5, 200)
+    assert controller.rate == 1.0
+    # 1回だけの急増で平常時の値はほとんど変わらない
+    assert controller.latency == pytest.approx(0.1 * 0.98 + 0.5 * 0.02)
+
+def test_sustained_slower_latency_becomes_baseline(clock):
+    controller = AdaptiveRateController(initial_rate=2.0, min_rate=0.05, increase=0.05)
+    for _ in range(20):
+        controller.record(0.1, 200)
+    # 応答時間が5倍のまま続く
+    rates = []
+    for _ in range(300):
+        controller.record(0.5, 200)
+        rates.append(controller.rate)
+    assert controller.latency > 0.5 / controller.latency_factor
+    # 一度は下がるが，min_rateに張り付かずに戻る
+    assert min(rates) < 0.5
+    assert rates[-1] > 1.0
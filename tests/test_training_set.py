@@ -0,0 +1,59 @@
+# test_training_set.py
+#----------------------------------------------------------------------------
+# training_set.pyのテスト(出力した行列を読み直してレースデータと比べる)
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import make_race_data
+from horse_racing_crawler.training_set import TrainingSetExporter, load_training_set
+
+def write_race_data(year, cancelled=(), **columns):
+    """3レース4頭ずつのレースデータを出力する(cancelledの行は着順を取消にする)"""
+    os.makedirs("race_csv_data_with_umainfo", exist_ok=True)
+    df_race = make_race_data(n_races=3, n_horses=4, year=year, seed=year).assign(**columns)
+    df_race["Rank"] = df_race.Rank.astype(object)
+    df_race.loc[list(cancelled), "Rank"] = "取消"
+    df_race.to_csv("race_csv_data_with_umainfo/{}_all_race.csv".format(year), encoding="shift-jis", index=False)
+    return df_race
+
+def test_export_and_reload(workdir):
+    df_2019 = write_race_data(2019, cancelled=[1]) # ラベルが無い行は出力しない
+    write_race_data(2020, Place="中山")
+
+    meta = TrainingSetExporter(label="top3").export("train", 2019)
+    X, y, group, meta_loaded = load_training_set("train")
+    assert isinstance(X, np.memmap) and X.dtype == np.float32
+    assert X.shape == (11, len(meta["columns"])) and (meta["rows"], meta["races"]) == (11, 3)
+    assert group.tolist() == [3, 4, 4]
+    assert meta_loaded["race_id"].tolist() == df_2019.Race_Id.drop(1).tolist()
+    assert y.tolist() == [1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 0]
+    assert {key: meta_loaded[key] for key in meta} == meta
+    # 結果の列と識別用の列は入れず，文字列の列はカテゴリの番号にする
+    columns = meta["columns"]
+    assert not {"Rank", "Time", "Race_Id", "Uma_Id", "Name"} & set(columns)
+    assert {"Place", "Jockey"} <= set(meta["categorical_columns"])
+    assert X[:, columns.index("Number")].tolist() == df_2019.Number.drop(1).tolist()
+    assert X[:, columns.index("Date")][0] == (pd.Timestamp("2019-01-01") - pd.Timestamp("1970-01-01")).days
+    assert X[:, columns.index("Jockey")].tolist() == [1, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0] # 騎手0, 騎手1の順
+
+    # 別の年はencoding.jsonの列と番号を使う(新しいカテゴリは後ろに追加)
+    meta_valid = TrainingSetExporter(label="top3").export("valid", 2020, format="arrow")
+    assert meta_valid["columns"] == columns
+    X_valid, y_valid, group_valid, _ = load_training_set("valid")
+    df_valid = X_valid.to_pandas()
+    assert list(df_valid.columns) == columns and len(df_valid) == 12
+    with open("training_set/encoding.json", encoding="utf-8") as f:
+        encoding = json.load(f)
+    assert encoding["columns"] == columns
+    assert encoding["categories"]["Place"] == ["東京", "中山"]
+    assert encoding["categories"]["Jockey"] == ["騎手0", "騎手1"]
+    assert (df_valid.Place == 1).all() and (X[:, columns.index("Place")] == 0).all()
+    assert group_valid.tolist() == [4, 4, 4] and y_valid.sum() == 9
+
+    with pytest.raises(ValueError):
+        TrainingSetExporter().export("train", 2019, format="csv")
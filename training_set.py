@@ -0,0 +1,271 @@
+# training_set.py
+#----------------------------------------------------------------------------
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Shirasukazushi
+# Created Date: 2026/10/19
+# ---------------------------------------------------------------------------
+# クラス
+#   TrainingSetExporter : 前処理済みのレースデータを学習用の数値行列にして保存する
+# ---------------------------------------------------------------------------
+# 関数
+#   load_training_set : 保存した行列をメモリマップで読み込む
+# ---------------------------------------------------------------------------
+# 注意点
+#   入力はmerge_umainfoの出力(race_csv_data_with_umainfo/<year>_all_race.csv)
+#   training_set/<name>/ に以下を出力
+#       X.npy        : 特徴量(行数 x 列数，float32，欠損はNaN)   format="arrow"の場合はX.arrow
+#       y.npy        : ラベル
+#       race_id.npy  : 行ごとのRace_Id(同じレースの行は連続している)
+#       group.npy    : レースごとの行数(ランキング学習のgroup)
+#       meta.json    : 列名，ラベルの種類など
+#   training_set/encoding.json にカテゴリ変数の符号化を保存し，次回以降も同じ番号を使う
+#   (学習用と検証用を別々に出力しても列と番号がそろう)
+#   レース結果の列(Rank, Timeなど)と馬の通算成績(Result_Rateなど)は特徴量に入れない
+#   format="arrow"はpyarrowが必要
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+import json
+import numpy as np
+import pandas as pd
+from horse_racing_crawler.df_io import read_race_data
+
+# 特徴量に入れない列(レース後に分かる値と，識別用の列)
+DROP_COLUMNS = ["Rank", "Time", "Delay", "3F", "Corner", "Result_Rate", "Result_Detail",
+                "Race_Id", "Uma_Id", "Name", "Start_Time"]
+# 日付として数値(1970/1/1からの日数)にする列
+DATE_COLUMNS = ["Date", "Birthday"]
+
+class TrainingSetExporter:
+    def __init__(self, output_dir="training_set", label="win", drop_columns=None, max_categories=5000, dtype="float32"):
+        """学習用の行列を出力するクラス
+
+        Attributes:
+        ----------
+        output_dir : str
+            出力するフォルダ名
+        label : str, default "win"
+            "win"  -> 1着なら1，それ以外は0
+            "top3" -> 3着以内なら1，それ以外は0
+            "rank" -> 着順そのもの
+        drop_columns : list, default None
+            特徴量に入れない列(Noneの場合はDROP_COLUMNS)
+        max_categories : int, default 5000
+            これより種類の多い文字列の列は特徴量に入れない(馬名など)
+        dtype : str, default "float32"
+            特徴量の型
+        encoding : dict
+            "columns" -> 特徴量の列名のリスト
+            "categories" -> 列名 -> カテゴリのリスト(リストの位置が番号)
+
+        Examples:
+        ----------
+        exporter = TrainingSetExporter(label="top3")
+        exporter.export("train", 2010, 2020)
+        exporter.export("valid", 2021, 2022)         # trainと同じ列，同じ番号
+        X, y, group, meta = load_training_set("train")
+        """
+        if label not in ["win", "top3", "rank"]:
+            raise ValueError("label must be 'win', 'top3' or 'rank'")
+        self.current_dir = os.getcwd().replace(os.sep,'/')
+        self.output_dir = output_dir
+        self.label = label
+        self.drop_columns = DROP_COLUMNS if drop_columns is None else drop_columns
+        self.max_categories = max_categories
+        self.dtype = dtype
+        self.load_encoding()
+
+    def encoding_path(self):
+        """カテゴリ変数の符号化のファイルパス"""
+        return "{}/{}/encoding.json".format(self.current_dir, self.output_dir)
+
+    def load_encoding(self):
+        """保存された符号化を読み込む"""
+        self.encoding = {"columns": None, "categories": {}}
+        if os.path.exists(self.encoding_path()):
+            with open(self.encoding_path(), encoding="utf-8") as f:
+                self.encoding = json.load(f)
+
+    def save_encoding(self):
+        """符号化を保存する"""
+        if not os.path.exists(self.output_dir):
+            os.mkdir(self.output_dir)
+        with open(self.encoding_path(), "w", encoding="utf-8") as f:
+            json.dump(self.encoding, f, ensure_ascii=False, indent=1)
+
+    def read(self, start_year, end_year=None, input_dir="race_csv_data_with_umainfo"):
+        """年ごとのレースデータを読み込み，Race_Id, 馬番の順に並べる"""
+        if end_year is None:
+            end_year = start_year
+        df_list = []
+        for year in range(start_year, end_year+1):
+            df_list.append(read_race_data(year, input_dir))
+            print("\r{}年".format(year), end="")
+        df = pd.concat(df_list, ignore_index=True)
+        print("\r{}年～{}年, 計{}行\n".format(start_year, end_year, len(df)), end="")
+        return df.sort_values(["Race_Id", "Number"], kind="stable").reset_index(drop=True)
+
+    def get_label(self, df):
+        """ラベルを作る(着順が数字でない行(中止，除外など)はNaN)"""
+        rank = pd.to_numeric(df["Rank"], errors="coerce")
+        if self.label == "win":
+            return (rank == 1).astype(float).where(rank.notna())
+        if self.label == "top3":
+            return (rank <= 3).astype(float).where(rank.notna())
+        return rank
+
+    def is_date_column(self, column):
+        """日付の列かどうか(past_Date_1なども含む)"""
+        return column in DATE_COLUMNS or any(column.startswith("past_{}_".format(date)) for date in DATE_COLUMNS)
+
+    def get_columns(self, df):
+        """特徴量にする列とカテゴリ変数の列を決める(初回のみ，以降はencoding.jsonの列を使う)"""
+        columns = []
+        for column in df.columns:
+            if column in self.drop_columns:
+                continue
+            if not pd.api.types.is_numeric_dtype(df[column]) and not self.is_date_column(column):
+                values = pd.to_numeric(df[column], errors="coerce")
+                # 数字の文字列は数値として，それ以外は種類が多すぎなければカテゴリとして使う
+                if values.notna().sum() < df[column].notna().sum():
+                    if df[column].nunique() > self.max_categories:
+                        continue
+                    self.encoding["categories"][column] = []
+            columns.append(column)
+        return columns
+
+    def encode(self, df):
+        """データフレームを数値だけのデータフレームにする
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            レースデータ
+
+        Returns
+        -------
+        df_feature : pandas.DataFrame
+            encoding["columns"]の列を持つ数値のデータフレーム(無い列はNaN)
+        """
+        if self.encoding["columns"] is None:
+            self.encoding["columns"] = self.get_columns(df)
+        categories = self.encoding["categories"]
+        features = {}
+        for column in self.encoding["columns"]:
+            if column not in df.columns:
+                features[column] = np.full(len(df), np.nan, dtype=self.dtype)
+                continue
+            values = df[column]
+            if self.is_date_column(column):
+                values = pd.to_datetime(values, errors="coerce")
+                values = (values - pd.Timestamp("1970-01-01")) / pd.Timedelta(days=1)
+            elif column in categories:
+                # 新しいカテゴリは後ろに追加する(既存の番号は変えない)
+                known = categories[column]
+                values = values.where(values.isna(), values.astype(str))
+                known.extend(sorted(set(values.dropna().unique()) - set(known)))
+                values = pd.Series(pd.Categorical(values, categories=known).codes, index=df.index)
+                values = values.where(values >= 0)
+            features[column] = pd.to_numeric(values, errors="coerce").to_numpy(dtype=self.dtype)
+        return pd.DataFrame(features, index=df.index)
+
+    def export(self, name, start_year, end_year=None, input_dir="race_csv_data_with_umainfo", format="numpy"):
+        """学習用の行列を出力する
+
+        Parameters
+        ----------
+        name : str
+            出力するフォルダ名(<output_dir>/<name>/)
+        start_year : int
+            最初の年
+        end_year : int, default None
+            最後の年(Noneの場合はstart_yearのみ)
+        input_dir : str
+            レースデータのフォルダ名
+        format : str, default "numpy"
+            "numpy" -> X.npy，"arrow" -> X.arrow(Arrow IPC，非圧縮)
+
+        Returns
+        -------
+        meta : dict
+            出力した行列の情報
+        """
+        if format not in ["numpy", "arrow"]:
+            raise ValueError("format must be 'numpy' or 'arrow'")
+        df = self.read(start_year, end_year, input_dir)
+        y = self.get_label(df)
+        df = df[y.notna()].reset_index(drop=True)
+        y = y[y.notna()].to_numpy(dtype=self.dtype)
+        df_feature = self.encode(df)
+        race_id = df["Race_Id"].to_numpy(dtype=np.int64)
+        group = np.diff(np.flatnonzero(np.r_[True, race_id[1:] != race_id[:-1], True]))
+
+        set_dir = "{}/{}/{}".format(self.current_dir, self.output_dir, name)
+        if not os.path.exists(self.output_dir):
+            os.mkdir(self.output_dir)
+        if not os.path.exists(set_dir):
+            os.mkdir(set_dir)
+        if format == "numpy":
+            np.save("{}/X.npy".format(set_dir), np.ascontiguousarray(df_feature.to_numpy(dtype=self.dtype)))
+        else:
+            import pyarrow as pa
+            import pyarrow.feather as feather
+            feather.write_feather(pa.Table.from_pandas(df_feature, preserve_index=False), "{}/X.arrow".format(set_dir),
+                                  compression="uncompressed")
+        np.save("{}/y.npy".format(set_dir), y)
+        np.save("{}/race_id.npy".format(set_dir), race_id)
+        np.save("{}/group.npy".format(set_dir), group)
+
+        meta = {
+            "columns": list(df_feature.columns),
+            "categorical_columns": [column for column in df_feature.columns if column in self.encoding["categories"]],
+            "label": self.label,
+            "format": format,
+            "rows": len(df_feature),
+            "races": len(group),
+            "years": [start_year, start_year if end_year is None else end_year],
+        }
+        with open("{}/meta.json".format(set_dir), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+        self.save_encoding()
+        return meta
+
+def load_training_set(name, output_dir="training_set", mmap=True):
+    """保存した行列を読み込む
+
+    Parameters
+    ----------
+    name : str
+        TrainingSetExporter.exportのname
+    output_dir : str
+        TrainingSetExporterのoutput_dir
+    mmap : bool, default True
+        Trueの場合はメモリマップで読み込む(ファイルの中身はアクセスした所だけ読まれる)
+
+    Returns
+    -------
+    X : numpy.ndarray or pyarrow.Table
+        特徴量(format="arrow"の場合はpyarrow.Table)
+    y : numpy.ndarray
+        ラベル
+    group : numpy.ndarray
+        レースごとの行数
+    meta : dict
+        列名などの情報(meta["race_id"]に行ごとのRace_Id)
+    """
+    set_dir = "{}/{}/{}".format(os.getcwd().replace(os.sep,'/'), output_dir, name)
+    mmap_mode = "r" if mmap else None
+    with open("{}/meta.json".format(set_dir), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["format"] == "numpy":
+        X = np.load("{}/X.npy".format(set_dir), mmap_mode=mmap_mode)
+    else:
+        import pyarrow.feather as feather
+        X = feather.read_table("{}/X.arrow".format(set_dir), memory_map=mmap)
+    y = np.load("{}/y.npy".format(set_dir), mmap_mode=mmap_mode)
+    group = np.load("{}/group.npy".format(set_dir), mmap_mode=mmap_mode)
+    meta["race_id"] = np.load("{}/race_id.npy".format(set_dir), mmap_mode=mmap_mode)
+    return X, y, group, meta